@@ -1,95 +1,684 @@
-from flask import Flask, jsonify, request
+from flask import (
+    Blueprint,
+    Flask,
+    Response,
+    current_app,
+    jsonify,
+    request,
+    stream_with_context,
+)
 from database import db
 from models import *
 from datetime import datetime
 from zoneinfo import ZoneInfo
 from flask_cors import CORS
+import hashlib
+import hmac
 import os
+import time
 from dotenv import load_dotenv
 from flask_migrate import Migrate
-from bcrypt import hashpw, gensalt, checkpw
+import click
+from sqlalchemy import (
+    BigInteger,
+    case,
+    cast,
+    delete,
+    func,
+    insert,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.orm import selectinload
 from utils.jwt_utils import (
     create_access_token,
     create_refresh_token,
     decode_refresh_token,
+    get_access_token_cache,
 )
 from utils.auth_middleware import require_auth
-
-load_dotenv()
+from utils.password_pool import PasswordHasher, PoolSaturated
+from utils.scheduler import CartExpiryScheduler
+from utils.product_search import ProductSearchIndex, autocomplete_sql, search_sql
+from utils.pool_metrics import PRIMARY as PRIMARY_ENGINE, PoolMetrics
+from utils.read_replica import (
+    REPLICA_BIND_PREFIX,
+    ReplicaRouter,
+    read_only,
+    record_write,
+    set_sticky_cookie,
+)
+from utils.profiling import RequestProfiler
+from utils.idempotency import IdempotencyStore, idempotent
+from utils.money import from_cents, parse_cents, to_cents
+from utils.json_provider import make_json_provider
+from utils.schemas import CartItemSchema, OrderSchema, ProductSchema, UserSchema
+from utils.compression import ResponseCompressor
+from utils.catalog_cache import (
+    CatalogSnapshots,
+    catalog_revision_query,
+    catalog_validators,
+    not_modified,
+)
+from clear_expiry_cart import clear_expired_carts, release_cart_statements
 
 IST = ZoneInfo("Asia/Kolkata")
 
-app = Flask(__name__)
 
-CORS(app, supports_credentials=True)
+def env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+def env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+def env_flag(name):
+    return os.getenv(name) == "1"
+
+
+def load_config():
+    """
+    API settings read from the environment (and .env). create_app() builds
+    every component from these, so any of them can be overridden per app.
+    """
+    load_dotenv()
+
+    # Connection pool tuning; only options set in the environment are passed on
+    pool_options = {
+        "pool_size": ("DB_POOL_SIZE", int),
+        "max_overflow": ("DB_MAX_OVERFLOW", int),
+        "pool_timeout": ("DB_POOL_TIMEOUT", int),
+        "pool_recycle": ("DB_POOL_RECYCLE", int),
+        "pool_pre_ping": ("DB_POOL_PRE_PING", lambda v: v == "1"),
+    }
+    return {
+        "SQLALCHEMY_DATABASE_URI": os.getenv("DATABASE_URL"),
+        "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+        "SECRET_KEY": os.getenv("ACCESS_SECRET_KEY"),
+        "REFRESH_SECRET_KEY": os.getenv("REFRESH_SECRET_KEY"),
+        "SQLALCHEMY_ENGINE_OPTIONS": {
+            option: cast(os.environ[env])
+            for option, (env, cast) in pool_options.items()
+            if os.getenv(env)
+        },
+        # Optional read replicas (comma separated URLs) used by read-only routes
+        "SQLALCHEMY_BINDS": {
+            f"{REPLICA_BIND_PREFIX}{i}": url.strip()
+            for i, url in enumerate(os.getenv("DATABASE_REPLICA_URLS", "").split(","))
+            if url.strip()
+        },
+        # Verified access tokens kept in memory (0 disables the cache)
+        "JWT_CACHE_SIZE": env_int("JWT_CACHE_SIZE", 10000),
+        # orjson, msgspec or json; "auto" picks the fastest one installed
+        "JSON_BACKEND": os.getenv("JSON_BACKEND", "auto"),
+        # Read-your-writes window after a cart change/checkout; failed replica backoff
+        "REPLICA_STICKY_SECONDS": env_float("REPLICA_STICKY_SECONDS", 5),
+        "REPLICA_RETRY_SECONDS": env_float("REPLICA_RETRY_SECONDS", 30),
+        # bcrypt runs on a bounded pool; when it is saturated auth routes answer 503
+        "PASSWORD_POOL_WORKERS": env_int("PASSWORD_POOL_WORKERS", 2),
+        "PASSWORD_POOL_QUEUE": env_int("PASSWORD_POOL_QUEUE", 16),
+        "PASSWORD_POOL_KIND": os.getenv("PASSWORD_POOL_KIND", "thread"),
+        "PASSWORD_POOL_TIMEOUT": env_float("PASSWORD_POOL_TIMEOUT", 30),
+        "BCRYPT_ROUNDS": env_int("BCRYPT_ROUNDS", 12),
+        "PASSWORD_REHASH_ON_LOGIN": env_flag("PASSWORD_REHASH_ON_LOGIN"),
+        # Catalog paging and streaming
+        "PRODUCTS_PAGE_MAX": env_int("PRODUCTS_PAGE_MAX", 1000),
+        "PRODUCTS_STREAM_THRESHOLD": env_int("PRODUCTS_STREAM_THRESHOLD", 200),
+        "PRODUCTS_STREAM_CHUNK": env_int("PRODUCTS_STREAM_CHUNK", 500),
+        "SEARCH_LIMIT_MAX": env_int("SEARCH_LIMIT_MAX", 50),
+        # Name index for /products/search on databases without full-text indexes
+        "SEARCH_INDEX_MAX_AGE": env_int("SEARCH_INDEX_MAX_AGE", 300),
+        # Upper bound on lines accepted by POST /cart/items
+        "CART_BATCH_MAX": env_int("CART_BATCH_MAX", 100),
+        "ORDERS_PAGE_MAX": env_int("ORDERS_PAGE_MAX", 100),
+        # Replayed responses for retried checkouts/adds (Idempotency-Key header)
+        "IDEMPOTENCY_TTL": env_int("IDEMPOTENCY_TTL", 86400),
+        "IDEMPOTENCY_CACHE_SIZE": env_int("IDEMPOTENCY_CACHE_SIZE", 10000),
+        "IDEMPOTENCY_LOCK_SECONDS": env_int("IDEMPOTENCY_LOCK_SECONDS", 30),
+        "IDEMPOTENCY_WAIT_SECONDS": env_float("IDEMPOTENCY_WAIT_SECONDS", 10),
+        # gzip/brotli for JSON responses of at least COMPRESS_MIN_SIZE bytes
+        "COMPRESS_MIN_SIZE": env_int("COMPRESS_MIN_SIZE", 1024),
+        "COMPRESS_LEVEL": env_int("COMPRESS_LEVEL", 6),
+        "COMPRESS_BR_QUALITY": env_int("COMPRESS_BR_QUALITY", 4),
+        # Serialized, precompressed hot catalog pages (0 disables)
+        "CATALOG_SNAPSHOT_SIZE": env_int("CATALOG_SNAPSHOT_SIZE", 64),
+        "CATALOG_SNAPSHOT_GZIP_LEVEL": env_int("CATALOG_SNAPSHOT_GZIP_LEVEL", 9),
+        "CATALOG_SNAPSHOT_BR_QUALITY": env_int("CATALOG_SNAPSHOT_BR_QUALITY", 11),
+        # /internal/* stats are only served when enabled, and then require
+        # the X-Internal-Token header when INTERNAL_TOKEN is set
+        "INTERNAL_ENDPOINTS": env_flag("INTERNAL_ENDPOINTS"),
+        "INTERNAL_TOKEN": os.getenv("INTERNAL_TOKEN"),
+        # Opt-in request profiling (Server-Timing header + /internal/profile)
+        "PROFILING": env_flag("PROFILING"),
+        "PROFILE_WINDOW": env_int("PROFILE_WINDOW", 1000),
+        "PROFILE_DUPLICATE_THRESHOLD": env_int("PROFILE_DUPLICATE_THRESHOLD", 3),
+        "PROFILE_ROUTES": [r for r in os.getenv("PROFILE_ROUTES", "").split(",") if r],
+        "PROFILE_DIR": os.getenv("PROFILE_DIR", "profiles"),
+        # In-process expired-cart sweeper (see `flask sweep-carts`)
+        "CART_SWEEP_INTERVAL": env_float("CART_SWEEP_INTERVAL", 60),
+        "CART_SWEEP_JITTER": env_float("CART_SWEEP_JITTER", 0.1),
+        "CART_SWEEP_BATCH": env_int("CART_SWEEP_BATCH", 1000),
+    }
+
+
+api = Blueprint("api", __name__, cli_group=None)
+internal = Blueprint("internal", __name__, url_prefix="/internal")
+migrate = Migrate()
+
+
+def server_busy():
+    response = jsonify({"error": "Server busy, please retry"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
+
+@api.app_errorhandler(PoolTimeout)
+def pool_exhausted(error):
+    """No connection freed up within DB_POOL_TIMEOUT: shed load like the hasher."""
+    current_app.extensions["pool_metrics"].record_timeout(db.session)
+    return server_busy()
+
+
+# ---------------------------
+# HELPER FUNCTIONS
+# ---------------------------
+def active_cart_query(user_id, now):
+    """
+    The user's active cart, locked FOR UPDATE: every cart write and checkout
+    takes this lock first, so they run one at a time per cart.
+    """
+    return (
+        select(Cart)
+        .where(Cart.user_id == user_id, Cart.expires_at > now)
+        .limit(1)
+        .with_for_update()
+    )
+
+
+def get_active_cart(user_id):
+    """Return the active (non-expired) cart for a user, locked, or None."""
+    return db.session.scalar(active_cart_query(user_id, datetime.now(IST)))
+
+
+def reserve_stock_statement(product_id, quantity):
+    """UPDATE taking `quantity` units only while enough stock is left."""
+    return (
+        update(Product)
+        .where(Product.id == product_id, Product.available_quantity >= quantity)
+        .values(
+            available_quantity=Product.available_quantity - quantity,
+            version=Product.version + 1,
+        )
+    )
+
+
+def release_stock_statement(product_id, quantity):
+    return (
+        update(Product)
+        .where(Product.id == product_id)
+        .values(
+            available_quantity=Product.available_quantity + quantity,
+            version=Product.version + 1,
+        )
+    )
+
+
+def reserve_stock(product_id, quantity):
+    """
+    Atomically take `quantity` units of a product in a single statement.
+    Returns False when the product is missing or has too little stock, so
+    concurrent requests can never drive available_quantity below zero.
+    """
+    result = db.session.execute(reserve_stock_statement(product_id, quantity))
+    return result.rowcount == 1
+
+
+def release_stock(product_id, quantity):
+    """Atomically return `quantity` units of a product to stock."""
+    db.session.execute(release_stock_statement(product_id, quantity))
+
 
-# Configure your database URI
-app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
-app.config["SECRET_KEY"] = os.getenv("ACCESS_SECRET_KEY")
-app.config["REFRESH_SECRET_KEY"] = os.getenv("REFRESH_SECRET_KEY")
+def latest_cart_query(user_id):
+    """The user's cart (ix_carts_user_id holds at most one per user)."""
+    return (
+        select(Cart)
+        .where(Cart.user_id == user_id)
+        .order_by(Cart.expires_at.desc())
+        .limit(1)
+    )
 
 
-if not app.config["SECRET_KEY"]:
-    raise Exception("SECRET_KEY missing! Add it to .env")
+def cart_is_active(cart, now):
+    expires_at = cart.expires_at
+    # Convert to IST-aware if naive
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=IST)
+    return expires_at > now
+
+
+def expired_cart_ids(user_id, now):
+    """
+    Claim the user's expired carts. SKIP LOCKED leaves carts a sweeper (or
+    another request) is already releasing to it, so their stock is only
+    returned once.
+    """
+    return (
+        select(Cart.id)
+        .where(Cart.user_id == user_id, Cart.expires_at <= now)
+        .with_for_update(skip_locked=True)
+    )
+
 
-# Initialize the database with the app
-db.init_app(app)
-migrate = Migrate(app, db)
+def get_or_create_active_cart(user_id, attempts=3):
+    """
+    Return (cart, error) for the user's active cart, creating one if needed.
+    Call it before any other write of the request's transaction.
+
+    An existing active cart costs a single query and is locked like
+    get_active_cart. Otherwise the user's expired carts are released and the
+    new cart is flushed in the caller's transaction, so both commit or roll
+    back with the caller's change. When a concurrent request inserts the
+    user's cart first, the unique ix_carts_user_id rejects ours: the
+    transaction is rolled back and the lookup retried, finding theirs.
+    """
+    for attempt in range(attempts):
+        now = datetime.now(IST)
+
+        cart = db.session.scalar(latest_cart_query(user_id).with_for_update())
+        if cart is not None and cart_is_active(cart, now):
+            return cart, None
+
+        if cart is None:
+            if db.session.get(User, user_id) is None:
+                return None, "User not found"
+        else:
+            expired = db.session.scalars(expired_cart_ids(user_id, now)).all()
+            if expired:
+                for statement in release_cart_statements(expired):
+                    db.session.execute(statement)
+            db.session.expunge(cart)
+
+        new_cart = Cart(user_id=user_id)
+        db.session.add(new_cart)
+        try:
+            db.session.flush()
+        except IntegrityError:
+            db.session.rollback()
+            if attempt == attempts - 1:
+                raise
+            continue
+
+        return new_cart, None
 
 
 # ---------------------------
-# HELPER FUNCTIONS
+# CATALOG HELPERS
 # ---------------------------
-def get_active_cart(user_id):
-    """Return the active (non-expired) cart for a user, or None."""
-    now = datetime.now(IST)
-    return Cart.query.filter_by(user_id=user_id).filter(Cart.expires_at > now).first()
+# API field -> column; prices are selected in cents, formatted on serialization
+PRODUCT_COLUMNS = {
+    "id": Product.id,
+    "name": Product.name,
+    "price": Product.price_cents.label("price"),
+    "available_quantity": Product.available_quantity,
+}
+PRODUCT_FIELDS = tuple(PRODUCT_COLUMNS)
+
+
+def parse_number_arg(args, name, cast=int):
+    """Return (value, error) for an optional numeric query param."""
+    raw = args.get(name)
+    if raw is None or raw == "":
+        return None, None
+    try:
+        return cast(raw), None
+    except ValueError:
+        return None, f"Invalid value for '{name}'"
+
+
+def build_product_query(args, page_max):
+    """
+    Translate catalog query params into a keyset-ordered column select
+    (limit at most `page_max`). Returns (query, fields, limit, error).
+    """
+    fields = PRODUCT_FIELDS
+    if args.get("fields"):
+        fields = tuple(f.strip() for f in args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in PRODUCT_FIELDS]
+        if unknown or not fields:
+            return None, None, None, f"Unknown fields: {', '.join(unknown)}"
+
+    values = {}
+    for name, cast in (
+        ("after", int),
+        ("limit", int),
+        ("min_price", parse_cents),
+        ("max_price", parse_cents),
+        ("min_stock", int),
+    ):
+        values[name], error = parse_number_arg(args, name, cast)
+        if error:
+            return None, None, None, error
+
+    limit = values["limit"]
+    if limit is not None and not 1 <= limit <= page_max:
+        return None, None, None, f"limit must be between 1 and {page_max}"
+
+    # id is always selected so the cursor can be computed
+    columns = [Product.id] + [PRODUCT_COLUMNS[f] for f in fields if f != "id"]
+    query = select(*columns)
+
+    if values["after"] is not None:
+        query = query.where(Product.id > values["after"])
+    if values["min_price"] is not None:
+        query = query.where(Product.price_cents >= values["min_price"])
+    if values["max_price"] is not None:
+        query = query.where(Product.price_cents <= values["max_price"])
+    if values["min_stock"] is not None:
+        query = query.where(Product.available_quantity >= values["min_stock"])
+    if args.get("in_stock") in ("1", "true"):
+        query = query.where(Product.available_quantity > 0)
+    if args.get("name"):
+        query = query.where(Product.name.startswith(args["name"], autoescape=True))
+
+    return query.order_by(Product.id), fields, limit, None
+
+
+def product_row_to_dict(row, fields):
+    item = {f: getattr(row, f) for f in fields}
+    if "price" in item:
+        item["price"] = from_cents(item["price"])
+    return item
+
+
+def serialize_products(rows, fields):
+    """ProductSchema for full rows, plain dicts for ?fields= projections."""
+    if fields == PRODUCT_FIELDS:
+        return [ProductSchema.from_row(row) for row in rows]
+    return [product_row_to_dict(row, fields) for row in rows]
+
+
+def next_product_cursor(query, limit):
+    """Probe the id index for the last id of this page, if another page follows."""
+    ids = db.session.execute(
+        query.with_only_columns(Product.id).offset(limit - 1).limit(2)
+    ).all()
+    return ids[0].id if len(ids) == 2 else None
+
+
+def open_product_stream(query, limit=None):
+    """
+    Execute the catalog query on a server-side cursor. This runs inside the
+    view (not the generator) so connection errors surface before streaming.
+    """
+    if limit is not None:
+        query = query.limit(limit)
+    chunk = current_app.config["PRODUCTS_STREAM_CHUNK"]
+    return db.session.execute(query.execution_options(yield_per=chunk))
+
+
+def stream_product_rows(rows, fields):
+    """Yield a JSON array in chunks from an open server-side cursor."""
+    yield "["
+    first = True
+    for partition in rows.partitions():
+        # One encoder call per partition; strip the array brackets
+        chunk = current_app.json.dumps(
+            serialize_products(partition, fields), separators=(",", ":")
+        )[1:-1]
+        yield chunk if first else "," + chunk
+        first = False
+    yield "]"
+    rows.close()
+
+
+def catalog_page_key(args):
+    """Snapshot key for plain pages (only after/limit/fields), else None."""
+    if set(args) - {"after", "limit", "fields"}:
+        return None
+    return args.get("after"), args.get("limit"), args.get("fields")
+
+
+def snapshot_response(snapshot, encoding, response_class=Response):
+    """A catalog snapshot's body in `encoding` (see CatalogSnapshots.encoding_for)."""
+    response = response_class(snapshot.bodies[encoding], mimetype="application/json")
+    if len(snapshot.bodies) > 1:
+        response.vary.add("Accept-Encoding")
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    if snapshot.next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(snapshot.next_cursor)
+    return response
 
 
-def release_expired_cart(cart):
-    """Return items from expired cart back to product stock."""
-    for item in cart.items:
-        item.product.available_quantity += item.quantity
-    db.session.delete(cart)
-    db.session.commit()
+def page_validators(stamp, args):
+    """
+    (ETag, Last-Modified) for a paged catalog request. A row can drop out of
+    a filtered page (e.g. in_stock=1) without raising the page's latest
+    updated_at, so Last-Modified is only given to plain keyset pages and
+    filtered pages revalidate on the ETag alone.
+    """
+    etag, last_modified = catalog_validators(stamp)
+    if catalog_page_key(args) is None:
+        last_modified = None
+    return etag, last_modified
+
+
+def set_catalog_validators(response, etag, last_modified):
+    if etag is not None:
+        response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    # Caches may keep the page but must revalidate it: stock moves all the time
+    response.cache_control.public = True
+    response.cache_control.no_cache = True
+    response.vary.add("Accept-Encoding")
+    return response
 
 
-def get_or_create_active_cart(user_id):
-    """Return active cart or create a new one if expired or none exists."""
-    now = datetime.now(IST)
+def find_product_ids(q, prefix, limit):
+    """Ranked ids for a search (q) or autocomplete (prefix) request."""
+    if db.session.get_bind().dialect.name == "postgresql":
+        if prefix:
+            return autocomplete_sql(prefix, limit)
+        return search_sql(q, limit)
+    search_index = current_app.extensions["search_index"]
+    if prefix:
+        return search_index.autocomplete(prefix, limit)
+    return search_index.search(q, limit)
 
-    user = User.query.get(user_id)
-    if not user:
-        return None, "User not found"
 
-    # 1. Return the existing active cart
-    cart = get_active_cart(user_id)
-    if cart:
-        return cart, None
+# ---------------------------
+# CART VIEW / CHECKOUT HELPERS
+# ---------------------------
+def cart_view_query(user_id, now):
+    """One row per line of the active cart, with subtotals and a windowed total."""
+    active_cart_id = (
+        select(Cart.id)
+        .where(Cart.user_id == user_id, Cart.expires_at > now)
+        .limit(1)
+        .scalar_subquery()
+    )
+    subtotal = CartItem.quantity * Product.price_cents
+    return (
+        select(
+            Cart.id.label("cart_id"),
+            Cart.expires_at,
+            CartItem.product_id,
+            Product.name,
+            Product.price_cents.label("price"),
+            CartItem.quantity,
+            subtotal.label("subtotal"),
+            # sum() of bigint is numeric on PostgreSQL; keep it an integer
+            cast(func.coalesce(func.sum(subtotal).over(), 0), BigInteger).label(
+                "total"
+            ),
+        )
+        .select_from(Cart)
+        .outerjoin(CartItem, CartItem.cart_id == Cart.id)
+        .outerjoin(Product, Product.id == CartItem.product_id)
+        .where(Cart.id == active_cart_id)
+        .order_by(CartItem.id)
+    )
+
 
-    # 2. If the latest cart is expired → release it
-    expired_cart = (
-        Cart.query.filter_by(user_id=user_id).order_by(Cart.created_at.desc()).first()
+def render_cart(rows, now):
+    """Return (weak etag or None, response body) for cart_view_query rows."""
+    if not rows:
+        return None, {"items": [], "total": 0, "expires_in": None, "expires_at": None}
+
+    lines = [row for row in rows if row.product_id is not None]
+    etag = hashlib.sha1(
+        repr(
+            (
+                rows[0].cart_id,
+                rows[0].expires_at,
+                [(r.product_id, r.quantity, r.price) for r in lines],
+            )
+        ).encode()
+    ).hexdigest()
+
+    expires_at = rows[0].expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=IST)
+
+    remaining = expires_at - now
+    minutes = int(remaining.total_seconds() // 60)
+    seconds = int(remaining.total_seconds() % 60)
+
+    return etag, {
+        "items": [CartItemSchema.from_row(line) for line in lines],
+        "total": from_cents(rows[0].total),
+        "expires_in": f"{minutes}m {seconds}s",
+        "expires_at": expires_at.isoformat(),
+    }
+
+
+def checkout_lines_query(cart_id):
+    """
+    The cart's lines priced from products, locking those product rows in id
+    order (the order /cart/items locks them in, so the two cannot deadlock).
+    """
+    return (
+        select(CartItem.product_id, CartItem.quantity, Product.price_cents)
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.cart_id == cart_id)
+        .order_by(Product.id)
+        .with_for_update(of=Product)
     )
 
-    if expired_cart:
-        exp = expired_cart.expires_at
 
-        # Convert to IST-aware if naive
-        if exp.tzinfo is None:
-            exp = exp.replace(tzinfo=IST)
+def cart_total_cents(cart_id):
+    """Scalar subquery summing the cart's lines in cents, for the order INSERT."""
+    return (
+        select(
+            cast(
+                func.coalesce(func.sum(CartItem.quantity * Product.price_cents), 0),
+                BigInteger,
+            )
+        )
+        .join(Product, Product.id == CartItem.product_id)
+        .where(CartItem.cart_id == cart_id)
+        .scalar_subquery()
+    )
 
-        # If expired, release it
-        if exp <= now:
-            release_expired_cart(expired_cart)
 
-    # 3. Create a new cart
-    new_cart = Cart(user_id=user_id)
-    db.session.add(new_cart)
-    db.session.commit()
+def order_item_rows(order_id, lines):
+    return [
+        {
+            "order_id": order_id,
+            "product_id": line.product_id,
+            "quantity": line.quantity,
+            "price_at_order_cents": line.price_cents,
+        }
+        for line in lines
+    ]
+
 
-    return new_cart, None
+# ---------------------------
+# ORDER HELPERS
+# ---------------------------
+def to_db_datetime(value):
+    """created_at is stored as naive IST; normalise aware datetimes to match."""
+    if value.tzinfo is not None:
+        value = value.astimezone(IST).replace(tzinfo=None)
+    return value
+
+
+def parse_datetime_arg(args, name):
+    """Return (datetime, error) for an optional ISO date/datetime query param."""
+    raw = args.get(name)
+    if not raw:
+        return None, None
+    try:
+        return to_db_datetime(datetime.fromisoformat(raw)), None
+    except ValueError:
+        return None, f"Invalid date for '{name}'"
+
+
+def parse_order_cursor(raw):
+    """Decode a '<created_at iso>_<order id>' cursor, or return None."""
+    created_at, _, order_id = raw.rpartition("_")
+    try:
+        return to_db_datetime(datetime.fromisoformat(created_at)), int(order_id)
+    except ValueError:
+        return None
+
+
+def build_orders_query(user_id, args, page_max):
+    """
+    Translate order history query params into a select of Order objects,
+    newest first (limit at most `page_max`). Returns (query, limit, error);
+    one extra row is fetched when paging so paginate_orders can tell whether
+    another page follows.
+    """
+    query = (
+        select(Order)
+        .where(Order.user_id == user_id)
+        .options(
+            selectinload(Order.items)
+            .joinedload(OrderItem.product)
+            .load_only(Product.name)
+        )
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
+
+    limit, error = parse_number_arg(args, "limit")
+    if not error and limit is not None and not 1 <= limit <= page_max:
+        error = f"limit must be between 1 and {page_max}"
+    if error:
+        return None, None, error
+
+    date_from, error = parse_datetime_arg(args, "from")
+    if not error:
+        date_to, error = parse_datetime_arg(args, "to")
+    if error:
+        return None, None, error
+    if date_from is not None:
+        query = query.where(Order.created_at >= date_from)
+    if date_to is not None:
+        query = query.where(Order.created_at <= date_to)
+
+    if args.get("before"):
+        cursor = parse_order_cursor(args["before"])
+        if not cursor:
+            return None, None, "Invalid cursor"
+        query = query.where(tuple_(Order.created_at, Order.id) < cursor)
+
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query, limit, None
+
+
+def paginate_orders(orders, limit):
+    """Trim the probe row; returns (orders, next cursor or None)."""
+    if limit is None or len(orders) <= limit:
+        return orders, None
+    orders = orders[:limit]
+    return orders, f"{orders[-1].created_at.isoformat()}_{orders[-1].id}"
 
 
 # ---------------------------
@@ -97,7 +686,7 @@ def get_or_create_active_cart(user_id):
 # ---------------------------
 
 
-@app.route("/")
+@api.route("/")
 def home():
     return jsonify({"message": "Welcome to the E-Commerce API"})
 
@@ -107,7 +696,7 @@ def home():
 # ---------------------------
 
 
-@app.route("/auth/register", methods=["POST"])
+@api.route("/auth/register", methods=["POST"])
 def register():
     data = request.get_json()
     username = data.get("username")
@@ -120,7 +709,10 @@ def register():
     if User.query.filter((User.username == username) | (User.email == email)).first():
         return jsonify({"error": "User already exists"}), 409
 
-    hashed_pw = hashpw(password.encode("utf-8"), gensalt()).decode("utf-8")
+    try:
+        hashed_pw = current_app.extensions["password_hasher"].hash(password)
+    except PoolSaturated:
+        return server_busy()
 
     new_user = User(username=username, email=email, password_hash=hashed_pw)
     db.session.add(new_user)
@@ -155,7 +747,7 @@ def register():
     return response, 201
 
 
-@app.route("/auth/login", methods=["POST"])
+@api.route("/auth/login", methods=["POST"])
 def login():
     data = request.get_json()
     username = data.get("username")
@@ -168,8 +760,19 @@ def login():
     if not user:
         return jsonify({"error": "Invalid username or password"}), 401
 
-    if not checkpw(password.encode("utf-8"), user.password_hash.encode("utf-8")):
-        return jsonify({"error": "Invalid username or password"}), 401
+    password_hasher = current_app.extensions["password_hasher"]
+    try:
+        if not password_hasher.check(password, user.password_hash):
+            return jsonify({"error": "Invalid username or password"}), 401
+
+        # Opt-in upgrade of hashes made with an older BCRYPT_ROUNDS
+        if current_app.config[
+            "PASSWORD_REHASH_ON_LOGIN"
+        ] and password_hasher.needs_rehash(user.password_hash):
+            user.password_hash = password_hasher.hash(password)
+            db.session.commit()
+    except PoolSaturated:
+        return server_busy()
 
     access = create_access_token(user.id)
     refresh = create_refresh_token(user.id)
@@ -195,7 +798,7 @@ def login():
     return response
 
 
-@app.route("/auth/refresh", methods=["POST"])
+@api.route("/auth/refresh", methods=["POST"])
 def refresh():
     refresh_token = request.cookies.get("refresh_token")
     if not refresh_token:
@@ -211,19 +814,19 @@ def refresh():
     return jsonify({"access_token": new_access})
 
 
-@app.route("/auth/logout", methods=["POST"])
+@api.route("/auth/logout", methods=["POST"])
 def logout():
     response = jsonify({"message": "Logged out"})
     response.set_cookie("refresh_token", "", expires=0)
     return response
 
 
-@app.route("/auth/me", methods=["GET"])
+@api.route("/auth/me", methods=["GET"])
 @require_auth
 def me():
     user = User.query.get(request.user_id)
 
-    return jsonify({"id": user.id, "username": user.username, "email": user.email})
+    return jsonify(UserSchema.from_row(user))
 
 
 # ---------------------------
@@ -231,22 +834,124 @@ def me():
 # ---------------------------
 
 
-@app.route("/products", methods=["GET"])
+@api.route("/products", methods=["GET"])
+@read_only
 def get_products():
-    products = Product.query.all()
-    result = [
-        {
-            "id": p.id,
-            "name": p.name,
-            "price": p.price,
-            "available_quantity": p.available_quantity,
-        }
-        for p in products
-    ]
-    return jsonify(result)
+    """
+    List the catalog ordered by id.
+
+    Query params:
+      after       - keyset cursor: only return products with id > after
+      limit       - page size (max PRODUCTS_PAGE_MAX); omit for the whole catalog
+      min_price / max_price, min_stock, in_stock=1, name (prefix match)
+      fields      - comma separated projection, e.g. fields=id,name
+
+    The body is always a JSON array; when more rows exist the next cursor is
+    returned in the X-Next-Cursor header. Large results are streamed from a
+    server-side cursor instead of being built in memory.
+
+    Paged responses carry an ETag from the revision stamp of the rows on the
+    page, so If-None-Match revalidates with a 304. Plain pages (after/limit/
+    fields only) also carry Last-Modified for If-Modified-Since and are
+    served from precompressed snapshots until their rows change. The whole
+    catalog (no limit) is streamed without validators rather than
+    aggregating every row on each request.
+    """
+    query, fields, limit, error = build_product_query(
+        request.args, current_app.config["PRODUCTS_PAGE_MAX"]
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    etag = last_modified = None
+    if limit is not None:
+        etag, last_modified = page_validators(
+            db.session.execute(catalog_revision_query(query, limit)).one(),
+            request.args,
+        )
+        if not_modified(request, etag, last_modified):
+            return set_catalog_validators(Response(status=304), etag, last_modified)
+
+    next_cursor = None
+    if limit is not None and limit <= current_app.config["PRODUCTS_STREAM_THRESHOLD"]:
+        catalog_snapshots = current_app.extensions["catalog_snapshots"]
+        key = catalog_page_key(request.args)
+        snapshot = key and catalog_snapshots.get(key, etag)
+        if snapshot:
+            encoding = catalog_snapshots.encoding_for(
+                snapshot, request.accept_encodings
+            )
+            response = snapshot_response(snapshot, encoding)
+            return set_catalog_validators(response, etag, last_modified)
+
+        rows = db.session.execute(query.limit(limit + 1)).all()
+        next_cursor = rows[limit - 1].id if len(rows) > limit else None
+        response = jsonify(serialize_products(rows[:limit], fields))
+        if key:
+            snapshot = catalog_snapshots.put(
+                key, etag, last_modified, next_cursor, response.get_data()
+            )
+            encoding = catalog_snapshots.encoding_for(
+                snapshot, request.accept_encodings
+            )
+            response = snapshot_response(snapshot, encoding)
+            return set_catalog_validators(response, etag, last_modified)
+    else:
+        next_cursor = next_product_cursor(query, limit) if limit else None
+        response = Response(
+            stream_with_context(
+                stream_product_rows(open_product_stream(query, limit), fields)
+            ),
+            mimetype="application/json",
+        )
+
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return set_catalog_validators(response, etag, last_modified)
+
+
+@api.route("/products/search", methods=["GET"])
+@read_only
+def search_products():
+    """
+    Search the catalog by name.
+
+    Query params:
+      q       - full-text search, best matches first; the last word also
+                matches as a prefix so results follow the user's typing
+      prefix  - autocomplete: names starting with prefix, alphabetically
+      limit   - max results (default 10, max SEARCH_LIMIT_MAX)
+    """
+    q = (request.args.get("q") or "").strip()
+    prefix = (request.args.get("prefix") or "").strip()
+    if not q and not prefix:
+        return jsonify({"error": "Provide 'q' or 'prefix'"}), 400
+
+    limit, error = parse_number_arg(request.args, "limit")
+    if error:
+        return jsonify({"error": error}), 400
+    limit = 10 if limit is None else limit
+    limit_max = current_app.config["SEARCH_LIMIT_MAX"]
+    if not 1 <= limit <= limit_max:
+        return jsonify({"error": f"limit must be 1-{limit_max}"}), 400
+
+    ids = find_product_ids(q, prefix, limit)
+    if not ids:
+        return jsonify([])
+
+    # Price and stock always come fresh from the table, in ranked order
+    rows = {
+        row.id: row
+        for row in db.session.execute(
+            select(*PRODUCT_COLUMNS.values()).where(Product.id.in_(ids))
+        )
+    }
+    return jsonify(
+        serialize_products([rows[pid] for pid in ids if pid in rows], PRODUCT_FIELDS)
+    )
 
 
-@app.route("/products", methods=["POST"])
+@api.route("/products", methods=["POST"])
 @require_auth
 def add_product():
     data = request.get_json()
@@ -257,7 +962,14 @@ def add_product():
     if not name or price is None:
         return jsonify({"error": "Missing name or price"}), 400
 
-    product = Product(name=name, price=price, available_quantity=quantity)
+    price_cents = to_cents(price)
+    if price_cents is None:
+        return (
+            jsonify({"error": "price must be a non-negative amount, max 2 decimals"}),
+            400,
+        )
+
+    product = Product(name=name, price_cents=price_cents, available_quantity=quantity)
     db.session.add(product)
     db.session.commit()
     return jsonify({"message": "✅ Product added", "id": product.id}), 201
@@ -268,7 +980,7 @@ def add_product():
 # ---------------------------
 
 
-@app.route("/users", methods=["POST"])
+@api.route("/users", methods=["POST"])
 def create_user():
     data = request.get_json()
     username = data.get("username")
@@ -284,11 +996,11 @@ def create_user():
     return jsonify({"message": "✅ User created", "id": user.id}), 201
 
 
-@app.route("/users", methods=["GET"])
+@api.route("/users", methods=["GET"])
+@read_only
 def list_users():
-    users = User.query.all()
-    result = [{"id": u.id, "username": u.username, "email": u.email} for u in users]
-    return jsonify(result)
+    rows = db.session.execute(select(User.id, User.username, User.email))
+    return jsonify([UserSchema.from_row(row) for row in rows])
 
 
 # ---------------------------
@@ -296,50 +1008,54 @@ def list_users():
 # ---------------------------
 
 
-@app.route("/cart", methods=["POST"])
+@api.route("/cart", methods=["POST"])
 @require_auth
 def create_or_get_cart_route():
     user_id = request.user_id
     cart, error = get_or_create_active_cart(user_id)
     if error:
         return jsonify({"error": error}), 404
+    db.session.commit()
     return jsonify({"message": "Active cart ready", "cart_id": cart.id}), 200
 
 
-@app.route("/cart/add", methods=["POST"])
+@api.route("/cart/add", methods=["POST"])
 @require_auth
+@idempotent
 def add_to_cart_route():
     user_id = request.user_id
     data = request.get_json()
     product_id = data.get("product_id")
     quantity = data.get("quantity", 1)
 
+    if not isinstance(quantity, int) or quantity < 1:
+        return jsonify({"error": "Quantity must be a positive integer"}), 400
+
     cart, error = get_or_create_active_cart(user_id)
     if error:
         return jsonify({"error": error}), 404
 
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({"error": "Product not found"}), 404
+    if not reserve_stock(product_id, quantity):
+        db.session.rollback()
+        if not db.session.get(Product, product_id):
+            return jsonify({"error": "Product not found"}), 404
+        return jsonify({"error": "Not enough stock"}), 409
 
-    if product.available_quantity < quantity:
-        return jsonify({"error": "Not enough stock"}), 400
-
-    cart_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product.id).first()
+    cart_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product_id).first()
 
     if cart_item:
         cart_item.quantity += quantity
     else:
-        cart_item = CartItem(cart_id=cart.id, product_id=product.id, quantity=quantity)
+        cart_item = CartItem(cart_id=cart.id, product_id=product_id, quantity=quantity)
         db.session.add(cart_item)
 
-    product.available_quantity -= quantity
     db.session.commit()
+    record_write(user_id)
 
     return jsonify({"message": "Item added"}), 200
 
 
-@app.route("/cart/remove", methods=["POST"])
+@api.route("/cart/remove", methods=["POST"])
 @require_auth
 def remove_from_cart_route():
     user_id = request.user_id
@@ -347,113 +1063,237 @@ def remove_from_cart_route():
     product_id = data.get("product_id")
     quantity = data.get("quantity", 1)
 
+    if not isinstance(quantity, int) or quantity < 1:
+        return jsonify({"error": "Quantity must be a positive integer"}), 400
+
     cart = get_active_cart(user_id)
     if not cart:
         return jsonify({"error": "Cart expired"}), 410
 
-    product = Product.query.get(product_id)
-    if not product:
-        return jsonify({"error": "Product not found"}), 404
-
-    cart_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product.id).first()
+    cart_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product_id).first()
     if not cart_item:
+        if not db.session.get(Product, product_id):
+            return jsonify({"error": "Product not found"}), 404
         return jsonify({"error": "Item not in cart"}), 404
 
     # ---- Update or remove item ----
     if quantity >= cart_item.quantity:
-        product.available_quantity += cart_item.quantity
+        release_stock(product_id, cart_item.quantity)
         db.session.delete(cart_item)
         action_msg = "Item removed"
     else:
         cart_item.quantity -= quantity
-        product.available_quantity += quantity
+        release_stock(product_id, quantity)
         action_msg = f"Reduced by {quantity}"
+    db.session.flush()
 
-    db.session.commit()
+    # ---- Delete cart if empty (same transaction, still under the cart lock) ----
+    remaining = db.session.scalar(
+        select(func.count()).select_from(CartItem).where(CartItem.cart_id == cart.id)
+    )
+    if not remaining:
+        db.session.execute(delete(Cart).where(Cart.id == cart.id))
+        action_msg = "Cart is now empty and has been removed"
 
-    # ---- NEW: Delete cart if empty ----
-    # Note: refresh the relationship after commit
-    if len(cart.items) == 0:
-        db.session.delete(cart)
-        db.session.commit()
-        return jsonify({"message": "Cart is now empty and has been removed"}), 200
+    db.session.commit()
+    record_write(user_id)
 
     return jsonify({"message": action_msg}), 200
 
 
-@app.route("/cart", methods=["GET"])
+@api.route("/cart/items", methods=["POST"])
 @require_auth
-def view_cart_route():
+def update_cart_items_route():
+    """
+    Apply many cart changes at once:
+      {"items": [{"product_id": 1, "quantity": 2}, {"product_id": 3, "quantity": -1}]}
+    Positive quantities add (and reserve stock), negative ones remove.
+
+    All product rows are locked with one query and the cart items are
+    updated in bulk. The batch is atomic: if any line fails nothing is
+    applied and the per-line results explain why (409).
+    """
     user_id = request.user_id
-    cart = get_active_cart(user_id)
+    data = request.get_json()
+    lines = data.get("items") if isinstance(data, dict) else None
+
+    if not isinstance(lines, list) or not lines:
+        return jsonify({"error": "items must be a non-empty list"}), 400
+    batch_max = current_app.config["CART_BATCH_MAX"]
+    if len(lines) > batch_max:
+        return jsonify({"error": f"At most {batch_max} items per request"}), 400
+
+    deltas = {}
+    for line in lines:
+        product_id = line.get("product_id") if isinstance(line, dict) else None
+        quantity = line.get("quantity") if isinstance(line, dict) else None
+        if not isinstance(product_id, int) or not isinstance(quantity, int):
+            return (
+                jsonify({"error": "Each item needs integer product_id and quantity"}),
+                400,
+            )
+        deltas[product_id] = deltas.get(product_id, 0) + quantity
+    deltas = {pid: q for pid, q in deltas.items() if q != 0}
+    if not deltas:
+        return jsonify({"error": "Nothing to change"}), 400
 
-    if not cart:
-        return (
-            jsonify({"items": [], "total": 0, "expires_in": None, "expires_at": None}),
-            200,
+    cart, error = get_or_create_active_cart(user_id)
+    if error:
+        return jsonify({"error": error}), 404
+
+    # Lock in id order so batches touching the same products cannot deadlock
+    stock = dict(
+        db.session.execute(
+            select(Product.id, Product.available_quantity)
+            .where(Product.id.in_(deltas))
+            .order_by(Product.id)
+            .with_for_update()
+        ).all()
+    )
+    cart_items = {
+        item.product_id: item
+        for item in CartItem.query.filter(
+            CartItem.cart_id == cart.id, CartItem.product_id.in_(deltas)
+        )
+    }
+
+    results = []
+    stock_changes = {}
+    for product_id, delta in deltas.items():
+        result = {"product_id": product_id, "quantity": delta}
+        in_cart = cart_items[product_id].quantity if product_id in cart_items else 0
+
+        if product_id not in stock:
+            result["error"] = "Product not found"
+        elif delta > 0 and stock[product_id] < delta:
+            result["error"] = "Not enough stock"
+        elif delta < 0 and not in_cart:
+            result["error"] = "Item not in cart"
+        else:
+            # Removing more than is in the cart removes the line, like /cart/remove
+            change = max(delta, -in_cart)
+            stock_changes[product_id] = change
+            result["cart_quantity"] = in_cart + change
+
+        result["status"] = "error" if "error" in result else "ok"
+        results.append(result)
+
+    if len(stock_changes) != len(deltas):
+        db.session.rollback()
+        return jsonify({"error": "No changes applied", "results": results}), 409
+
+    db.session.execute(
+        update(Product)
+        .where(Product.id.in_(stock_changes))
+        .values(
+            available_quantity=Product.available_quantity
+            - case(stock_changes, value=Product.id),
+            version=Product.version + 1,
         )
+        .execution_options(synchronize_session=False)
+    )
 
-    now = datetime.now(IST)
-    expires_at = cart.expires_at
-    if expires_at.tzinfo is None:
-        expires_at = expires_at.replace(tzinfo=IST)
+    updated, emptied, added = {}, [], []
+    for product_id, change in stock_changes.items():
+        item = cart_items.get(product_id)
+        if item is None:
+            added.append(
+                {"cart_id": cart.id, "product_id": product_id, "quantity": change}
+            )
+        elif item.quantity + change > 0:
+            updated[item.id] = item.quantity + change
+        else:
+            emptied.append(item.id)
+
+    if updated:
+        db.session.execute(
+            update(CartItem)
+            .where(CartItem.id.in_(updated))
+            .values(quantity=case(updated, value=CartItem.id))
+            .execution_options(synchronize_session=False)
+        )
+    if emptied:
+        db.session.execute(
+            delete(CartItem)
+            .where(CartItem.id.in_(emptied))
+            .execution_options(synchronize_session=False)
+        )
+    if added:
+        db.session.execute(insert(CartItem).values(added))
 
-    remaining = expires_at - now
-    minutes = int(remaining.total_seconds() // 60)
-    seconds = int(remaining.total_seconds() % 60)
+    remaining = db.session.scalar(
+        select(func.count()).select_from(CartItem).where(CartItem.cart_id == cart.id)
+    )
+    if not remaining:
+        db.session.execute(delete(Cart).where(Cart.id == cart.id))
 
-    items = [
-        {
-            "product_id": item.product.id,
-            "product": item.product.name,
-            "price": item.product.price,
-            "quantity": item.quantity,
-            "subtotal": item.quantity * item.product.price,
-        }
-        for item in cart.items
-    ]
-    total = sum(i["subtotal"] for i in items)
+    db.session.commit()
+    record_write(user_id)
 
-    return jsonify(
-        {
-            "items": items,
-            "total": total,
-            "expires_in": f"{minutes}m {seconds}s",
-            "expires_at": expires_at.isoformat(),
-        }
-    )
+    return jsonify({"message": "Cart updated", "results": results}), 200
+
+
+@api.route("/cart", methods=["GET"])
+@require_auth
+@read_only
+def view_cart_route():
+    """
+    Cart contents, prices, subtotals and the total come from one SQL
+    statement. The response carries a weak ETag over the cart's lines, so
+    polling clients sending If-None-Match get a 304 while nothing changed.
+    """
+    now = datetime.now(IST)
+    rows = db.session.execute(cart_view_query(request.user_id, now)).all()
+    etag, body = render_cart(rows, now)
 
+    if etag and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        return response
 
-@app.route("/cart/checkout", methods=["POST"])
+    response = jsonify(body)
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@api.route("/cart/checkout", methods=["POST"])
 @require_auth
+@idempotent
 def checkout_route():
+    """
+    Turn the active cart into an order in a single transaction: the cart
+    row is locked first (so a concurrent add/remove or a second checkout
+    waits), its product rows are locked and priced in one query, the order
+    items are written with one multi-row INSERT and the cart is deleted
+    before commit. A checkout that loses the race for the cart gets a 409.
+    """
     user_id = request.user_id
-    now = datetime.now(IST)
 
     cart = get_active_cart(user_id)
     if not cart:
         return jsonify({"error": "Cart expired"}), 410
 
-    if not cart.items:
-        return jsonify({"error": "Cart is empty"}), 400
+    lines = db.session.execute(checkout_lines_query(cart.id)).all()
 
-    total_amount = sum(item.quantity * item.product.price for item in cart.items)
+    if not lines:
+        return jsonify({"error": "Cart is empty"}), 400
 
-    order = Order(user_id=user_id, total_amount=total_amount)
+    # Summed by the database in integer cents over the rows locked above
+    order = Order(user_id=user_id, total_cents=cart_total_cents(cart.id))
     db.session.add(order)
-    db.session.commit()
+    db.session.flush()
 
-    for item in cart.items:
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=item.product_id,
-            quantity=item.quantity,
-            price_at_order=item.product.price,
-        )
-        db.session.add(order_item)
+    db.session.execute(insert(OrderItem).values(order_item_rows(order.id, lines)))
 
-    db.session.delete(cart)
+    db.session.execute(delete(CartItem).where(CartItem.cart_id == cart.id))
+    deleted = db.session.execute(delete(Cart).where(Cart.id == cart.id)).rowcount
+    if deleted != 1:
+        db.session.rollback()
+        return jsonify({"error": "Cart was already checked out"}), 409
     db.session.commit()
+    # Let the user read their new order from the primary until replicas catch up
+    record_write(user_id)
 
     return jsonify({"message": "Order placed", "order_id": order.id}), 200
 
@@ -463,37 +1303,207 @@ def checkout_route():
 # ---------------------------
 
 
-@app.route("/orders", methods=["GET"])
+@api.route("/orders", methods=["GET"])
 @require_auth
+@read_only
 def get_orders_route():
-    user_id = request.user_id
+    """
+    Order history, newest first.
+
+    Query params:
+      limit  - page size (max ORDERS_PAGE_MAX); omit for the full history
+      before - cursor from the X-Next-Cursor header of the previous page
+      from / to - ISO date(time) range on created_at (IST when naive)
+
+    Items and product names are loaded in one batched query for the whole
+    page, so the statement count does not grow with the number of orders.
+    """
+    query, limit, error = build_orders_query(
+        request.user_id, request.args, current_app.config["ORDERS_PAGE_MAX"]
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    orders = db.session.scalars(query).all()
+    orders, next_cursor = paginate_orders(orders, limit)
+
+    response = jsonify([OrderSchema.from_model(order) for order in orders])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    # Weak ETag of the body: a repeat poll of unchanged history gets a 304
+    response.add_etag(weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+# ---------------------------
+# INTERNAL
+# ---------------------------
+
+
+@internal.before_request
+def check_internal_token():
+    token = current_app.config["INTERNAL_TOKEN"]
+    sent = request.headers.get("X-Internal-Token", "")
+    if token and not hmac.compare_digest(sent.encode(), token.encode()):
+        return jsonify({"error": "Forbidden"}), 403
 
-    orders = (
-        Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
+
+@internal.route("/cart-sweeper", methods=["GET"])
+def cart_sweeper_stats():
+    return jsonify(current_app.extensions["cart_scheduler"].stats())
+
+
+@internal.route("/metrics", methods=["GET"])
+def internal_metrics():
+    extensions = current_app.extensions
+    return jsonify(
+        {
+            "pool": extensions["pool_metrics"].stats(),
+            "token_cache": get_access_token_cache().stats(),
+            "cart_sweeper": extensions["cart_scheduler"].stats(),
+            "replicas": extensions["replica_router"].stats(),
+            "idempotency": extensions["idempotency"].stats(),
+            "compression": extensions["compressor"].stats(),
+            "catalog_snapshots": extensions["catalog_snapshots"].stats(),
+            "requests": extensions["profiler"].stats(),
+        }
     )
-    if not orders:
-        return jsonify([]), 200
-
-    result = []
-    for order in orders:
-        result.append(
-            {
-                "order_id": order.id,
-                "total_amount": order.total_amount,
-                "created_at": order.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                "items": [
-                    {
-                        "product_name": item.product.name,
-                        "price_at_order": item.price_at_order,
-                        "quantity": item.quantity,
-                        "subtotal": item.quantity * item.price_at_order,
-                    }
-                    for item in order.items
-                ],
-            }
+
+
+@internal.route("/profile", methods=["GET"])
+def request_profile_stats():
+    return jsonify(current_app.extensions["profiler"].stats())
+
+
+@api.cli.command("sweep-carts")
+@click.option("--loop", is_flag=True, help="Keep sweeping on CART_SWEEP_INTERVAL.")
+def sweep_carts_command(loop):
+    """Release expired carts once, or run the scheduler in the foreground."""
+    if not loop:
+        clear_expired_carts(
+            flask_app=current_app._get_current_object(),
+            batch_size=current_app.config["CART_SWEEP_BATCH"],
         )
+        purged = current_app.extensions["idempotency"].purge_expired()
+        click.echo(f"🔑 Purged {purged} expired idempotency keys")
+        return
 
-    return jsonify(result)
+    cart_scheduler = current_app.extensions["cart_scheduler"]
+    cart_scheduler.start()
+    click.echo(f"🕒 Sweeping expired carts every ~{cart_scheduler.interval:g}s")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        cart_scheduler.stop()
+
+
+# ---------------------------
+# APP FACTORY
+# ---------------------------
+
+
+def create_app(config=None):
+    """
+    Build the API app. `config` is applied over the environment settings,
+    e.g. create_app({"SQLALCHEMY_DATABASE_URI": "sqlite:///test.db"}).
+
+    Nothing here connects to the database or starts threads, so the app can
+    be built once in a preforking server's master (see wsgi.py).
+    """
+    app = Flask(__name__)
+    CORS(app, supports_credentials=True)
+
+    app.config.from_mapping(load_config())
+    if config:
+        app.config.from_mapping(config)
+
+    if not app.config["SECRET_KEY"]:
+        raise Exception("SECRET_KEY missing! Add it to .env")
+
+    app.json = make_json_provider(app, app.config["JSON_BACKEND"])
+
+    # Initialize the database with the app
+    db.init_app(app)
+    migrate.init_app(app, db)
+    app.register_blueprint(api)
+    if app.config["INTERNAL_ENDPOINTS"]:
+        app.register_blueprint(internal)
+
+    config = app.config
+    app.extensions["replica_router"] = ReplicaRouter(
+        sticky_seconds=config["REPLICA_STICKY_SECONDS"],
+        retry_seconds=config["REPLICA_RETRY_SECONDS"],
+    )
+    app.after_request(set_sticky_cookie)
+    app.extensions["password_hasher"] = PasswordHasher(
+        workers=config["PASSWORD_POOL_WORKERS"],
+        max_queue=config["PASSWORD_POOL_QUEUE"],
+        rounds=config["BCRYPT_ROUNDS"],
+        kind=config["PASSWORD_POOL_KIND"],
+        timeout=config["PASSWORD_POOL_TIMEOUT"],
+    )
+    app.extensions["idempotency"] = IdempotencyStore(
+        ttl=config["IDEMPOTENCY_TTL"],
+        maxsize=config["IDEMPOTENCY_CACHE_SIZE"],
+        lock_timeout=config["IDEMPOTENCY_LOCK_SECONDS"],
+        wait_timeout=config["IDEMPOTENCY_WAIT_SECONDS"],
+    )
+
+    app.extensions["search_index"] = ProductSearchIndex(
+        max_age=config["SEARCH_INDEX_MAX_AGE"]
+    )
+
+    compressor = ResponseCompressor(
+        min_size=config["COMPRESS_MIN_SIZE"],
+        level=config["COMPRESS_LEVEL"],
+        br_quality=config["COMPRESS_BR_QUALITY"],
+    )
+    compressor.init_app(app)
+    app.extensions["compressor"] = compressor
+
+    catalog_snapshots = CatalogSnapshots(
+        compressor,
+        maxsize=config["CATALOG_SNAPSHOT_SIZE"],
+        levels={
+            "gzip": config["CATALOG_SNAPSHOT_GZIP_LEVEL"],
+            "br": config["CATALOG_SNAPSHOT_BR_QUALITY"],
+        },
+    )
+    app.extensions["catalog_snapshots"] = catalog_snapshots
+
+    pool_metrics = PoolMetrics()
+    profiler = RequestProfiler(
+        window=config["PROFILE_WINDOW"],
+        duplicate_threshold=config["PROFILE_DUPLICATE_THRESHOLD"],
+        profile_routes=config["PROFILE_ROUTES"],
+        profile_dir=config["PROFILE_DIR"],
+    )
+    app.extensions["pool_metrics"] = pool_metrics
+    app.extensions["profiler"] = profiler
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            pool_metrics.attach(engine, bind_key or PRIMARY_ENGINE)
+        if config["PROFILING"]:
+            profiler.init_app(app, db.engine)
+
+    # Background sweeper for expired carts (see `flask sweep-carts`)
+    def sweep():
+        summary = clear_expired_carts(
+            flask_app=app, verbose=False, batch_size=config["CART_SWEEP_BATCH"]
+        )
+        summary["idempotency_keys"] = app.extensions["idempotency"].purge_expired()
+        return summary
+
+    app.extensions["cart_scheduler"] = CartExpiryScheduler(
+        app,
+        sweep,
+        interval=config["CART_SWEEP_INTERVAL"],
+        jitter=config["CART_SWEEP_JITTER"],
+    )
+    return app
 
 
 # ---------------------------
@@ -501,12 +1511,18 @@ def get_orders_route():
 # ---------------------------
 
 if __name__ == "__main__":
+    app = create_app()
+
     # Optionally create DB tables when running the script directly
     if os.getenv("CREATE_DB") == "1":
         with app.app_context():
             db.create_all()
             print("✅ Database tables created successfully!")
 
+    # Sweep expired carts in the background (only in the reloader's child process)
+    if os.getenv("CART_SCHEDULER") == "1" and os.getenv("WERKZEUG_RUN_MAIN") == "true":
+        app.extensions["cart_scheduler"].start()
+
     # Bind to the hostname 'localhost' (instead of the default 127.0.0.1)
     # You can also use host='0.0.0.0' to listen on all interfaces.
     app.run(host="localhost", debug=True)
@@ -0,0 +1,556 @@
+"""
+ASGI entry point.
+
+    uvicorn asgi:application --workers 4
+
+The catalog, cart and order routes are served by async Quart views on
+SQLAlchemy's asyncio engine, so a request waiting on the database holds a
+coroutine instead of a thread. Every other route (auth, users, search,
+/cart/items, internal), and any request carrying an Idempotency-Key, falls
+through to the sync Flask app in app.py, which runs on a bounded thread pool.
+
+Read-only async views go through the app's ReplicaRouter like their Flask
+counterparts: each replica bind gets its own AsyncEngine, sticky users read
+from the primary, and a failing replica is marked down and the request
+replayed on the primary.
+
+Needs: pip install -r requirements-async.txt. ASYNC_DATABASE_URL overrides
+the URL derived from DATABASE_URL, e.g. to drop psycopg2-only query params.
+"""
+
+import os
+from datetime import datetime
+from functools import wraps
+from a2wsgi import WSGIMiddleware
+from quart import Quart, g, jsonify, request
+from quart.wrappers.response import DataBody, IterableBody
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.exc import IntegrityError, OperationalError
+from werkzeug.exceptions import HTTPException
+from app import (
+    IST,
+    active_cart_query,
+    build_orders_query,
+    build_product_query,
+    catalog_page_key,
+    cart_is_active,
+    cart_total_cents,
+    cart_view_query,
+    checkout_lines_query,
+    create_app,
+    expired_cart_ids,
+    latest_cart_query,
+    order_item_rows,
+    page_validators,
+    paginate_orders,
+    release_stock_statement,
+    render_cart,
+    reserve_stock_statement,
+    serialize_products,
+    set_catalog_validators,
+    snapshot_response,
+)
+from clear_expiry_cart import release_cart_statements
+from models import Cart, CartItem, Order, OrderItem, Product, User
+from utils.async_db import make_async_session_factory
+from utils.catalog_cache import catalog_revision_query, not_modified
+from utils.json_provider import make_json_provider
+from utils.read_replica import REPLICA_BIND_PREFIX, STICKY_COOKIE
+from utils.schemas import OrderSchema
+from utils.jwt_utils import decode_jwt
+
+flask_app = create_app()
+async_app = Quart(__name__, static_folder=None)
+async_app.config.from_mapping(flask_app.config)
+async_app.json = make_json_provider(async_app, async_app.config["JSON_BACKEND"])
+
+# Shared with the Flask app, so stats and read-your-writes cover both halves
+compressor = flask_app.extensions["compressor"]
+catalog_snapshots = flask_app.extensions["catalog_snapshots"]
+replica_router = flask_app.extensions["replica_router"]
+
+engine, Session = make_async_session_factory(
+    os.getenv("ASYNC_DATABASE_URL") or flask_app.config["SQLALCHEMY_DATABASE_URI"],
+    **flask_app.config["SQLALCHEMY_ENGINE_OPTIONS"],
+)
+# bind key -> (engine, sessionmaker) for each replica_<n> bind
+replica_sessions = {
+    key: make_async_session_factory(
+        url, **flask_app.config["SQLALCHEMY_ENGINE_OPTIONS"]
+    )
+    for key, url in (flask_app.config.get("SQLALCHEMY_BINDS") or {}).items()
+    if key.startswith(REPLICA_BIND_PREFIX)
+}
+
+# Sync routes run on this many threads; async routes are not limited by it
+sync_app = WSGIMiddleware(flask_app, workers=int(os.getenv("ASGI_SYNC_THREADS", 10)))
+
+
+@async_app.after_serving
+async def dispose_engine():
+    await engine.dispose()
+    for replica_engine, _ in replica_sessions.values():
+        await replica_engine.dispose()
+
+
+def read_session():
+    """A session on the replica chosen by read_only, else on the primary."""
+    return g.get("read_session", Session)()
+
+
+def read_only(view):
+    """Async side of utils.read_replica.read_only (same router and fallback)."""
+
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        with flask_app.app_context():
+            key = replica_router.choose(
+                getattr(request, "user_id", None), request.cookies.get(STICKY_COOKIE)
+            )
+        if key is None:
+            return await view(*args, **kwargs)
+
+        g.read_session = replica_sessions[key][1]
+        try:
+            return await view(*args, **kwargs)
+        except OperationalError:
+            # Replica unreachable: forget it for a while and use the primary
+            replica_router.mark_down(key)
+            g.read_session = Session
+            return await view(*args, **kwargs)
+
+    return wrapper
+
+
+def record_write(user_id):
+    """Async side of utils.read_replica.record_write."""
+    replica_router.record_write(user_id)
+    g.replica_sticky_user = user_id
+
+
+@async_app.after_request
+async def set_sticky_cookie(response):
+    user_id = g.pop("replica_sticky_user", None)
+    if user_id is None:
+        return response
+    with flask_app.app_context():
+        if not replica_router.replica_keys():
+            return response
+    return replica_router.set_sticky_cookie(response, flask_app.secret_key, user_id)
+
+
+@async_app.after_request
+async def compress_response(response):
+    """Quart side of ResponseCompressor (same threshold, levels and stats)."""
+    if not compressor.compressible(response):
+        return response
+
+    if isinstance(response.response, DataBody):
+        data = await response.get_data()
+        if len(data) < compressor.min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = compressor.negotiate(request.accept_encodings)
+        if encoding:
+            body = compressor.compress(data, encoding)
+            response.set_data(body)
+            response.headers["Content-Encoding"] = encoding
+            compressor.record(len(data), len(body))
+        return response
+
+    if isinstance(response.response, IterableBody):
+        response.vary.add("Accept-Encoding")
+        encoding = compressor.negotiate(request.accept_encodings)
+        if encoding:
+            response.response = IterableBody(
+                compress_chunks(response.response.iter, encoding)
+            )
+            response.headers["Content-Encoding"] = encoding
+            response.headers.pop("Content-Length", None)
+    return response
+
+
+async def compress_chunks(chunks, encoding):
+    stream = compressor.stream(encoding)
+    size_in = size_out = 0
+    try:
+        async for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode()
+            size_in += len(chunk)
+            out = stream.compress(chunk)
+            if out:
+                size_out += len(out)
+                yield out
+        out = stream.finish()
+        size_out += len(out)
+        yield out
+        compressor.record(size_in, size_out, streamed=True)
+    finally:
+        # Closes the wrapped generator, which closes its session
+        await chunks.aclose()
+
+
+def require_auth(f):
+    @wraps(f)
+    async def wrapper(*args, **kwargs):
+        token = request.headers.get("Authorization")
+
+        if not token:
+            return jsonify({"error": "Missing token"}), 401
+
+        if token.startswith("Bearer "):
+            token = token.split(" ")[1]
+
+        # Shares the Flask app's verified-token cache
+        with flask_app.app_context():
+            payload = decode_jwt(token)
+        if not payload:
+            return jsonify({"error": "Invalid or expired token"}), 401
+
+        request.user_id = payload["user_id"]
+        return await f(*args, **kwargs)
+
+    return wrapper
+
+
+# ---------------------------
+# HELPER FUNCTIONS
+# ---------------------------
+async def get_or_create_active_cart(session, user_id, attempts=3):
+    """
+    Async get_or_create_active_cart (same statements, caller's transaction,
+    same rollback and retry when a concurrent request created the cart).
+    """
+    for attempt in range(attempts):
+        now = datetime.now(IST)
+
+        cart = await session.scalar(latest_cart_query(user_id).with_for_update())
+        if cart is not None and cart_is_active(cart, now):
+            return cart, None
+
+        if cart is None:
+            if await session.get(User, user_id) is None:
+                return None, "User not found"
+        else:
+            expired = (await session.scalars(expired_cart_ids(user_id, now))).all()
+            if expired:
+                for statement in release_cart_statements(expired):
+                    await session.execute(statement)
+            session.expunge(cart)
+
+        new_cart = Cart(user_id=user_id)
+        session.add(new_cart)
+        try:
+            await session.flush()
+        except IntegrityError:
+            await session.rollback()
+            if attempt == attempts - 1:
+                raise
+            continue
+        return new_cart, None
+
+
+# ---------------------------
+# PRODUCTS
+# ---------------------------
+
+
+@async_app.route("/products", methods=["GET"])
+@read_only
+async def get_products():
+    """Async GET /products; same params and response as the Flask view."""
+    query, fields, limit, error = build_product_query(
+        request.args, async_app.config["PRODUCTS_PAGE_MAX"]
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    session = read_session()
+    etag = last_modified = None
+    if limit is not None:
+        try:
+            stamp = (await session.execute(catalog_revision_query(query, limit))).one()
+        except Exception:
+            await session.close()
+            raise
+        etag, last_modified = page_validators(stamp, request.args)
+        if not_modified(request, etag, last_modified):
+            await session.close()
+            response = async_app.response_class("", status=304)
+            return set_catalog_validators(response, etag, last_modified)
+
+    next_cursor = None
+    if limit is not None and limit <= async_app.config["PRODUCTS_STREAM_THRESHOLD"]:
+        async with session:
+            key = catalog_page_key(request.args)
+            snapshot = key and catalog_snapshots.get(key, etag)
+            if not snapshot:
+                rows = (await session.execute(query.limit(limit + 1))).all()
+        if snapshot:
+            encoding = catalog_snapshots.encoding_for(
+                snapshot, request.accept_encodings
+            )
+            response = snapshot_response(snapshot, encoding, async_app.response_class)
+            return set_catalog_validators(response, etag, last_modified)
+
+        next_cursor = rows[limit - 1].id if len(rows) > limit else None
+        response = jsonify(serialize_products(rows[:limit], fields))
+        if key:
+            snapshot = catalog_snapshots.put(
+                key, etag, last_modified, next_cursor, await response.get_data()
+            )
+            encoding = catalog_snapshots.encoding_for(
+                snapshot, request.accept_encodings
+            )
+            response = snapshot_response(snapshot, encoding, async_app.response_class)
+            return set_catalog_validators(response, etag, last_modified)
+    else:
+        try:
+            if limit:
+                ids = (
+                    await session.execute(
+                        query.with_only_columns(Product.id).offset(limit - 1).limit(2)
+                    )
+                ).all()
+                next_cursor = ids[0].id if len(ids) == 2 else None
+                query = query.limit(limit)
+            rows = await session.stream(
+                query.execution_options(
+                    yield_per=async_app.config["PRODUCTS_STREAM_CHUNK"]
+                )
+            )
+        except Exception:
+            await session.close()
+            raise
+        response = async_app.response_class(
+            stream_product_rows(session, rows, fields), mimetype="application/json"
+        )
+
+    if next_cursor is not None:
+        response.headers["X-Next-Cursor"] = str(next_cursor)
+    return set_catalog_validators(response, etag, last_modified)
+
+
+async def stream_product_rows(session, rows, fields):
+    """Yield a JSON array in chunks; closes the session when done."""
+    try:
+        yield "["
+        first = True
+        async for partition in rows.partitions():
+            chunk = async_app.json.dumps(
+                serialize_products(partition, fields), separators=(",", ":")
+            )[1:-1]
+            yield chunk if first else "," + chunk
+            first = False
+        yield "]"
+    finally:
+        await rows.close()
+        await session.close()
+
+
+# ---------------------------
+# CART
+# ---------------------------
+
+
+@async_app.route("/cart/add", methods=["POST"])
+@require_auth
+async def add_to_cart_route():
+    user_id = request.user_id
+    data = await request.get_json()
+    product_id = data.get("product_id")
+    quantity = data.get("quantity", 1)
+
+    if not isinstance(quantity, int) or quantity < 1:
+        return jsonify({"error": "Quantity must be a positive integer"}), 400
+
+    async with Session() as session:
+        cart, error = await get_or_create_active_cart(session, user_id)
+        if error:
+            return jsonify({"error": error}), 404
+
+        result = await session.execute(reserve_stock_statement(product_id, quantity))
+        if result.rowcount != 1:
+            await session.rollback()
+            if not await session.get(Product, product_id):
+                return jsonify({"error": "Product not found"}), 404
+            return jsonify({"error": "Not enough stock"}), 409
+
+        cart_item = await session.scalar(
+            select(CartItem).where(
+                CartItem.cart_id == cart.id, CartItem.product_id == product_id
+            )
+        )
+        if cart_item:
+            cart_item.quantity += quantity
+        else:
+            session.add(
+                CartItem(cart_id=cart.id, product_id=product_id, quantity=quantity)
+            )
+
+        await session.commit()
+    record_write(user_id)
+
+    return jsonify({"message": "Item added"}), 200
+
+
+@async_app.route("/cart/remove", methods=["POST"])
+@require_auth
+async def remove_from_cart_route():
+    user_id = request.user_id
+    data = await request.get_json()
+    product_id = data.get("product_id")
+    quantity = data.get("quantity", 1)
+
+    if not isinstance(quantity, int) or quantity < 1:
+        return jsonify({"error": "Quantity must be a positive integer"}), 400
+
+    async with Session() as session:
+        cart = await session.scalar(active_cart_query(user_id, datetime.now(IST)))
+        if not cart:
+            return jsonify({"error": "Cart expired"}), 410
+
+        cart_item = await session.scalar(
+            select(CartItem).where(
+                CartItem.cart_id == cart.id, CartItem.product_id == product_id
+            )
+        )
+        if not cart_item:
+            if not await session.get(Product, product_id):
+                return jsonify({"error": "Product not found"}), 404
+            return jsonify({"error": "Item not in cart"}), 404
+
+        if quantity >= cart_item.quantity:
+            await session.execute(
+                release_stock_statement(product_id, cart_item.quantity)
+            )
+            await session.delete(cart_item)
+            action_msg = "Item removed"
+        else:
+            cart_item.quantity -= quantity
+            await session.execute(release_stock_statement(product_id, quantity))
+            action_msg = f"Reduced by {quantity}"
+        await session.flush()
+
+        remaining = await session.scalar(
+            select(func.count())
+            .select_from(CartItem)
+            .where(CartItem.cart_id == cart.id)
+        )
+        if not remaining:
+            await session.execute(delete(Cart).where(Cart.id == cart.id))
+            action_msg = None
+
+        await session.commit()
+    record_write(user_id)
+
+    if action_msg is None:
+        return jsonify({"message": "Cart is now empty and has been removed"}), 200
+    return jsonify({"message": action_msg}), 200
+
+
+@async_app.route("/cart", methods=["GET"])
+@require_auth
+@read_only
+async def view_cart_route():
+    """Async GET /cart; same body and weak ETag as the Flask view."""
+    now = datetime.now(IST)
+    async with read_session() as session:
+        rows = (await session.execute(cart_view_query(request.user_id, now))).all()
+    etag, body = render_cart(rows, now)
+
+    if etag and request.if_none_match.contains_weak(etag):
+        response = async_app.response_class("", status=304)
+        response.set_etag(etag, weak=True)
+        return response
+
+    response = jsonify(body)
+    if etag:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+@async_app.route("/cart/checkout", methods=["POST"])
+@require_auth
+async def checkout_route():
+    user_id = request.user_id
+
+    async with Session() as session:
+        cart = await session.scalar(active_cart_query(user_id, datetime.now(IST)))
+        if not cart:
+            return jsonify({"error": "Cart expired"}), 410
+
+        lines = (await session.execute(checkout_lines_query(cart.id))).all()
+        if not lines:
+            return jsonify({"error": "Cart is empty"}), 400
+
+        order = Order(user_id=user_id, total_cents=cart_total_cents(cart.id))
+        session.add(order)
+        await session.flush()
+
+        await session.execute(
+            insert(OrderItem).values(order_item_rows(order.id, lines))
+        )
+        await session.execute(delete(CartItem).where(CartItem.cart_id == cart.id))
+        result = await session.execute(delete(Cart).where(Cart.id == cart.id))
+        if result.rowcount != 1:
+            await session.rollback()
+            return jsonify({"error": "Cart was already checked out"}), 409
+        await session.commit()
+    record_write(user_id)
+
+    return jsonify({"message": "Order placed", "order_id": order.id}), 200
+
+
+# ---------------------------
+# ORDERS
+# ---------------------------
+
+
+@async_app.route("/orders", methods=["GET"])
+@require_auth
+@read_only
+async def get_orders_route():
+    query, limit, error = build_orders_query(
+        request.user_id, request.args, async_app.config["ORDERS_PAGE_MAX"]
+    )
+    if error:
+        return jsonify({"error": error}), 400
+
+    async with read_session() as session:
+        orders = (await session.scalars(query)).all()
+    orders, next_cursor = paginate_orders(orders, limit)
+
+    response = jsonify([OrderSchema.from_model(order) for order in orders])
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    await response.add_etag(weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return await response.make_conditional(request)
+
+
+# ---------------------------
+# DISPATCH
+# ---------------------------
+async_routes = async_app.url_map.bind("localhost")
+
+
+def is_async_route(scope):
+    # Idempotent retries are handled by the sync views (utils.idempotency)
+    if any(name == b"idempotency-key" for name, _ in scope["headers"]):
+        return False
+    try:
+        async_routes.match(scope["path"], method=scope["method"])
+    except HTTPException:
+        return False
+    return True
+
+
+async def application(scope, receive, send):
+    """Send async routes to Quart and every other HTTP request to Flask."""
+    if scope["type"] == "http" and not is_async_route(scope):
+        await sync_app(scope, receive, send)
+    else:
+        await async_app(scope, receive, send)
@@ -0,0 +1,707 @@
+"""
+Endpoint benchmarks against a throwaway SQLite database.
+
+Each benchmark builds the API with create_app(), seeds the rows it needs
+and drives requests through the Flask test client (no network, so the
+numbers are the app's own cost). Where a change replaced older code, that
+code path is kept here as a /legacy route (adapted to the current schema)
+and timed next to the current one:
+
+    python bench_api.py catalog --rows 100000
+
+Reported per case: mean / p50 / p99 latency over --repeat requests and the
+SQL statements one request runs.
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from bcrypt import gensalt, hashpw
+from flask import Blueprint, jsonify, request
+from sqlalchemy import delete, event, func, insert, select, update
+from app import IST, create_app
+from clear_expiry_cart import sweep_expired_batch
+from database import db
+from models import Cart, CartItem, Order, OrderItem, Product, User
+from utils.auth_middleware import require_auth
+from utils.jwt_utils import create_access_token
+from utils.token_cache import TokenCache
+from utils.money import from_cents
+
+legacy = Blueprint("legacy", __name__, url_prefix="/legacy")
+
+# name -> (run(app, args), help, {option: default})
+BENCHMARKS = {}
+
+
+def benchmark(name, help, **options):
+    """Register run(app, args) as `bench_api.py <name>` with --<option> flags."""
+
+    def register(run):
+        BENCHMARKS[name] = (run, help, options)
+        return run
+
+    return register
+
+
+def make_app(directory):
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{directory}/bench.db",
+            "SQLALCHEMY_BINDS": {},
+            "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"timeout": 30}},
+            "SECRET_KEY": "bench-secret",
+            "REFRESH_SECRET_KEY": "bench-refresh-secret",
+            "BCRYPT_ROUNDS": 4,
+        }
+    )
+    app.register_blueprint(legacy)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def seed_products(app, count, stock=1_000_000, batch=50_000, name="Product {}".format):
+    with app.app_context():
+        for start in range(0, count, batch):
+            db.session.execute(
+                insert(Product),
+                [
+                    {
+                        "name": name(i),
+                        "price_cents": 100_00 + i * 7919 % 5000_00,
+                        "available_quantity": stock,
+                        "version": 1,
+                    }
+                    for i in range(start, min(start + batch, count))
+                ],
+            )
+        db.session.commit()
+
+
+def seed_user(app, username="bench"):
+    """Insert a user; returns (user_id, Authorization header)."""
+    with app.app_context():
+        user = User(
+            username=username,
+            email=f"{username}@example.com",
+            password_hash=hashpw(b"bench", gensalt(4)).decode(),
+        )
+        db.session.add(user)
+        db.session.commit()
+        return user.id, {"Authorization": f"Bearer {create_access_token(user.id)}"}
+
+
+def fill_cart(app, user_id, product_ids, quantity=1):
+    """Give the user a fresh active cart holding `product_ids` (no stock taken)."""
+    with app.app_context():
+        cart = Cart(user_id=user_id)
+        cart.items = [
+            CartItem(product_id=pid, quantity=quantity) for pid in product_ids
+        ]
+        db.session.add(cart)
+        db.session.commit()
+
+
+@contextmanager
+def sql_statements(app):
+    """Collect the SQL statements run inside the block."""
+    with app.app_context():
+        engine = db.engine
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+
+def measure(app, request, repeat, setup=None):
+    """
+    Time `request()` `repeat` times (after `setup()` when given, untimed).
+    Returns (seconds per call, statements in the last call).
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        with sql_statements(app) as statements:
+            started = time.perf_counter()
+            request()
+            timings.append(time.perf_counter() - started)
+    return timings, len(statements)
+
+
+def report(name, timings, statements, extra=""):
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, round(0.99 * (len(ordered) - 1)))]
+    print(
+        f"  {name:<28} mean {statistics.fmean(ordered) * 1000:9.2f}  "
+        f"p50 {statistics.median(ordered) * 1000:9.2f}  p99 {p99 * 1000:9.2f} ms  "
+        f"{statements:>4} stmts{extra}"
+    )
+
+
+def peak_memory_mb(request):
+    """Peak Python heap allocated while running request() once."""
+    tracemalloc.start()
+    try:
+        request()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def get(client, path, headers=None, status=200):
+    """GET path and read the whole (possibly streamed) body."""
+    response = client.get(path, headers=headers)
+    body = response.get_data()
+    assert response.status_code == status, (path, response.status_code, body[:200])
+    return body
+
+
+def post(client, path, json=None, headers=None, status=200):
+    response = client.post(path, json=json, headers=headers)
+    assert response.status_code == status, (path, response.status_code, response.data)
+    return response
+
+
+# ---------------------------
+# CATALOG (user-001)
+# ---------------------------
+
+
+@legacy.route("/products", methods=["GET"])
+def legacy_products():
+    """The original GET /products: every row as ORM objects, one JSON list."""
+    products = Product.query.all()
+    return jsonify(
+        [
+            {
+                "id": p.id,
+                "name": p.name,
+                "price": from_cents(p.price_cents),
+                "available_quantity": p.available_quantity,
+            }
+            for p in products
+        ]
+    )
+
+
+@benchmark(
+    "catalog",
+    "full-table dump vs keyset pages and the streamed catalog",
+    rows=100_000,
+    repeat=5,
+)
+def bench_catalog(app, args):
+    seed_products(app, args.rows)
+    client = app.test_client()
+    middle = args.rows // 2
+    cases = {
+        "legacy full dump": "/legacy/products",
+        "streamed full catalog": "/products",
+        "page of 100": "/products?limit=100",
+        f"page of 100 after {middle}": f"/products?after={middle}&limit=100",
+        "filtered page of 100": "/products?limit=100&min_price=500&in_stock=1",
+        "page of 1000 (streamed)": "/products?limit=1000",
+    }
+
+    print(f"📊 GET /products over {args.rows} products, {args.repeat} requests each")
+    for name, path in cases.items():
+        size = len(get(client, path))
+        timings, statements = measure(app, lambda: get(client, path), args.repeat)
+        memory = peak_memory_mb(lambda: get(client, path))
+        report(
+            name,
+            timings,
+            statements,
+            f"  {size / 1024:9.0f} KiB  {memory:7.1f} MiB peak",
+        )
+
+
+# ---------------------------
+# CHECKOUT (user-004)
+# ---------------------------
+
+
+@legacy.route("/cart/checkout", methods=["POST"])
+@require_auth
+def legacy_checkout():
+    """
+    The original checkout: commit the order for its id, then one OrderItem
+    per line with the price read through the lazy item.product.
+    """
+    cart = Cart.query.filter_by(user_id=request.user_id).first()
+    if not cart or not cart.items:
+        return jsonify({"error": "Cart is empty"}), 400
+
+    total = sum(item.quantity * item.product.price_cents for item in cart.items)
+    order = Order(user_id=request.user_id, total_cents=total)
+    db.session.add(order)
+    db.session.commit()
+
+    for item in cart.items:
+        db.session.add(
+            OrderItem(
+                order_id=order.id,
+                product_id=item.product_id,
+                quantity=item.quantity,
+                price_at_order_cents=item.product.price_cents,
+            )
+        )
+    db.session.delete(cart)
+    db.session.commit()
+    return jsonify({"message": "Order placed", "order_id": order.id}), 200
+
+
+@benchmark(
+    "checkout",
+    "per-line ORM checkout vs the single-transaction bulk checkout",
+    items=50,
+    repeat=50,
+)
+def bench_checkout(app, args):
+    product_ids = list(range(1, args.items + 1))
+    seed_products(app, args.items)
+    user_id, auth = seed_user(app)
+    client = app.test_client()
+
+    print(
+        f"📊 POST /cart/checkout of a {args.items}-item cart, {args.repeat} orders each"
+    )
+    for name, path in (
+        ("legacy checkout", "/legacy/cart/checkout"),
+        ("bulk checkout", "/cart/checkout"),
+    ):
+        timings, statements = measure(
+            app,
+            lambda: post(client, path, headers=auth),
+            args.repeat,
+            setup=lambda: fill_cart(app, user_id, product_ids),
+        )
+        report(name, timings, statements)
+
+
+# ---------------------------
+# AUTH (user-005)
+# ---------------------------
+
+
+@benchmark(
+    "auth",
+    "require_auth with the verified-token cache vs JWT_CACHE_SIZE=0",
+    calls=20_000,
+    repeat=5,
+)
+def bench_auth(app, args):
+    """
+    Time require_auth around a no-op view inside one request context (the
+    header is swapped per call), so only the token check is measured.
+    """
+    view = require_auth(lambda: None)
+    with app.app_context():
+        tokens = [f"Bearer {create_access_token(i)}" for i in range(args.calls)]
+
+    def run(token_for):
+        timings = []
+        with app.test_request_context():
+            environ = request.environ
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                for i in range(args.calls):
+                    environ["HTTP_AUTHORIZATION"] = token_for(i)
+                    view()
+                timings.append((time.perf_counter() - started) / args.calls)
+        return timings
+
+    print(f"📊 require_auth, {args.calls} calls x {args.repeat}, µs per call")
+    cases = (
+        ("cache, same token", TokenCache(10_000), lambda i: tokens[0]),
+        ("cache, every lookup a miss", TokenCache(1), lambda i: tokens[i]),
+        ("no cache (JWT_CACHE_SIZE=0)", TokenCache(0), lambda i: tokens[0]),
+    )
+    for name, cache, token_for in cases:
+        app.extensions["access_token_cache"] = cache
+        timings = run(token_for)
+        print(
+            f"  {name:<28} mean {statistics.fmean(timings) * 1e6:7.1f}  "
+            f"p50 {statistics.median(timings) * 1e6:7.1f} µs"
+        )
+
+
+# ---------------------------
+# EXPIRED CART SWEEP (user-007)
+# ---------------------------
+
+
+def seed_shoppers(app, count, batch=50_000):
+    """Insert `count` users (unusable password hashes); returns their ids."""
+    with app.app_context():
+        first_id = (db.session.scalar(select(func.max(User.id))) or 0) + 1
+        for start in range(0, count, batch):
+            db.session.execute(
+                insert(User),
+                [
+                    {
+                        "id": first_id + i,
+                        "username": f"shopper{first_id + i}",
+                        "email": f"shopper{first_id + i}@example.com",
+                        "password_hash": "!",
+                    }
+                    for i in range(start, min(start + batch, count))
+                ],
+            )
+        db.session.commit()
+    return range(first_id, first_id + count)
+
+
+def seed_expired_carts(app, user_ids, items_per_cart, products, batch=50_000):
+    """
+    Give each user (one cart per user) a cart that expired an hour ago,
+    with `items_per_cart` lines.
+    """
+    expired = datetime.now(IST) - timedelta(hours=1)
+    carts = len(user_ids)
+    with app.app_context():
+        first_id = (db.session.scalar(select(func.max(Cart.id))) or 0) + 1
+        for start in range(0, carts, batch):
+            ids = range(first_id + start, first_id + min(start + batch, carts))
+            db.session.execute(
+                insert(Cart),
+                [
+                    {
+                        "id": cart_id,
+                        "user_id": user_ids[cart_id - first_id],
+                        "created_at": expired,
+                        "expires_at": expired,
+                    }
+                    for cart_id in ids
+                ],
+            )
+            db.session.execute(
+                insert(CartItem),
+                [
+                    {
+                        "cart_id": cart_id,
+                        "product_id": (cart_id + line) % products + 1,
+                        "quantity": 1,
+                    }
+                    for cart_id in ids
+                    for line in range(items_per_cart)
+                ],
+            )
+        db.session.commit()
+
+
+def legacy_clear_expired_carts(now):
+    """The original sweep: load every expired cart, restock per item, delete."""
+    expired_carts = Cart.query.filter(Cart.expires_at <= now).all()
+    with db.session.no_autoflush:
+        for cart in expired_carts:
+            for item in cart.items:
+                item.product.available_quantity += item.quantity
+            db.session.delete(cart)
+    db.session.commit()
+    return len(expired_carts)
+
+
+def total_stock(app):
+    with app.app_context():
+        return db.session.scalar(select(func.sum(Product.available_quantity)))
+
+
+@benchmark(
+    "sweep",
+    "per-object expired cart cleanup vs the set-based batched sweep",
+    carts=100_000,
+    items=2,
+    products=1000,
+    batch_size=1000,
+)
+def bench_sweep(app, args):
+    seed_products(app, args.products)
+    user_ids = seed_shoppers(app, args.carts)
+    stock = total_stock(app)
+    released = args.carts * args.items
+
+    print(
+        f"📊 Releasing {args.carts} expired carts ({args.items} items each) "
+        f"over {args.products} products"
+    )
+
+    seed_expired_carts(app, user_ids, args.items, args.products)
+    with app.app_context(), sql_statements(app) as statements:
+        started = time.perf_counter()
+        carts = legacy_clear_expired_carts(datetime.now(IST))
+        elapsed = time.perf_counter() - started
+    assert carts == args.carts and total_stock(app) == stock + released
+    report("legacy ORM loop (total)", [elapsed], len(statements))
+
+    seed_expired_carts(app, user_ids, args.items, args.products)
+    batches = []
+    with app.app_context(), sql_statements(app) as statements:
+        now = datetime.now(IST)
+        started = time.perf_counter()
+        while True:
+            batch_started = time.perf_counter()
+            carts, _ = sweep_expired_batch(now, args.batch_size)
+            if not carts:
+                break
+            batches.append(time.perf_counter() - batch_started)
+        elapsed = time.perf_counter() - started
+    assert total_stock(app) == stock + 2 * released
+    report("set-based sweep (total)", [elapsed], len(statements))
+    report(
+        f"  per batch of {args.batch_size}",
+        batches,
+        len(statements) // max(1, len(batches)),
+        f"  {len(batches)} batches",
+    )
+
+
+# ---------------------------
+# BATCH CART UPDATES (user-011)
+# ---------------------------
+
+
+def empty_carts(app):
+    with app.app_context():
+        db.session.execute(delete(CartItem))
+        db.session.execute(delete(Cart))
+        db.session.commit()
+
+
+@benchmark(
+    "cart-batch",
+    "one POST /cart/items vs N sequential POST /cart/add",
+    items=50,
+    repeat=20,
+)
+def bench_cart_batch(app, args):
+    seed_products(app, args.items)
+    _, auth = seed_user(app)
+    client = app.test_client()
+    lines = [{"product_id": pid, "quantity": 1} for pid in range(1, args.items + 1)]
+
+    def sequential():
+        for line in lines:
+            post(client, "/cart/add", json=line, headers=auth)
+
+    print(f"📊 Adding {args.items} products to an empty cart, {args.repeat} times each")
+    for name, request in (
+        (f"{args.items} x /cart/add", sequential),
+        (
+            "1 x /cart/items",
+            lambda: post(client, "/cart/items", {"items": lines}, auth),
+        ),
+    ):
+        timings, statements = measure(
+            app, request, args.repeat, setup=lambda: empty_carts(app)
+        )
+        report(name, timings, statements)
+
+
+# ---------------------------
+# SEARCH (user-018)
+# ---------------------------
+
+BRANDS = "Acme Zenith Nova Orion Vertex Atlas Pixel Quantum Lumen Apex".split()
+ADJECTIVES = (
+    "gaming wireless compact portable smart ultra slim rugged silent mini "
+    "pro classic premium eco digital"
+).split()
+NOUNS = (
+    "laptop mouse keyboard monitor headset speaker camera router tablet "
+    "charger drive printer webcam microphone watch"
+).split()
+
+
+def product_name(i):
+    """Deterministic, varied names: '<brand> <adjective> <noun> <model>'."""
+    return (
+        f"{BRANDS[i % len(BRANDS)]} {ADJECTIVES[i // 7 % len(ADJECTIVES)]} "
+        f"{NOUNS[i // 101 % len(NOUNS)]} {i % 997}"
+    )
+
+
+@legacy.route("/products/search", methods=["GET"])
+def legacy_search():
+    """What a search without an index amounts to: a LIKE scan of every name."""
+    q = request.args.get("q", "")
+    products = (
+        Product.query.filter(Product.name.ilike(f"%{q}%"))
+        .order_by(Product.id)
+        .limit(10)
+        .all()
+    )
+    return jsonify([{"id": p.id, "name": p.name} for p in products])
+
+
+@benchmark(
+    "search",
+    "GET /products/search on the in-process index vs a LIKE scan",
+    rows=1_000_000,
+    repeat=20,
+)
+def bench_search(app, args):
+    seed_products(app, args.rows, name=product_name)
+    client = app.test_client()
+    index = app.extensions["search_index"]
+    with app.app_context():
+        started = time.perf_counter()
+        index.build()
+    print(
+        f"📊 Search over {args.rows} products; index built in "
+        f"{time.perf_counter() - started:.1f} s"
+    )
+
+    cases = (
+        ("LIKE scan 'gaming laptop'", "/legacy/products/search?q=gaming laptop"),
+        ("LIKE scan, no match", "/legacy/products/search?q=nothing"),
+        ("index 'gaming laptop'", "/products/search?q=gaming laptop"),
+        ("index 'acme wireless mo'", "/products/search?q=acme wireless mo"),
+        ("index, no match", "/products/search?q=nothing"),
+        ("index prefix 'zenith sl'", "/products/search?prefix=zenith sl"),
+    )
+    for name, path in cases:
+        timings, statements = measure(app, lambda: get(client, path), args.repeat)
+        report(name, timings, statements)
+
+
+# ---------------------------
+# ADD TO CART (user-021)
+# ---------------------------
+
+
+def legacy_get_or_create_active_cart(user_id):
+    """The original lookup: user, active cart, latest cart, release, create."""
+    now = datetime.now(IST)
+    if not db.session.get(User, user_id):
+        return None, "User not found"
+
+    cart = Cart.query.filter_by(user_id=user_id).filter(Cart.expires_at > now).first()
+    if cart:
+        return cart, None
+
+    expired_cart = (
+        Cart.query.filter_by(user_id=user_id).order_by(Cart.created_at.desc()).first()
+    )
+    if expired_cart and expired_cart.expires_at.replace(tzinfo=IST) <= now:
+        for item in expired_cart.items:
+            item.product.available_quantity += item.quantity
+        db.session.delete(expired_cart)
+        db.session.commit()
+
+    new_cart = Cart(user_id=user_id)
+    db.session.add(new_cart)
+    db.session.commit()
+    return new_cart, None
+
+
+@legacy.route("/cart/add", methods=["POST"])
+@require_auth
+def legacy_add_to_cart():
+    """The original POST /cart/add: ORM read-modify-write of stock and line."""
+    data = request.get_json()
+    product_id = data.get("product_id")
+    quantity = data.get("quantity", 1)
+
+    cart, error = legacy_get_or_create_active_cart(request.user_id)
+    if error:
+        return jsonify({"error": error}), 404
+
+    product = db.session.get(Product, product_id)
+    if not product:
+        return jsonify({"error": "Product not found"}), 404
+    if product.available_quantity < quantity:
+        return jsonify({"error": "Not enough stock"}), 400
+
+    cart_item = CartItem.query.filter_by(cart_id=cart.id, product_id=product.id).first()
+    if cart_item:
+        cart_item.quantity += quantity
+    else:
+        db.session.add(
+            CartItem(cart_id=cart.id, product_id=product.id, quantity=quantity)
+        )
+    product.available_quantity -= quantity
+    db.session.commit()
+    return jsonify({"message": "Item added"}), 200
+
+
+def expire_carts(app):
+    with app.app_context():
+        db.session.execute(
+            update(Cart).values(expires_at=datetime.now(IST) - timedelta(minutes=1))
+        )
+        db.session.commit()
+
+
+@benchmark(
+    "cart-add",
+    "POST /cart/add before and after the single-statement cart lookup",
+    items=5,
+    repeat=100,
+)
+def bench_cart_add(app, args):
+    """
+    Active cart: the same product added again to a live cart. Expired cart:
+    the previous cart (holding --items lines) has expired, so the add also
+    returns its stock and opens a new cart.
+    """
+    seed_products(app, args.items)
+    user_id, auth = seed_user(app)
+    client = app.test_client()
+    line = {"product_id": 1, "quantity": 1}
+
+    def refill_and_expire():
+        empty_carts(app)
+        fill_cart(app, user_id, range(1, args.items + 1))
+        expire_carts(app)
+
+    print(f"📊 POST /cart/add, {args.repeat} requests each")
+    for name, path in (("legacy", "/legacy/cart/add"), ("current", "/cart/add")):
+        empty_carts(app)
+        post(client, path, json=line, headers=auth)
+        for case, setup in (("active cart", None), ("expired cart", refill_and_expire)):
+            timings, statements = measure(
+                app,
+                lambda: post(client, path, json=line, headers=auth),
+                args.repeat,
+                setup=setup,
+            )
+            report(f"{name}, {case}", timings, statements)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    benchmarks = parser.add_subparsers(dest="benchmark", required=True)
+    for name, (_, help, options) in BENCHMARKS.items():
+        sub = benchmarks.add_parser(name, help=help)
+        for option, default in options.items():
+            sub.add_argument(
+                f"--{option.replace('_', '-')}", type=type(default), default=default
+            )
+    args = parser.parse_args()
+
+    run = BENCHMARKS[args.benchmark][0]
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(directory)
+        try:
+            run(app, args)
+        finally:
+            app.extensions["password_hasher"].shutdown()
+            with app.app_context():
+                db.engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
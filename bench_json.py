@@ -0,0 +1,158 @@
+"""
+Serialization benchmark for the API's largest payloads.
+
+Builds the GET /products, GET /users and GET /orders response bodies for
+several result sizes and times row -> JSON response for:
+
+    dicts    - dict comprehensions encoded by Flask's default provider
+               (sorted keys, stdlib json): how the routes used to work
+    <name>   - the schemas in utils/schemas.py encoded by each installed
+               provider in utils/json_provider.py (json, orjson, msgspec)
+
+No database is needed; rows are generated in memory.
+
+    python bench_json.py --sizes 10,100,1000,10000
+"""
+
+import argparse
+import random
+import timeit
+from collections import namedtuple
+from datetime import datetime
+from types import SimpleNamespace
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+from utils.json_provider import JSON_PROVIDERS
+from utils.money import from_cents
+from utils.schemas import OrderSchema, ProductSchema, UserSchema
+
+ProductRow = namedtuple("ProductRow", "id name price available_quantity")
+UserRow = namedtuple("UserRow", "id username email")
+
+
+def product_rows(n):
+    return [
+        ProductRow(i, f"Product {i}", random.randint(100, 500000), i % 50)
+        for i in range(1, n + 1)
+    ]
+
+
+def user_rows(n):
+    return [UserRow(i, f"user{i}", f"user{i}@example.com") for i in range(1, n + 1)]
+
+
+def orders(n, items=3):
+    created_at = datetime(2026, 1, 1, 12, 30)
+    result = []
+    for i in range(1, n + 1):
+        lines = [
+            SimpleNamespace(
+                product=SimpleNamespace(name=f"Product {j}"),
+                price_at_order_cents=random.randint(100, 500000),
+                quantity=j,
+            )
+            for j in range(1, items + 1)
+        ]
+        total = sum(line.quantity * line.price_at_order_cents for line in lines)
+        result.append(
+            SimpleNamespace(id=i, total_cents=total, created_at=created_at, items=lines)
+        )
+    return result
+
+
+# The pre-schema row -> dict code of each route
+def products_as_dicts(rows):
+    return [
+        {
+            "id": row.id,
+            "name": row.name,
+            "price": from_cents(row.price),
+            "available_quantity": row.available_quantity,
+        }
+        for row in rows
+    ]
+
+
+def users_as_dicts(rows):
+    return [{"id": u.id, "username": u.username, "email": u.email} for u in rows]
+
+
+def orders_as_dicts(rows):
+    return [
+        {
+            "order_id": order.id,
+            "total_amount": from_cents(order.total_cents),
+            "created_at": order.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "items": [
+                {
+                    "product_name": item.product.name,
+                    "price_at_order": from_cents(item.price_at_order_cents),
+                    "quantity": item.quantity,
+                    "subtotal": from_cents(item.quantity * item.price_at_order_cents),
+                }
+                for item in order.items
+            ],
+        }
+        for order in rows
+    ]
+
+
+ENDPOINTS = {
+    "GET /products": (
+        product_rows,
+        products_as_dicts,
+        lambda rows: [ProductSchema.from_row(row) for row in rows],
+    ),
+    "GET /users": (
+        user_rows,
+        users_as_dicts,
+        lambda rows: [UserSchema.from_row(row) for row in rows],
+    ),
+    "GET /orders": (
+        orders,
+        orders_as_dicts,
+        lambda rows: [OrderSchema.from_model(order) for order in rows],
+    ),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON serialization benchmark.")
+    parser.add_argument("--sizes", default="10,100,1000,10000")
+    parser.add_argument("--seconds", type=float, default=0.5, help="per measurement")
+    args = parser.parse_args()
+    sizes = [int(size) for size in args.sizes.split(",")]
+
+    random.seed(1)
+    app = Flask(__name__)
+    providers = {"dicts": DefaultJSONProvider(app)}
+    for name, (provider_class, module) in JSON_PROVIDERS.items():
+        if module is not None:
+            providers[name] = provider_class(app)
+
+    print(f"📊 ms per response (best of 5), x = speedup over dicts")
+    print(f"  {'endpoint':<14} {'rows':>6}" + "".join(f"{n:>16}" for n in providers))
+    with app.app_context():
+        for endpoint, (make_rows, as_dicts, as_schemas) in ENDPOINTS.items():
+            for size in sizes:
+                rows = make_rows(size)
+                cells = []
+                baseline = None
+                for name, provider in providers.items():
+                    build = as_dicts if name == "dicts" else as_schemas
+                    run = lambda: provider.response(build(rows)).get_data()
+                    number = max(
+                        1, int(args.seconds / max(timeit.timeit(run, number=1), 1e-6))
+                    )
+                    ms = (
+                        min(timeit.repeat(run, number=number, repeat=5)) / number * 1000
+                    )
+                    baseline = baseline or ms
+                    cells.append(f"{ms:9.3f} x{baseline / ms:4.1f}")
+                print(
+                    f"  {endpoint:<14} {size:>6}" + "".join(f"{c:>16}" for c in cells)
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Microbenchmark of the cost of formatting money at the JSON boundary.
+
+Serializes a catalog page (id, name, price, stock) and an order (lines with
+price, quantity, subtotal plus a total) with each way of representing money:
+
+    float    - the old Float columns, passed through as-is
+    cents    - integer cents formatted by utils.money.from_cents (current)
+    decimal  - Decimal amounts, the usual fix for float drift, as strings
+    string   - integer cents formatted as "1999.50" with divmod
+
+    python bench_money.py --rows 1000 --repeat 200
+"""
+
+import argparse
+import json
+import random
+import timeit
+from decimal import Decimal
+from utils.money import from_cents
+
+CENT = Decimal("0.01")
+
+
+def format_float(value):
+    return value
+
+
+def format_decimal(cents):
+    return str((Decimal(cents) / 100).quantize(CENT))
+
+
+def format_string(cents):
+    units, rest = divmod(cents, 100)
+    return f"{units}.{rest:02d}"
+
+
+def catalog_page(rows, price):
+    return json.dumps(
+        [
+            {
+                "id": product_id,
+                "name": name,
+                "price": price(amount),
+                "available_quantity": stock,
+            }
+            for product_id, name, amount, stock in rows
+        ]
+    )
+
+
+def order(lines, price, multiply):
+    return json.dumps(
+        {
+            "items": [
+                {
+                    "price_at_order": price(amount),
+                    "quantity": quantity,
+                    "subtotal": price(multiply(amount, quantity)),
+                }
+                for amount, quantity in lines
+            ],
+            "total_amount": price(sum(multiply(a, q) for a, q in lines)),
+        }
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Money serialization benchmark.")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    random.seed(1)
+    cents = [random.randint(100_00, 5000_00) for _ in range(args.rows)]
+    quantities = [random.randint(1, 5) for _ in range(args.rows)]
+
+    strategies = {
+        "float": (format_float, [c / 100 for c in cents]),
+        "cents": (from_cents, cents),
+        "decimal": (format_decimal, cents),
+        "string": (format_string, cents),
+    }
+
+    def best(fn):
+        seconds = min(timeit.repeat(fn, number=1, repeat=args.repeat))
+        return seconds / args.rows * 1e6
+
+    print(f"📊 {args.rows} rows x {args.repeat} runs, µs per row")
+    print(f"  {'':<8} {'format':>7} {'payloads':>9}")
+    for name, (price, amounts) in strategies.items():
+        rows = [(i, f"Product {i}", amount, 10) for i, amount in enumerate(amounts, 1)]
+        lines = list(zip(amounts, quantities))
+        # Formatting alone, then the full catalog page + order JSON
+        format_cost = best(lambda: [price(amount) for amount in amounts])
+        payload_cost = best(
+            lambda: (
+                catalog_page(rows, price),
+                order(lines, price, lambda a, q: a * q),
+            )
+        )
+        print(f"  {name:<8} {format_cost:7.3f} {payload_cost:9.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,154 @@
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from app import app, db, Cart
+from database import create_db_app, db
+from models import Cart, CartItem, Product
+from sqlalchemy import delete, func, select, update
 from sqlalchemy.exc import OperationalError
+import os
 import time
 
 IST = ZoneInfo("Asia/Kolkata")
 
+BATCH_SIZE = int(os.getenv("CART_SWEEP_BATCH", 1000))
 
-def clear_expired_carts(max_retries=5, retry_delay=1):
-    """Deletes expired carts safely, retrying if SQLite is locked."""
-    with app.app_context():
-        for attempt in range(max_retries):
-            try:
-                now = datetime.now(IST)
-                expired_carts = Cart.query.filter(Cart.expires_at <= now).all()
-
-                if not expired_carts:
-                    print(
-                        f"✅ No expired carts found at {now.strftime('%Y-%m-%d %H:%M:%S %Z')}"
-                    )
-                    return
-
-                print(
-                    f"🧹 Found {len(expired_carts)} expired carts at {now.strftime('%Y-%m-%d %H:%M:%S %Z')}. Cleaning up..."
-                )
-
-                # Disable autoflush to avoid premature writes while looping
-                with db.session.no_autoflush:
-                    for cart in expired_carts:
-                        for item in cart.items:
-                            item.product.available_quantity += item.quantity
-                        db.session.delete(cart)
-
-                db.session.commit()
-                print(
-                    f"✅ Cleanup completed successfully at {now.strftime('%Y-%m-%d %H:%M:%S %Z')}"
-                )
-                return
+# PostgreSQL deadlock_detected / serialization_failure: the transaction was
+# rolled back and can simply be run again
+RETRYABLE_SQLSTATES = {"40P01", "40001"}
 
-            except OperationalError as e:
-                if "database is locked" in str(e):
-                    print(f"⚠️ Database locked, retrying ({attempt+1}/{max_retries})...")
-                    time.sleep(retry_delay)
-                else:
-                    raise  # Raise unexpected errors
-
-        print(
-            "❌ Failed to clear expired carts after several retries (DB remained locked)."
+
+def release_cart_statements(cart_ids):
+    """
+    Statements that return the items of `cart_ids` to stock and delete the
+    carts, set-based. Run them in order in one transaction; the third one's
+    rowcount is the number of items released.
+
+    The first statement locks the affected product rows in id order, so
+    sweepers and cart writes restocking overlapping products queue up
+    instead of deadlocking in the UPDATE.
+    """
+    product_ids = select(CartItem.product_id).where(CartItem.cart_id.in_(cart_ids))
+    restock = (
+        select(CartItem.product_id, func.sum(CartItem.quantity).label("quantity"))
+        .where(CartItem.cart_id.in_(cart_ids))
+        .group_by(CartItem.product_id)
+        .subquery()
+    )
+    return [
+        select(Product.id)
+        .where(Product.id.in_(product_ids))
+        .order_by(Product.id)
+        .with_for_update(),
+        update(Product)
+        .where(Product.id == restock.c.product_id)
+        .values(
+            available_quantity=Product.available_quantity + restock.c.quantity,
+            version=Product.version + 1,
         )
+        .execution_options(synchronize_session=False),
+        delete(CartItem)
+        .where(CartItem.cart_id.in_(cart_ids))
+        .execution_options(synchronize_session=False),
+        delete(Cart)
+        .where(Cart.id.in_(cart_ids))
+        .execution_options(synchronize_session=False),
+    ]
+
+
+def claim_expired_query(now, batch_size):
+    """Up to `batch_size` expired cart ids, oldest first (ix_carts_expires_at)."""
+    return (
+        select(Cart.id)
+        .where(Cart.expires_at <= now)
+        .order_by(Cart.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+
+
+def sweep_expired_batch(now, batch_size):
+    """
+    Claim up to `batch_size` expired carts, return their items to stock and
+    delete them, all with set-based statements in one transaction.
+
+    Carts are claimed with FOR UPDATE SKIP LOCKED, so several sweepers can run
+    in parallel on PostgreSQL without touching the same rows (SQLite ignores
+    the lock clause and relies on its single writer).
+    Returns (carts_deleted, items_deleted).
+    """
+    cart_ids = db.session.scalars(claim_expired_query(now, batch_size)).all()
+    if not cart_ids:
+        return 0, 0
+
+    results = [db.session.execute(s) for s in release_cart_statements(cart_ids)]
+    db.session.commit()
+
+    return len(cart_ids), results[2].rowcount
+
+
+def is_retryable(error):
+    """True for SQLite lock timeouts and PostgreSQL deadlocks/serialization failures."""
+    if "database is locked" in str(error):
+        return True
+    orig = error.orig
+    sqlstate = getattr(orig, "sqlstate", None) or getattr(orig, "pgcode", None)
+    return sqlstate in RETRYABLE_SQLSTATES
+
+
+def clear_expired_carts(
+    max_retries=5, retry_delay=1, batch_size=BATCH_SIZE, flask_app=None, verbose=True
+):
+    """
+    Deletes expired carts in bounded batches. A batch that hits a locked
+    SQLite database, a deadlock or a serialization failure is retried after
+    `retry_delay` seconds, doubling per attempt.
+    Returns a summary dict with the number of carts and items reclaimed.
+    """
+    if flask_app is None:
+        flask_app = create_db_app()
+
+    log = print if verbose else lambda *args: None
+
+    with flask_app.app_context():
+        now = datetime.now(IST)
+        summary = {"carts": 0, "items": 0, "batches": 0}
+        attempt = 0
+
+        while attempt < max_retries:
+            try:
+                started = time.perf_counter()
+                carts, items = sweep_expired_batch(now, batch_size)
+            except OperationalError as e:
+                db.session.rollback()
+                if is_retryable(e):
+                    attempt += 1
+                    log(f"⚠️ Database busy, retrying ({attempt}/{max_retries})...")
+                    time.sleep(retry_delay * 2 ** (attempt - 1))
+                    continue
+                raise  # Raise unexpected errors
+
+            if not carts:
+                break
+
+            summary["batches"] += 1
+            summary["carts"] += carts
+            summary["items"] += items
+            log(
+                f"🧹 Batch {summary['batches']}: released {carts} carts "
+                f"({items} items) in {(time.perf_counter() - started) * 1000:.1f} ms"
+            )
+        else:
+            log(
+                "❌ Failed to clear expired carts after several retries (DB remained busy)."
+            )
+            return summary
+
+        if summary["carts"]:
+            log(
+                f"✅ Cleanup completed: {summary['carts']} expired carts released at {now.strftime('%Y-%m-%d %H:%M:%S %Z')}"
+            )
+        else:
+            log(f"✅ No expired carts found at {now.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+        return summary
 
 
 if __name__ == "__main__":
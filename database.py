@@ -1,3 +1,37 @@
+import os
+from dotenv import load_dotenv
+from flask import Flask, g, has_app_context
 from flask_sqlalchemy import SQLAlchemy
+from flask_sqlalchemy.session import Session
 
-db = SQLAlchemy()
+
+class RoutingSession(Session):
+    """
+    Session that sends reads to a replica engine while a read-only route is
+    active (see utils.read_replica.read_only). Flushes always go to the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_app_context():
+            replica_key = g.get("db_replica")
+            if replica_key is not None:
+                return db.engines[replica_key]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+db = SQLAlchemy(session_options={"class_": RoutingSession})
+
+
+def create_db_app(config=None):
+    """
+    Minimal Flask app with only the database configured, for scripts that need
+    db.session but not the API (no CORS, JWT, bcrypt or migration imports).
+    """
+    load_dotenv()
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL")
+    app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    if config:
+        app.config.from_mapping(config)
+    db.init_app(app)
+    return app
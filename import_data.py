@@ -0,0 +1,293 @@
+"""
+Bulk import products or users from CSV or JSONL.
+
+    python import_data.py products catalog.csv
+    python import_data.py products catalog.jsonl --upsert
+    python import_data.py users users.csv --workers 8
+
+Rows are streamed and written in batches, so memory stays flat however large
+the file is. Products are written with COPY on PostgreSQL and multi-row
+INSERTs elsewhere; --upsert updates price/stock of products whose name
+already exists instead of inserting duplicates. User passwords are hashed in
+parallel worker processes (rows may also carry a ready `password_hash`).
+
+Columns - products: name, price (e.g. 1999.50), available_quantity
+          users:    username, email, password | password_hash
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+from bcrypt import gensalt, hashpw
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, create_engine, insert, or_, select, update
+from models import IST, Product, User
+from utils.money import to_cents
+
+
+def read_rows(path):
+    """Yield (line_number, dict) from a .csv or .jsonl file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            for number, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        yield number, json.loads(line)
+                    except ValueError:
+                        yield number, None
+        else:
+            for number, row in enumerate(csv.DictReader(f), start=2):
+                yield number, row
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def validate_product(row):
+    """Return (clean_row, error)."""
+    if not isinstance(row, dict):
+        return None, "not an object"
+    name = (row.get("name") or "").strip()
+    if not name or len(name) > 120:
+        return None, "name is required (max 120 chars)"
+    price_cents = to_cents(row.get("price"))
+    if price_cents is None:
+        return None, "price must be a non-negative amount with at most 2 decimals"
+    try:
+        quantity = int(row.get("available_quantity") or 0)
+    except (TypeError, ValueError):
+        return None, "available_quantity must be a number"
+    if quantity < 0:
+        return None, "available_quantity must not be negative"
+    return {
+        "name": name,
+        "price_cents": price_cents,
+        "available_quantity": quantity,
+    }, None
+
+
+def validate_user(row):
+    if not isinstance(row, dict):
+        return None, "not an object"
+    username = (row.get("username") or "").strip()
+    email = (row.get("email") or "").strip()
+    if not username or len(username) > 80:
+        return None, "username is required (max 80 chars)"
+    if "@" not in email or len(email) > 120:
+        return None, "a valid email is required (max 120 chars)"
+    if not row.get("password") and not row.get("password_hash"):
+        return None, "password or password_hash is required"
+    return {
+        "username": username,
+        "email": email,
+        "password": row.get("password"),
+        "password_hash": row.get("password_hash"),
+    }, None
+
+
+def hash_password(args):
+    password, rounds = args
+    return hashpw(password.encode("utf-8"), gensalt(rounds)).decode("utf-8")
+
+
+def copy_products(conn, rows):
+    """PostgreSQL fast path: stream the batch through COPY ... FROM STDIN."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # COPY skips column defaults set in Python; timestamps are naive IST
+    now = datetime.now(IST).replace(tzinfo=None)
+    for row in rows:
+        writer.writerow(
+            [row["name"], row["price_cents"], row["available_quantity"], 1, now]
+        )
+    buffer.seek(0)
+    cursor = conn.connection.dbapi_connection.cursor()
+    cursor.copy_expert(
+        "COPY products (name, price_cents, available_quantity, version, updated_at) "
+        "FROM STDIN WITH CSV",
+        buffer,
+    )
+
+
+def write_products(conn, rows, upsert):
+    """Insert (or upsert by name) one batch; returns (inserted, updated)."""
+    updated = 0
+    if upsert:
+        # Last row wins when a name repeats inside the batch
+        rows = list({row["name"]: row for row in rows}.values())
+        existing = dict(
+            conn.execute(
+                select(Product.name, Product.id).where(
+                    Product.name.in_([row["name"] for row in rows])
+                )
+            ).all()
+        )
+        changes = [
+            {
+                "b_id": existing[row["name"]],
+                "b_price": row["price_cents"],
+                "b_quantity": row["available_quantity"],
+            }
+            for row in rows
+            if row["name"] in existing
+        ]
+        if changes:
+            conn.execute(
+                update(Product.__table__)
+                .where(Product.__table__.c.id == bindparam("b_id"))
+                .values(
+                    price_cents=bindparam("b_price"),
+                    available_quantity=bindparam("b_quantity"),
+                    version=Product.__table__.c.version + 1,
+                ),
+                changes,
+            )
+        updated = len(changes)
+        rows = [row for row in rows if row["name"] not in existing]
+
+    if rows:
+        if conn.dialect.name == "postgresql":
+            copy_products(conn, rows)
+        else:
+            # executemany: SQLAlchemy batches these into multi-row INSERTs
+            conn.execute(
+                insert(Product.__table__), [dict(row, version=1) for row in rows]
+            )
+    return len(rows), updated
+
+
+def write_users(conn, rows, pool, workers, rounds):
+    """
+    Insert one batch of new users. A row whose username or email belongs to
+    an existing user or to an earlier row is skipped; returns (inserted,
+    skipped) with skipped as (line, reason) pairs.
+    """
+    taken = conn.execute(
+        select(User.username, User.email).where(
+            or_(
+                User.username.in_([row["username"] for row in rows]),
+                User.email.in_([row["email"] for row in rows]),
+            )
+        )
+    ).all()
+    taken_names = {name for name, _ in taken}
+    taken_emails = {email for _, email in taken}
+    new_rows, skipped = [], []
+    for row in rows:
+        if row["username"] in taken_names:
+            skipped.append((row["line"], f"username '{row['username']}' is taken"))
+        elif row["email"] in taken_emails:
+            skipped.append((row["line"], f"email '{row['email']}' is taken"))
+        else:
+            taken_names.add(row["username"])
+            taken_emails.add(row["email"])
+            new_rows.append(row)
+    rows = new_rows
+
+    to_hash = [row for row in rows if not row["password_hash"]]
+    hashes = pool.map(
+        hash_password,
+        [(row["password"], rounds) for row in to_hash],
+        chunksize=max(1, len(to_hash) // (workers * 4)),
+    )
+    for row, hashed in zip(to_hash, hashes):
+        row["password_hash"] = hashed
+
+    if rows:
+        conn.execute(
+            insert(User.__table__),
+            [
+                {
+                    "username": row["username"],
+                    "email": row["email"],
+                    "password_hash": row["password_hash"],
+                }
+                for row in rows
+            ],
+        )
+    return len(rows), skipped
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import products or users.")
+    parser.add_argument("kind", choices=["products", "users"])
+    parser.add_argument("path", help=".csv or .jsonl file")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--upsert", action="store_true", help="products: match by name")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument(
+        "--bcrypt-rounds", type=int, default=int(os.getenv("BCRYPT_ROUNDS", 12))
+    )
+    parser.add_argument("--database-url", default=None)
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = args.database_url or os.getenv("DATABASE_URL")
+    if not database_url:
+        sys.exit("DATABASE_URL missing! Add it to .env or pass --database-url")
+
+    engine = create_engine(database_url)
+    validate = validate_product if args.kind == "products" else validate_user
+
+    totals = {"inserted": 0, "updated": 0, "invalid": 0, "skipped": 0}
+    started = time.perf_counter()
+    pool = ProcessPoolExecutor(args.workers) if args.kind == "users" else None
+
+    try:
+        for batch in batched(read_rows(args.path), args.batch_size):
+            rows = []
+            for number, raw in batch:
+                row, error = validate(raw)
+                if error:
+                    totals["invalid"] += 1
+                    if totals["invalid"] <= 20:
+                        print(f"⚠️ Line {number}: {error}")
+                else:
+                    if args.kind == "users":
+                        row["line"] = number  # reported if skipped as a duplicate
+                    rows.append(row)
+            if not rows:
+                continue
+
+            with engine.begin() as conn:
+                if args.kind == "products":
+                    inserted, updated = write_products(conn, rows, args.upsert)
+                else:
+                    updated = 0
+                    inserted, skipped = write_users(
+                        conn, rows, pool, args.workers, args.bcrypt_rounds
+                    )
+                    for number, reason in skipped:
+                        totals["skipped"] += 1
+                        if totals["skipped"] <= 20:
+                            print(f"⚠️ Line {number}: skipped, {reason}")
+            totals["inserted"] += inserted
+            totals["updated"] += updated
+            print(
+                f"📦 {totals['inserted']} inserted, {totals['updated']} updated, "
+                f"{totals['invalid']} invalid ({time.perf_counter() - started:.1f}s)"
+            )
+    finally:
+        if pool:
+            pool.shutdown()
+
+    print(
+        f"✅ Imported {args.kind}: {totals['inserted']} inserted, "
+        f"{totals['updated']} updated, {totals['invalid']} invalid and "
+        f"{totals['skipped']} duplicate rows skipped "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
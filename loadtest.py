@@ -0,0 +1,552 @@
+"""
+Load test for the full shopping flow.
+
+Seeds users and products straight into the database, starts the API on a
+local port and drives concurrent clients through
+
+    register -> login -> /cart/add x k -> GET /cart -> /cart/checkout -> GET /orders
+
+It reports throughput and latency percentiles per endpoint, checks that no
+stock was oversold or lost, and writes everything to a JSON file so runs can
+be compared between commits:
+
+    python loadtest.py --clients 16 --iterations 20 --output before.json
+    python loadtest.py --clients 16 --iterations 20 --compare before.json
+
+--server asgi runs asgi.py under uvicorn instead of the threaded Flask server,
+so the two serving modes can be compared at high concurrency; the server's
+peak RSS is reported with the results:
+
+    python loadtest.py --server wsgi --clients 1000 --output wsgi.json
+    python loadtest.py --server asgi --clients 1000 --compare wsgi.json
+
+--scenario login-storm checks that bcrypt cannot starve the other routes:
+logged-in shoppers browse, add, view, check out and list orders for
+--duration seconds on their own, then for --duration seconds while
+--storm-clients threads log in back to back. It reports p50/p99 of those
+non-auth routes in both phases (logins shed with a 503 by the password
+pool are expected and not counted as failures):
+
+    python loadtest.py --scenario login-storm --bcrypt-rounds 12 --recreate
+
+The database is seeded from scratch, so a database that already has tables
+is only dropped and reseeded with --recreate. The run exits non-zero when
+any request failed with a 5xx / connection error, no flow got through
+checkout, or stock was oversold or lost.
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from bcrypt import gensalt, hashpw
+from sqlalchemy import create_engine, func, insert, inspect, make_url, select
+from database import db
+from models import CartItem, OrderItem, Product, User
+
+
+def resolve_database_url(url):
+    """
+    Make a relative SQLite path absolute, so the seeder (relative to the
+    working directory) and Flask-SQLAlchemy (relative to instance/) open
+    the same file.
+    """
+    url = make_url(url)
+    path = url.database
+    if url.get_backend_name() == "sqlite" and path and path != ":memory:":
+        url = url.set(database=os.path.abspath(path))
+    return url.render_as_string(hide_password=False)
+
+
+SEED_PASSWORD = "loadtest"
+# Logins of the login-storm scenario; the password pool may shed them with 503
+LOAD_SHEDDING_ENDPOINTS = {"storm_login"}
+
+
+def seed(engine, users, products, stock, recreate=False, password_rounds=4, batch=5000):
+    """
+    Create the schema and bulk insert users and products. Existing tables
+    are dropped only with recreate=True; otherwise a database that already
+    has them is refused rather than wiped. Seeded users share one password
+    hash of `password_rounds` (bcrypt cost), so seeding stays fast.
+    """
+    if recreate:
+        db.metadata.drop_all(engine)
+    elif inspect(engine).get_table_names():
+        sys.exit(
+            f"❌ {engine.url.render_as_string()} already has tables. "
+            "Pass --recreate to drop and reseed it (all data is lost)."
+        )
+    db.metadata.create_all(engine)
+
+    password_hash = hashpw(SEED_PASSWORD.encode(), gensalt(password_rounds)).decode()
+    with engine.begin() as conn:
+        for start in range(0, users, batch):
+            conn.execute(
+                insert(User),
+                [
+                    {
+                        "username": f"seed{i}",
+                        "email": f"seed{i}@example.com",
+                        "password_hash": password_hash,
+                    }
+                    for i in range(start, min(start + batch, users))
+                ],
+            )
+        for start in range(0, products, batch):
+            conn.execute(
+                insert(Product),
+                [
+                    {
+                        "name": f"Product {i}",
+                        "price_cents": random.randint(100_00, 5000_00),
+                        "available_quantity": stock,
+                        "version": 1,
+                    }
+                    for i in range(start, min(start + batch, products))
+                ],
+            )
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url, port, bcrypt_rounds, kind="wsgi"):
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        ACCESS_SECRET_KEY=os.getenv("ACCESS_SECRET_KEY", "loadtest-secret"),
+        BCRYPT_ROUNDS=str(bcrypt_rounds),
+    )
+    if kind == "asgi":
+        command = ["uvicorn", "asgi:application", "--log-level", "warning"]
+    else:
+        command = ["flask", "--app", "app", "run", "--with-threads", "--no-reload"]
+    server = subprocess.Popen(
+        [sys.executable, "-m"] + command + ["--port", str(port)],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(base_url + "/", timeout=1)
+            return server, base_url
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("API server did not start")
+
+
+class Client:
+    def __init__(self, base_url, recorder):
+        self.base_url = base_url
+        self.recorder = recorder
+        self.token = None
+
+    def call(self, name, method, path, body=None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        data = json.dumps(body).encode() if body is not None else None
+        req = urllib.request.Request(
+            self.base_url + path, data=data, headers=headers, method=method
+        )
+
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(req, timeout=60) as resp:
+                status, payload = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+        except OSError:
+            status, payload = 0, b""
+        self.recorder.record(name, status, time.perf_counter() - started)
+
+        try:
+            return status, json.loads(payload) if payload else None
+        except ValueError:
+            return status, None
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+
+    def record(self, name, status, seconds):
+        with self._lock:
+            self.latencies[name].append(seconds)
+            self.statuses[name][status] += 1
+
+
+def shopping_flow(client, worker, iteration, product_count, adds):
+    username = f"lt-{worker}-{iteration}-{random.getrandbits(32)}"
+    status, body = client.call(
+        "register",
+        "POST",
+        "/auth/register",
+        {"username": username, "email": f"{username}@example.com", "password": "pw"},
+    )
+    if status != 201:
+        return
+    status, body = client.call(
+        "login", "POST", "/auth/login", {"username": username, "password": "pw"}
+    )
+    if status != 200:
+        return
+    client.token = body["access_token"]
+
+    for _ in range(adds):
+        client.call(
+            "cart_add",
+            "POST",
+            "/cart/add",
+            {"product_id": random.randint(1, product_count), "quantity": 1},
+        )
+    client.call("cart_view", "GET", "/cart")
+    client.call("checkout", "POST", "/cart/checkout")
+    client.call("orders", "GET", "/orders")
+
+
+def steady_flow(client, product_count, adds):
+    """One round of non-auth traffic for an already logged-in client."""
+    client.call("products", "GET", "/products?limit=20")
+    for _ in range(adds):
+        client.call(
+            "cart_add",
+            "POST",
+            "/cart/add",
+            {"product_id": random.randint(1, product_count), "quantity": 1},
+        )
+    client.call("cart_view", "GET", "/cart")
+    client.call("checkout", "POST", "/cart/checkout")
+    client.call("orders", "GET", "/orders?limit=20")
+
+
+def run_threads(count, target):
+    threads = [threading.Thread(target=target, args=(n,)) for n in range(count)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return time.perf_counter() - started
+
+
+def run_login_storm(base_url, args):
+    """
+    The login-storm scenario: returns {"calm": endpoints, "storm": endpoints}
+    for the same shopper load without and with concurrent logins.
+    """
+    shoppers = []
+    for n in range(args.clients):
+        client = Client(base_url, Recorder())
+        status, body = client.call(
+            "login",
+            "POST",
+            "/auth/login",
+            {"username": f"seed{n % args.users}", "password": SEED_PASSWORD},
+        )
+        if status != 200:
+            sys.exit(f"❌ Shopper login failed with {status}")
+        client.token = body["access_token"]
+        shoppers.append(client)
+
+    phases = {}
+    for phase, storm_clients in (("calm", 0), ("storm", args.storm_clients)):
+        recorder = Recorder()
+        for client in shoppers:
+            client.recorder = recorder
+        deadline = time.perf_counter() + args.duration
+
+        def worker(n):
+            if n < len(shoppers):
+                while time.perf_counter() < deadline:
+                    steady_flow(shoppers[n], args.products, args.adds)
+                return
+            client = Client(base_url, recorder)
+            while time.perf_counter() < deadline:
+                client.call(
+                    "storm_login",
+                    "POST",
+                    "/auth/login",
+                    {
+                        "username": f"seed{random.randrange(args.users)}",
+                        "password": SEED_PASSWORD,
+                    },
+                )
+
+        elapsed = run_threads(len(shoppers) + storm_clients, worker)
+        phases[phase] = summarize(recorder, elapsed)
+    return phases
+
+
+def percentile(ordered, pct):
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return round(ordered[index] * 1000, 2)
+
+
+def summarize(recorder, elapsed):
+    endpoints = {}
+    for name, latencies in recorder.latencies.items():
+        ordered = sorted(latencies)
+        statuses = recorder.statuses[name]
+        endpoints[name] = {
+            "requests": len(ordered),
+            "throughput_rps": round(len(ordered) / elapsed, 2),
+            "p50_ms": percentile(ordered, 50),
+            "p95_ms": percentile(ordered, 95),
+            "p99_ms": percentile(ordered, 99),
+            "server_errors": sum(n for s, n in statuses.items() if s == 0 or s >= 500),
+            "statuses": {str(s): n for s, n in sorted(statuses.items())},
+        }
+    return endpoints
+
+
+def check_consistency(engine, stock):
+    """Every unit must be in stock, in a cart or in an order - never negative."""
+    with engine.connect() as conn:
+        available = dict(
+            conn.execute(select(Product.id, Product.available_quantity)).all()
+        )
+        in_carts = dict(
+            conn.execute(
+                select(CartItem.product_id, func.sum(CartItem.quantity)).group_by(
+                    CartItem.product_id
+                )
+            ).all()
+        )
+        ordered = dict(
+            conn.execute(
+                select(OrderItem.product_id, func.sum(OrderItem.quantity)).group_by(
+                    OrderItem.product_id
+                )
+            ).all()
+        )
+
+    oversold = [pid for pid, qty in available.items() if qty < 0]
+    mismatched = [
+        pid
+        for pid, qty in available.items()
+        if qty + in_carts.get(pid, 0) + ordered.get(pid, 0) != stock
+    ]
+    return {
+        "oversold_products": len(oversold),
+        "stock_mismatches": len(mismatched),
+        "units_ordered": sum(ordered.values()),
+    }
+
+
+def check_results(results):
+    """Reasons the run must not count as a pass (empty when it does)."""
+    failures = []
+    errors = sum(
+        stats["server_errors"]
+        - (stats["statuses"].get("503", 0) if name in LOAD_SHEDDING_ENDPOINTS else 0)
+        for name, stats in results["endpoints"].items()
+    )
+    if errors:
+        failures.append(f"{errors} requests failed with a 5xx or connection error")
+    checkout = results["endpoints"].get("checkout", {}).get("statuses", {})
+    if not checkout.get("200"):
+        failures.append("no flow completed a checkout")
+    consistency = results["consistency"]
+    if consistency["oversold_products"] or consistency["stock_mismatches"]:
+        failures.append(f"stock is inconsistent: {consistency}")
+    return failures
+
+
+def peak_rss_mb(pid):
+    """High-water resident set size of a process (Linux only)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def git_commit():
+    try:
+        return (
+            subprocess.check_output(
+                ["git", "rev-parse", "--short", "HEAD"],
+                cwd=os.path.dirname(os.path.abspath(__file__)),
+                stderr=subprocess.DEVNULL,
+            )
+            .decode()
+            .strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, baseline_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    print(f"\nComparison with {baseline_path} ({baseline.get('commit')}):")
+    before, after = baseline.get("server", {}), current["server"]
+    print(
+        f"  server     {before.get('kind')} -> {after['kind']}   "
+        f"peak RSS {before.get('peak_rss_mb')} -> {after['peak_rss_mb']} MB"
+    )
+    for name, stats in current["endpoints"].items():
+        before = baseline["endpoints"].get(name)
+        if not before:
+            continue
+        print(
+            f"  {name:<10} p95 {before['p95_ms']:>8} -> {stats['p95_ms']:>8} ms   "
+            f"rps {before['throughput_rps']:>8} -> {stats['throughput_rps']:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--database-url", default="sqlite:///loadtest.db?timeout=30")
+    parser.add_argument(
+        "--recreate",
+        action="store_true",
+        help="drop and reseed a database that already has tables",
+    )
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--stock", type=int, default=20)
+    parser.add_argument("--clients", type=int, default=8)
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--adds", type=int, default=5)
+    parser.add_argument("--bcrypt-rounds", type=int, default=4)
+    parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi")
+    parser.add_argument(
+        "--scenario", choices=["shopping", "login-storm"], default="shopping"
+    )
+    parser.add_argument(
+        "--duration", type=float, default=10, help="login-storm: seconds per phase"
+    )
+    parser.add_argument(
+        "--storm-clients", type=int, default=16, help="login-storm: login threads"
+    )
+    parser.add_argument("--output", default="loadtest-results.json")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    args.database_url = resolve_database_url(args.database_url)
+    engine = create_engine(args.database_url)
+    started = time.perf_counter()
+    seed(
+        engine,
+        args.users,
+        args.products,
+        args.stock,
+        args.recreate,
+        password_rounds=args.bcrypt_rounds,
+    )
+    print(
+        f"🌱 Seeded {args.users} users and {args.products} products "
+        f"in {time.perf_counter() - started:.2f}s"
+    )
+
+    server, base_url = start_server(
+        args.database_url, free_port(), args.bcrypt_rounds, args.server
+    )
+    recorder = Recorder()
+    phases = None
+    try:
+        if args.scenario == "login-storm":
+            started = time.perf_counter()
+            phases = run_login_storm(base_url, args)
+            elapsed = time.perf_counter() - started
+        else:
+
+            def worker(n):
+                for i in range(args.iterations):
+                    shopping_flow(
+                        Client(base_url, recorder), n, i, args.products, args.adds
+                    )
+
+            elapsed = run_threads(args.clients, worker)
+        rss = peak_rss_mb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    results = {
+        "commit": git_commit(),
+        "config": vars(args),
+        "elapsed_s": round(elapsed, 2),
+        "server": {
+            "kind": args.server,
+            "peak_rss_mb": rss,
+            "rss_per_client_kb": (
+                round(rss * 1024 / args.clients, 1) if rss is not None else None
+            ),
+        },
+        "endpoints": phases["storm"] if phases else summarize(recorder, elapsed),
+        "consistency": check_consistency(engine, args.stock),
+    }
+    if phases:
+        results["phases"] = phases
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    if phases:
+        print(
+            f"🏁 {args.clients} shoppers, {args.duration:g}s calm then "
+            f"{args.duration:g}s with {args.storm_clients} login threads"
+        )
+        # Routes measured in both phases first, then the storm's logins
+        for name, storm in sorted(
+            phases["storm"].items(), key=lambda item: item[0] not in phases["calm"]
+        ):
+            calm = phases["calm"].get(name)
+            if calm is None:
+                print(
+                    f"  {name:<11} {storm['requests']:>6} req  "
+                    f"statuses {storm['statuses']}"
+                )
+                continue
+            print(
+                f"  {name:<11} p50 {calm['p50_ms']:>8} -> {storm['p50_ms']:>8}  "
+                f"p99 {calm['p99_ms']:>8} -> {storm['p99_ms']:>8} ms  "
+                f"rps {calm['throughput_rps']:>8} -> {storm['throughput_rps']:>8}"
+            )
+    else:
+        print(f"🏁 {args.clients} clients x {args.iterations} flows in {elapsed:.2f}s")
+        for name, stats in results["endpoints"].items():
+            print(
+                f"  {name:<10} {stats['requests']:>6} req  {stats['throughput_rps']:>8} rps  "
+                f"p50 {stats['p50_ms']:>8}  p95 {stats['p95_ms']:>8}  p99 {stats['p99_ms']:>8} ms  "
+                f"5xx {stats['server_errors']}"
+            )
+    print(f"  server: {results['server']}")
+    print(f"  consistency: {results['consistency']}")
+    print(f"💾 Results saved to {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    failures = check_results(results)
+    for failure in failures:
+        print(f"❌ {failure}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Add indexes for hot query predicates
+
+Revision ID: 7c2e9a41d5b3
+Revises: 455c7ed7525f
+Create Date: 2026-10-17 12:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2e9a41d5b3'
+down_revision = '455c7ed7525f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate (cart_id, product_id) lines before the unique index:
+    # the surviving row keeps the summed quantity.
+    op.execute(
+        """
+        UPDATE cart_items
+        SET quantity = (
+            SELECT SUM(dup.quantity) FROM cart_items dup
+            WHERE dup.cart_id = cart_items.cart_id
+              AND dup.product_id = cart_items.product_id
+        )
+        WHERE id IN (
+            SELECT MIN(id) FROM cart_items
+            GROUP BY cart_id, product_id HAVING COUNT(*) > 1
+        )
+        """
+    )
+    op.execute(
+        """
+        DELETE FROM cart_items
+        WHERE id NOT IN (
+            SELECT keep.id FROM (
+                SELECT MIN(id) AS id FROM cart_items GROUP BY cart_id, product_id
+            ) keep
+        )
+        """
+    )
+
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.create_index('ix_carts_user_id_expires_at', ['user_id', 'expires_at'], unique=False)
+        batch_op.create_index('ix_carts_expires_at', ['expires_at'], unique=False)
+
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.create_index('ix_cart_items_cart_id_product_id', ['cart_id', 'product_id'], unique=True)
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_user_id_created_at', ['user_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_items_order_id'), ['order_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_order_items_order_id'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_user_id_created_at')
+
+    with op.batch_alter_table('cart_items', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_items_cart_id_product_id')
+
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.drop_index('ix_carts_expires_at')
+        batch_op.drop_index('ix_carts_user_id_expires_at')
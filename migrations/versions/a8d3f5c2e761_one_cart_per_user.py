@@ -0,0 +1,47 @@
+"""One cart per user
+
+Revision ID: a8d3f5c2e761
+Revises: f3a9d6b8c115
+Create Date: 2026-10-18 10:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d3f5c2e761'
+down_revision = 'f3a9d6b8c115'
+branch_labels = None
+depends_on = None
+
+# Every cart but each user's newest one (older carts have expired by then)
+STALE_CARTS = "SELECT id FROM carts WHERE id NOT IN (SELECT MAX(id) FROM carts GROUP BY user_id)"
+
+
+def upgrade():
+    # Release the older carts (items back to stock) before the unique index
+    op.execute(
+        f"""
+        UPDATE products
+        SET available_quantity = available_quantity + (
+            SELECT SUM(ci.quantity) FROM cart_items ci
+            WHERE ci.product_id = products.id AND ci.cart_id IN ({STALE_CARTS})
+        )
+        WHERE id IN (
+            SELECT product_id FROM cart_items WHERE cart_id IN ({STALE_CARTS})
+        )
+        """
+    )
+    op.execute(f"DELETE FROM cart_items WHERE cart_id IN ({STALE_CARTS})")
+    op.execute(f"DELETE FROM carts WHERE id IN ({STALE_CARTS})")
+
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.drop_index('ix_carts_user_id_expires_at')
+        batch_op.create_index('ix_carts_user_id', ['user_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('carts', schema=None) as batch_op:
+        batch_op.drop_index('ix_carts_user_id')
+        batch_op.create_index('ix_carts_user_id_expires_at', ['user_id', 'expires_at'], unique=False)
@@ -0,0 +1,48 @@
+"""Add product search indexes
+
+Revision ID: b3f1c8e2a9d4
+Revises: 7c2e9a41d5b3
+Create Date: 2026-10-17 14:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3f1c8e2a9d4'
+down_revision = '7c2e9a41d5b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # PostgreSQL only: other databases use the in-process search index
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # Full-text match and ts_rank in /products/search?q=
+    op.execute(
+        "CREATE INDEX ix_products_name_tsv ON products "
+        "USING gin (to_tsvector('simple', name))"
+    )
+    # Typo-tolerant matching (name % :q) and similarity() ranking
+    op.execute(
+        "CREATE INDEX ix_products_name_trgm ON products "
+        "USING gin (name gin_trgm_ops)"
+    )
+    # Autocomplete: lower(name) LIKE 'prefix%' ORDER BY lower(name)
+    op.execute(
+        "CREATE INDEX ix_products_name_lower_prefix ON products "
+        "(lower(name) text_pattern_ops)"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute("DROP INDEX IF EXISTS ix_products_name_lower_prefix")
+    op.execute("DROP INDEX IF EXISTS ix_products_name_trgm")
+    op.execute("DROP INDEX IF EXISTS ix_products_name_tsv")
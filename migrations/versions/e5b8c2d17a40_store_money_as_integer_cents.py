@@ -0,0 +1,99 @@
+"""Store money as integer cents
+
+Revision ID: e5b8c2d17a40
+Revises: d4a7e1f09c62
+Create Date: 2026-10-17 18:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b8c2d17a40'
+down_revision = 'd4a7e1f09c62'
+branch_labels = None
+depends_on = None
+
+# (table, float column, cents column)
+MONEY_COLUMNS = [
+    ('products', 'price', 'price_cents'),
+    ('orders', 'total_amount', 'total_cents'),
+    ('order_items', 'price_at_order', 'price_at_order_cents'),
+]
+BATCH_SIZE = 10000
+
+
+def backfill(table_name, source, target, expression):
+    """
+    Copy `source` into `target` in id ranges of BATCH_SIZE rows, committing
+    each batch so no long transaction holds row locks on a large table.
+    Only rows with target still NULL are written, so a rerun resumes.
+    """
+    table = sa.table(table_name, sa.column('id'), sa.column(source), sa.column(target))
+    bind = op.get_bind()
+    with op.get_context().autocommit_block():
+        last_id = 0
+        while True:
+            upper = bind.execute(
+                sa.select(table.c.id)
+                .where(table.c.id > last_id)
+                .order_by(table.c.id)
+                .offset(BATCH_SIZE - 1)
+                .limit(1)
+            ).scalar()
+            batch = table.c.id > last_id
+            if upper is not None:
+                batch = sa.and_(batch, table.c.id <= upper)
+            bind.execute(
+                table.update()
+                .where(batch, table.c[target].is_(None))
+                .values({target: expression(table.c[source])})
+            )
+            if upper is None:
+                break
+            last_id = upper
+
+
+def to_cents(column):
+    # Round the amount as it was written (0.285 -> 29), not its binary float
+    if op.get_bind().dialect.name == 'postgresql':
+        amount = sa.cast(column, sa.Numeric)  # float8 -> numeric keeps 15 digits
+    else:
+        amount = sa.func.round(column, 2)
+    return sa.cast(sa.func.round(amount * 100), sa.BigInteger)
+
+
+def existing_columns(table_name):
+    return {c['name'] for c in sa.inspect(op.get_bind()).get_columns(table_name)}
+
+
+def upgrade():
+    for table_name, source, target in MONEY_COLUMNS:
+        if target not in existing_columns(table_name):
+            op.add_column(table_name, sa.Column(target, sa.BigInteger(), nullable=True))
+
+    for table_name, source, target in MONEY_COLUMNS:
+        backfill(table_name, source, target, to_cents)
+
+    for table_name, source, target in MONEY_COLUMNS:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.alter_column(target, existing_type=sa.BigInteger(), nullable=False)
+            batch_op.drop_column(source)
+
+
+def downgrade():
+    for table_name, source, target in MONEY_COLUMNS:
+        if source not in existing_columns(table_name):
+            op.add_column(table_name, sa.Column(source, sa.Float(), nullable=True))
+
+    for table_name, source, target in MONEY_COLUMNS:
+        backfill(
+            table_name, target, source,
+            lambda column: sa.cast(column, sa.Float) / 100,
+        )
+
+    for table_name, source, target in MONEY_COLUMNS:
+        with op.batch_alter_table(table_name, schema=None) as batch_op:
+            batch_op.alter_column(source, existing_type=sa.Float(), nullable=False)
+            batch_op.drop_column(target)
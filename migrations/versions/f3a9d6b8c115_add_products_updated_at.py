@@ -0,0 +1,33 @@
+"""Add products.updated_at
+
+Revision ID: f3a9d6b8c115
+Revises: e5b8c2d17a40
+Create Date: 2026-10-17 20:10:00.000000
+
+"""
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3a9d6b8c115'
+down_revision = 'e5b8c2d17a40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Existing rows count as modified now (naive IST, like the other timestamps)
+    products = sa.table('products', sa.column('updated_at', sa.DateTime()))
+    now = datetime.now(ZoneInfo('Asia/Kolkata')).replace(tzinfo=None)
+    op.execute(products.update().values(updated_at=now))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
@@ -1,7 +1,6 @@
 from datetime import datetime, timedelta
 from zoneinfo import ZoneInfo
 from database import db
-import bcrypt
 
 # Indian Standard Time
 IST = ZoneInfo("Asia/Kolkata")
@@ -21,9 +20,13 @@ class User(db.Model):
     )
 
     def set_password(self, password: str):
+        import bcrypt  # only needed by the scripts that set passwords
+
         self.password_hash = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
 
     def check_password(self, password: str) -> bool:
+        import bcrypt
+
         return bcrypt.checkpw(password.encode(), self.password_hash.encode())
 
     def __repr__(self):
@@ -35,9 +38,16 @@ class Product(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(120), nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    # Money columns hold integer minor units (paise); see utils/money.py
+    price_cents = db.Column(db.BigInteger, nullable=False)
     available_quantity = db.Column(db.Integer, nullable=False, default=0)
     version = db.Column(db.Integer, nullable=False, default=1)
+    # Also set by the Core UPDATEs that move stock; catalog Last-Modified
+    updated_at = db.Column(
+        db.DateTime,
+        default=lambda: datetime.now(IST),
+        onupdate=lambda: datetime.now(IST),
+    )
 
     cart_items = db.relationship(
         "CartItem", back_populates="product", cascade="all, delete-orphan"
@@ -52,6 +62,12 @@ class Product(db.Model):
 
 class Cart(db.Model):
     __tablename__ = "carts"
+    __table_args__ = (
+        # One cart per user: a new cart replaces the released expired one,
+        # and concurrent first adds cannot both insert a cart
+        db.Index("ix_carts_user_id", "user_id", unique=True),
+        db.Index("ix_carts_expires_at", "expires_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
@@ -71,6 +87,11 @@ class Cart(db.Model):
 
 class CartItem(db.Model):
     __tablename__ = "cart_items"
+    __table_args__ = (
+        db.Index(
+            "ix_cart_items_cart_id_product_id", "cart_id", "product_id", unique=True
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     cart_id = db.Column(db.Integer, db.ForeignKey("carts.id"), nullable=False)
@@ -86,10 +107,13 @@ class CartItem(db.Model):
 
 class Order(db.Model):
     __tablename__ = "orders"
+    __table_args__ = (
+        db.Index("ix_orders_user_id_created_at", "user_id", "created_at"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
-    total_amount = db.Column(db.Float, nullable=False)
+    total_cents = db.Column(db.BigInteger, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(IST))
 
     user = db.relationship("User", back_populates="orders")
@@ -98,20 +122,48 @@ class Order(db.Model):
     )
 
     def __repr__(self):
-        return f"<Order {self.id} user={self.user_id} total={self.total_amount}>"
+        return f"<Order {self.id} user={self.user_id} total_cents={self.total_cents}>"
 
 
 class OrderItem(db.Model):
     __tablename__ = "order_items"
 
     id = db.Column(db.Integer, primary_key=True)
-    order_id = db.Column(db.Integer, db.ForeignKey("orders.id"), nullable=False)
+    order_id = db.Column(
+        db.Integer, db.ForeignKey("orders.id"), nullable=False, index=True
+    )
     product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
-    price_at_order = db.Column(db.Float, nullable=False)
+    price_at_order_cents = db.Column(db.BigInteger, nullable=False)
 
     order = db.relationship("Order", back_populates="items")
     product = db.relationship("Product", back_populates="order_items")
 
     def __repr__(self):
         return f"<OrderItem order={self.order_id}, product={self.product_id}, qty={self.quantity}>"
+
+
+class IdempotencyKey(db.Model):
+    """Stored response of a request sent with an Idempotency-Key header."""
+
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (
+        db.Index("ix_idempotency_keys_user_id_key", "user_id", "key", unique=True),
+        db.Index("ix_idempotency_keys_expires_at", "expires_at"),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False
+    )
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    # NULL while the first request with this key is still running
+    status_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(IST))
+    locked_until = db.Column(db.DateTime)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f"<IdempotencyKey user={self.user_id} key={self.key} status={self.status_code}>"
@@ -1,4 +1,7 @@
-from app import app, db, User, Product
+from database import create_db_app, db
+from models import User, Product
+
+app = create_db_app()
 
 with app.app_context():
     # Users
@@ -7,11 +10,11 @@ with app.app_context():
     u3 = User(username="alice_smith", email="alice@example.com")
 
     # Products (variety of items and prices)
-    p1 = Product(name="Laptop", price=80000, available_quantity=10)
-    p2 = Product(name="Headphones", price=3000, available_quantity=50)
-    p3 = Product(name="Phone", price=45000, available_quantity=15)
-    p4 = Product(name="Tablet", price=35000, available_quantity=8)
-    p5 = Product(name="Monitor", price=25000, available_quantity=20)
+    p1 = Product(name="Laptop", price_cents=80000_00, available_quantity=10)
+    p2 = Product(name="Headphones", price_cents=3000_00, available_quantity=50)
+    p3 = Product(name="Phone", price_cents=45000_00, available_quantity=15)
+    p4 = Product(name="Tablet", price_cents=35000_00, available_quantity=8)
+    p5 = Product(name="Monitor", price_cents=25000_00, available_quantity=20)
 
     db.session.add_all([u1, u2, u3, p1, p2, p3, p4, p5])
     db.session.commit()
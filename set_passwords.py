@@ -1,7 +1,9 @@
-from app import app, db
+from database import create_db_app, db
 from models import User
 from getpass import getpass
 
+app = create_db_app()
+
 with app.app_context():
     users = User.query.filter(User.password_hash.is_(None)).all()
     for u in users:
@@ -0,0 +1,108 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app import create_app
+from database import db
+from models import Product
+
+
+@pytest.fixture
+def app_config():
+    """Extra settings for the app fixture; override it in a test module."""
+    return {}
+
+
+@pytest.fixture
+def app(tmp_path, app_config):
+    """The API on a fresh SQLite file (threads share it, unlike :memory:)."""
+    app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{tmp_path / 'test.db'}",
+            "SQLALCHEMY_BINDS": {},
+            # Concurrent writers wait for SQLite's lock instead of failing
+            "SQLALCHEMY_ENGINE_OPTIONS": {"connect_args": {"timeout": 30}},
+            "SECRET_KEY": "test-secret",
+            "REFRESH_SECRET_KEY": "test-refresh-secret",
+            "BCRYPT_ROUNDS": 4,
+            **app_config,
+        }
+    )
+    with app.app_context():
+        # Only the primary: init_app keeps every bind key ever configured in
+        # db.metadatas, so "__all__" would also reach other tests' replicas
+        if db.engine.dialect.name != "sqlite":
+            db.drop_all(bind_key=None)  # a scratch server database
+        db.create_all(bind_key=None)
+    yield app
+    app.extensions["password_hasher"].shutdown()
+    with app.app_context():
+        if db.engine.dialect.name != "sqlite":
+            db.drop_all(bind_key=None)
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def login(app):
+    """login(username) registers a user and returns its Authorization header."""
+
+    def login(username="alice"):
+        response = app.test_client().post(
+            "/auth/register",
+            json={
+                "username": username,
+                "email": f"{username}@example.com",
+                "password": "secret-password",
+            },
+        )
+        assert response.status_code == 201, response.get_json()
+        return {"Authorization": f"Bearer {response.get_json()['access_token']}"}
+
+    return login
+
+
+@pytest.fixture
+def add_products(app):
+    """add_products(n, stock) inserts n products and returns their ids."""
+
+    def add_products(count, stock=100, price_cents=1999):
+        with app.app_context():
+            products = [
+                Product(
+                    name=f"Product {i}",
+                    price_cents=price_cents + i,
+                    available_quantity=stock,
+                )
+                for i in range(count)
+            ]
+            db.session.add_all(products)
+            db.session.commit()
+            return [product.id for product in products]
+
+    return add_products
+
+
+@pytest.fixture
+def sql_statements(app):
+    """`with sql_statements() as statements:` lists the SQL run inside the block."""
+    with app.app_context():
+        engine = db.engine
+
+    @contextmanager
+    def sql_statements():
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            yield statements
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    return sql_statements
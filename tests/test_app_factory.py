@@ -0,0 +1,16 @@
+from sqlalchemy import inspect
+from app import create_app
+from models import Product
+
+
+def listener_counts():
+    mapper_events = inspect(Product).dispatch
+    return len(mapper_events.after_insert), len(mapper_events.after_update)
+
+
+def test_create_app_adds_no_product_listeners(app):
+    before = listener_counts()
+    for _ in range(3):
+        other = create_app({**app.config, "SQLALCHEMY_DATABASE_URI": "sqlite://"})
+        other.extensions["password_hasher"].shutdown()
+    assert listener_counts() == before
@@ -0,0 +1,26 @@
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import func, select
+from database import db
+from models import Cart, CartItem
+
+REQUESTS = 8
+
+
+def test_concurrent_first_adds_share_one_cart(app, login, add_products):
+    """A user's first adds race to create the cart; all land in the same one."""
+    product_ids = add_products(REQUESTS)
+    auth = login()
+
+    def add(product_id):
+        response = app.test_client().post(
+            "/cart/add", json={"product_id": product_id, "quantity": 1}, headers=auth
+        )
+        return response.status_code
+
+    with ThreadPoolExecutor(max_workers=REQUESTS) as pool:
+        statuses = list(pool.map(add, product_ids))
+
+    assert statuses == [200] * REQUESTS
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Cart)) == 1
+        assert db.session.scalar(select(func.count()).select_from(CartItem)) == REQUESTS
@@ -0,0 +1,65 @@
+import time
+import pytest
+from database import db
+from models import Cart, CartItem, User
+
+
+def fill_cart(app, username, product_ids):
+    with app.app_context():
+        user_id = db.session.scalar(db.select(User.id).filter_by(username=username))
+        cart = Cart(user_id=user_id)
+        cart.items = [CartItem(product_id=pid, quantity=2) for pid in product_ids]
+        db.session.add(cart)
+        db.session.commit()
+
+
+@pytest.mark.parametrize("size", [1, 50, 500])
+def test_cart_view_is_one_statement(
+    app, client, login, add_products, sql_statements, size
+):
+    auth = login("shopper")
+    product_ids = add_products(size, price_cents=1000)
+    fill_cart(app, "shopper", product_ids)
+
+    with sql_statements() as statements:
+        started = time.perf_counter()
+        response = client.get("/cart", headers=auth)
+        elapsed = time.perf_counter() - started
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert len(body["items"]) == size
+    # price_cents 1000 + i, two of each
+    assert body["total"] == sum(2 * (1000 + i) for i in range(size)) / 100
+    assert len(statements) == 1, statements
+    # Generous bound: one query and one serialization, not one per line
+    assert elapsed < 1.0
+
+
+@pytest.mark.parametrize("size", [1, 50, 500])
+def test_unchanged_cart_revalidates_with_304(
+    app, client, login, add_products, sql_statements, size
+):
+    auth = login("shopper")
+    fill_cart(app, "shopper", add_products(size))
+    etag = client.get("/cart", headers=auth).headers["ETag"]
+
+    with sql_statements() as statements:
+        response = client.get("/cart", headers={**auth, "If-None-Match": etag})
+
+    assert response.status_code == 304
+    assert response.data == b""
+    assert len(statements) == 1
+
+
+def test_cart_change_changes_etag(client, login, add_products):
+    auth = login("shopper")
+    first, second = add_products(2)
+    client.post("/cart/add", json={"product_id": first}, headers=auth)
+    etag = client.get("/cart", headers=auth).headers["ETag"]
+
+    client.post("/cart/add", json={"product_id": second}, headers=auth)
+    response = client.get("/cart", headers={**auth, "If-None-Match": etag})
+
+    assert response.status_code == 200
+    assert len(response.get_json()["items"]) == 2
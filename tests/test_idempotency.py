@@ -0,0 +1,117 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from database import db
+from models import CartItem, Order, Product
+from utils.auth_middleware import require_auth
+from utils.idempotency import idempotent
+
+THREADS = 16
+
+
+@pytest.fixture
+def app_config():
+    # Short enough that the slow views below outlive a claim's lock
+    return {"IDEMPOTENCY_LOCK_SECONDS": 1, "IDEMPOTENCY_WAIT_SECONDS": 2}
+
+
+def hammer(app, path, auth, key, json=None):
+    """Send the same request with one Idempotency-Key from many threads."""
+
+    def send(_):
+        response = app.test_client().post(
+            path, json=json, headers={**auth, "Idempotency-Key": key}
+        )
+        return response.status_code, response.get_json()
+
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        return list(pool.map(send, range(THREADS)))
+
+
+def test_retried_add_reserves_once(app, login, add_products):
+    (product_id,) = add_products(1, stock=10)
+    auth = login()
+
+    results = hammer(
+        app, "/cart/add", auth, "add-1", {"product_id": product_id, "quantity": 3}
+    )
+
+    assert [status for status, _ in results] == [200] * THREADS
+    with app.app_context():
+        assert db.session.get(Product, product_id).available_quantity == 7
+        assert db.session.scalar(db.select(CartItem.quantity)) == 3
+
+
+def test_retried_checkout_places_one_order(app, client, login, add_products):
+    (product_id,) = add_products(1, stock=10)
+    auth = login()
+    client.post(
+        "/cart/add", json={"product_id": product_id, "quantity": 2}, headers=auth
+    )
+
+    results = hammer(app, "/cart/checkout", auth, "checkout-1")
+
+    assert [status for status, _ in results] == [200] * THREADS
+    assert len({body["order_id"] for _, body in results}) == 1
+    with app.app_context():
+        assert db.session.scalar(db.select(db.func.count()).select_from(Order)) == 1
+        assert db.session.get(Product, product_id).available_quantity == 8
+
+
+def test_key_reused_for_another_body_is_rejected(client, login, add_products):
+    first, second = add_products(2)
+    auth = {**login(), "Idempotency-Key": "add-2"}
+
+    client.post("/cart/add", json={"product_id": first}, headers=auth)
+    response = client.post("/cart/add", json={"product_id": second}, headers=auth)
+
+    assert response.status_code == 422
+
+
+def test_slow_request_keeps_its_claim(app, login):
+    """A view running past the lock timeout is waited for, not run again."""
+    runs = []
+
+    @app.route("/slow", methods=["POST"])
+    @require_auth
+    @idempotent
+    def slow():
+        runs.append(1)
+        time.sleep(2.5)
+        return {"runs": len(runs)}
+
+    auth = {**login(), "Idempotency-Key": "slow-1"}
+
+    def send(delay):
+        time.sleep(delay)
+        response = app.test_client().post("/slow", headers=auth)
+        return response.status_code, response.get_json()
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        first, retry = pool.map(send, [0, 1.5])
+
+    assert runs == [1]
+    assert first == retry == (200, {"runs": 1})
+
+
+def test_waiting_duplicate_gives_up_with_409(app, login):
+    @app.route("/stuck", methods=["POST"])
+    @require_auth
+    @idempotent
+    def stuck():
+        time.sleep(3.5)
+        return {}
+
+    auth = {**login(), "Idempotency-Key": "stuck-1"}
+
+    def send(delay):
+        time.sleep(delay)
+        started = time.monotonic()
+        response = app.test_client().post("/stuck", headers=auth)
+        return response.status_code, time.monotonic() - started
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        _, (status, waited) = pool.map(send, [0, 0.5])
+
+    assert status == 409
+    assert 2 <= waited < 3
@@ -0,0 +1,49 @@
+from database import db
+from models import Order, OrderItem, User
+
+ORDERS = 120
+ITEMS_PER_ORDER = 3
+
+
+def place_orders(app, username, product_ids):
+    with app.app_context():
+        user_id = db.session.scalar(db.select(User.id).filter_by(username=username))
+        for _ in range(ORDERS):
+            order = Order(user_id=user_id, total_cents=0)
+            order.items = [
+                OrderItem(product_id=pid, quantity=2, price_at_order_cents=500)
+                for pid in product_ids[:ITEMS_PER_ORDER]
+            ]
+            db.session.add(order)
+        db.session.commit()
+
+
+def test_history_is_two_statements(app, client, login, add_products, sql_statements):
+    """Orders, then their items with product names; not one query per order."""
+    auth = login("buyer")
+    place_orders(app, "buyer", add_products(ITEMS_PER_ORDER))
+
+    with sql_statements() as statements:
+        response = client.get("/orders", headers=auth)
+
+    assert response.status_code == 200
+    orders = response.get_json()
+    assert len(orders) == ORDERS
+    assert all(len(order["items"]) == ITEMS_PER_ORDER for order in orders)
+    assert all(order["items"][0]["product_name"] for order in orders)
+    assert len(statements) == 2, statements
+
+
+def test_paged_history_is_two_statements(
+    app, client, login, add_products, sql_statements
+):
+    auth = login("buyer")
+    place_orders(app, "buyer", add_products(ITEMS_PER_ORDER))
+
+    with sql_statements() as statements:
+        response = client.get("/orders?limit=20", headers=auth)
+
+    assert response.status_code == 200
+    assert len(response.get_json()) == 20
+    assert response.headers["X-Next-Cursor"]
+    assert len(statements) == 2, statements
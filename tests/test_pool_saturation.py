@@ -0,0 +1,82 @@
+"""
+Pool saturation: with every connection checked out, requests queue for up
+to pool_timeout, then get a 503; /internal/metrics reports the waits.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from database import db
+
+POOL_SIZE = 2
+MAX_OVERFLOW = 1
+POOL_TIMEOUT = 1  # SQLAlchemy truncates pool_timeout to whole seconds
+
+
+@pytest.fixture
+def app_config():
+    return {
+        "SQLALCHEMY_ENGINE_OPTIONS": {
+            "pool_size": POOL_SIZE,
+            "max_overflow": MAX_OVERFLOW,
+            "pool_timeout": POOL_TIMEOUT,
+            "connect_args": {"timeout": 30},
+        },
+        "INTERNAL_ENDPOINTS": True,
+    }
+
+
+def hold_all_connections(app):
+    with app.app_context():
+        engine = db.engine
+    return [engine.connect() for _ in range(POOL_SIZE + MAX_OVERFLOW)]
+
+
+def pool_stats(client):
+    return client.get("/internal/metrics").get_json()["pool"]["primary"]
+
+
+def test_requests_wait_for_a_free_connection(app, client, add_products):
+    add_products(5)
+    held = hold_all_connections(app)
+
+    def release_soon():
+        time.sleep(POOL_TIMEOUT / 2)
+        for conn in held:
+            conn.close()
+
+    releaser = threading.Thread(target=release_soon)
+    releaser.start()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(
+            pool.map(
+                lambda _: app.test_client().get("/products?limit=5").status_code,
+                range(8),
+            )
+        )
+    releaser.join()
+
+    assert statuses == [200] * 8
+    stats = pool_stats(client)
+    assert stats["peak_checked_out"] == POOL_SIZE + MAX_OVERFLOW
+    assert stats["peak_overflow"] == MAX_OVERFLOW
+    assert stats["timeouts"] == 0
+    assert stats["wait_max_ms"] >= POOL_TIMEOUT / 4 * 1000
+
+
+def test_exhausted_pool_answers_503(app, client, add_products):
+    add_products(5)
+    held = hold_all_connections(app)
+    try:
+        started = time.perf_counter()
+        response = client.get("/products?limit=5")
+        elapsed = time.perf_counter() - started
+    finally:
+        for conn in held:
+            conn.close()
+
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+    assert elapsed >= POOL_TIMEOUT
+    assert pool_stats(client)["timeouts"] == 1
@@ -0,0 +1,90 @@
+"""The in-process search index (SQLite): write tracking and rebuilds."""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from sqlalchemy import insert
+from database import db
+from models import Product
+
+
+@pytest.fixture
+def search(client):
+    def search(q):
+        response = client.get("/products/search", query_string={"q": q})
+        assert response.status_code == 200
+        return [product["id"] for product in response.get_json()]
+
+    return search
+
+
+@pytest.fixture
+def builds(app):
+    """Count the index's builds, each made to take 0.3 s."""
+    index = app.extensions["search_index"]
+    build = index._build
+    count = []
+
+    def slow_build():
+        count.append(1)
+        time.sleep(0.3)
+        build()
+
+    index._build = slow_build
+    return count
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+def test_orm_writes_update_the_index_in_place(app, search, add_products, builds):
+    first, second = add_products(2)
+    assert search("product") == [first, second]
+
+    with app.app_context():
+        db.session.get(Product, first).name = "Gaming Laptop"
+        db.session.delete(db.session.get(Product, second))
+        db.session.commit()
+
+    assert search("laptop") == [first]
+    assert search("product") == []
+    assert len(builds) == 1
+
+
+def test_bulk_insert_marks_the_index_dirty(app, search, add_products, builds):
+    add_products(1)
+    search("product")
+    with app.app_context():
+        db.session.execute(
+            insert(Product).values(name="Desk Lamp", price_cents=999, version=1)
+        )
+        db.session.commit()
+
+    assert search("lamp") == []  # served from the old index while rebuilding
+    wait_for(lambda: search("lamp") != [])
+    assert len(builds) == 2
+
+
+@pytest.mark.parametrize("app_config", [{"SEARCH_INDEX_MAX_AGE": 0}])
+def test_stale_index_rebuilds_once_in_the_background(app, add_products, builds):
+    add_products(3)
+    index = app.extensions["search_index"]
+    with app.test_request_context():
+        index.search("product", 10)  # first build blocks
+
+    def timed_search(_):
+        with app.test_request_context():
+            started = time.perf_counter()
+            ids = index.search("product", 10)
+            return len(ids), time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(timed_search, range(8)))
+
+    assert all(found == 3 and took < 0.2 for found, took in results)
+    wait_for(lambda: not index._rebuilding)
+    assert len(builds) == 2
@@ -0,0 +1,52 @@
+"""The hot lookups must be index searches, not table scans (SQLite plans)."""
+
+from datetime import datetime
+from sqlalchemy import select
+from werkzeug.datastructures import MultiDict
+from app import IST, build_orders_query, latest_cart_query
+from clear_expiry_cart import claim_expired_query
+from database import db
+from models import CartItem
+
+
+def query_plan(app, statement):
+    """EXPLAIN QUERY PLAN details for a SQLAlchemy statement."""
+    with app.app_context():
+        compiled = statement.compile(bind=db.engine)
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+        with db.engine.connect() as conn:
+            rows = conn.exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + str(compiled), params
+            ).all()
+    return [row[-1] for row in rows]
+
+
+def assert_uses_index(plan, table, index):
+    assert any(
+        step.startswith(f"SEARCH {table} USING") and index in step for step in plan
+    ), plan
+    assert not any(step.startswith(f"SCAN {table}") for step in plan), plan
+
+
+def test_latest_cart_uses_user_index(app):
+    plan = query_plan(app, latest_cart_query(1).with_for_update())
+    assert_uses_index(plan, "carts", "ix_carts_user_id")
+
+
+def test_sweeper_claim_uses_expiry_index(app):
+    plan = query_plan(app, claim_expired_query(datetime.now(IST), 1000))
+    assert_uses_index(plan, "carts", "ix_carts_expires_at")
+
+
+def test_cart_item_lookup_uses_cart_product_index(app):
+    statement = select(CartItem).where(CartItem.cart_id == 1, CartItem.product_id == 2)
+    plan = query_plan(app, statement)
+    assert_uses_index(plan, "cart_items", "ix_cart_items_cart_id_product_id")
+
+
+def test_order_history_uses_user_created_index(app):
+    args = MultiDict({"limit": "20", "from": "2025-01-01"})
+    query, _, error = build_orders_query(1, args, page_max=100)
+    assert error is None
+    plan = query_plan(app, query)
+    assert_uses_index(plan, "orders", "ix_orders_user_id_created_at")
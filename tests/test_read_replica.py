@@ -0,0 +1,80 @@
+"""
+Read replicas with two SQLite files: the primary is the app fixture's
+database and `replica_0` is a second file with different rows, so each
+response shows which database served it.
+"""
+
+import pytest
+from sqlalchemy import insert
+from app import create_app
+from database import db
+from models import Product
+from utils.read_replica import STICKY_COOKIE
+
+
+@pytest.fixture
+def app_config(tmp_path):
+    return {"SQLALCHEMY_BINDS": {"replica_0": f"sqlite:///{tmp_path / 'replica.db'}"}}
+
+
+@pytest.fixture
+def replica(app):
+    """Create the tables in the replica file and give it its own product."""
+    with app.app_context():
+        engine = db.engines["replica_0"]
+        db.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                insert(Product).values(
+                    name="Replica product", price_cents=100, available_quantity=5
+                )
+            )
+    return engine
+
+
+def product_names(client):
+    response = client.get("/products?limit=10")
+    assert response.status_code == 200
+    return [product["name"] for product in response.get_json()]
+
+
+def test_reads_go_to_the_replica(app, client, replica, add_products):
+    add_products(1)
+    assert product_names(client) == ["Replica product"]
+
+
+def test_sticky_cookie_reads_own_writes_on_another_worker(
+    app, client, replica, login, add_products
+):
+    (product_id,) = add_products(1)
+    auth = login()
+    response = client.post(
+        "/cart/add", json={"product_id": product_id, "quantity": 2}, headers=auth
+    )
+    assert response.status_code == 200
+    cookie = client.get_cookie(STICKY_COOKIE)
+    assert cookie is not None
+
+    # A second app over the same files, as another worker or host would be
+    other = create_app(app.config)
+    try:
+        with_cookie = other.test_client()
+        with_cookie.set_cookie(STICKY_COOKIE, cookie.value)
+        cart = with_cookie.get("/cart", headers=auth).get_json()
+        assert [item["quantity"] for item in cart["items"]] == [2]
+
+        without_cookie = other.test_client()
+        assert without_cookie.get("/cart", headers=auth).get_json()["items"] == []
+    finally:
+        other.extensions["password_hasher"].shutdown()
+
+
+def test_unreachable_replica_falls_back_to_the_primary(app, client, add_products):
+    # No replica tables: every replica query fails with an OperationalError
+    add_products(1)
+
+    assert product_names(client) == ["Product 0"]
+    router = app.extensions["replica_router"]
+    with app.app_context():
+        assert router.stats()["down"] == ["replica_0"]
+    assert product_names(client) == ["Product 0"]
@@ -0,0 +1,28 @@
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+# Sync backend -> asyncio DBAPI used by the ASGI entry point
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def to_async_url(url):
+    """Swap the DBAPI of a database URL for its asyncio counterpart."""
+    url = make_url(url)
+    if url.drivername in ASYNC_DRIVERS.values():
+        return url
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for '{backend}'")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+def make_async_session_factory(url, **engine_options):
+    """
+    Build an AsyncEngine for `url`; returns (engine, async_sessionmaker).
+    Objects stay usable after commit so views can serialize them.
+    """
+    engine = create_async_engine(to_async_url(url), **engine_options)
+    return engine, async_sessionmaker(engine, expire_on_commit=False)
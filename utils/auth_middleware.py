@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import request, jsonify
 from utils.jwt_utils import decode_jwt
+from utils.profiling import span
 
 
 def require_auth(f):
@@ -14,7 +15,8 @@ def require_auth(f):
         if token.startswith("Bearer "):
             token = token.split(" ")[1]
 
-        payload = decode_jwt(token)
+        with span("jwt"):
+            payload = decode_jwt(token)
         if not payload:
             return jsonify({"error": "Invalid or expired token"}), 401
 
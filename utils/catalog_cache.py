@@ -0,0 +1,136 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session, object_session
+from models import IST, Product
+
+Snapshot = namedtuple("Snapshot", "etag last_modified next_cursor bodies")
+
+
+def catalog_revision_query(query, limit=None):
+    """
+    Revision stamp of the rows a catalog query returns, plus the probe row
+    that decides X-Next-Cursor: row count, sum of ids, sum of versions and
+    the latest updated_at. The stock and import UPDATEs bump version and
+    updated_at is refreshed on every write, so any change to those rows,
+    or a row entering or leaving the page, changes the stamp.
+    """
+    rows = query.with_only_columns(Product.id, Product.version, Product.updated_at)
+    if limit is not None:
+        rows = rows.limit(limit + 1)
+    rows = rows.subquery()
+    return select(
+        func.count(),
+        func.coalesce(func.sum(rows.c.id), 0),
+        func.coalesce(func.sum(rows.c.version), 0),
+        func.max(rows.c.updated_at),
+    )
+
+
+def catalog_validators(stamp):
+    """(weak ETag, Last-Modified or None) for a catalog_revision_query row."""
+    count, id_sum, version_sum, updated_at = stamp
+    if updated_at is not None and updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=IST)
+    revision = f"{count}:{id_sum}:{version_sum}:{updated_at}"
+    etag = hashlib.sha1(revision.encode()).hexdigest()
+    return etag, updated_at
+
+
+def not_modified(request, etag, last_modified):
+    """True when the request's validators match (If-None-Match wins)."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+class CatalogSnapshots:
+    """
+    Serialized and precompressed bodies of hot catalog pages, keyed by page
+    and checked against the page's current ETag on every request, so a page
+    is only re-serialized and recompressed after its rows change. Pages are
+    dropped as soon as a product is added or edited through the ORM (the
+    listeners at the bottom of this module, registered once for all apps).
+    """
+
+    def __init__(self, compressor, maxsize=64, levels=None):
+        self.compressor = compressor
+        self.maxsize = maxsize
+        # Compressed once per change, so slower levels than per-request ones
+        self.levels = levels or {"gzip": 9, "br": 11}
+        self._pages = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "builds": 0, "invalidations": 0}
+
+    def get(self, key, etag):
+        with self._lock:
+            snapshot = self._pages.get(key)
+            if snapshot is None or snapshot.etag != etag:
+                return None
+            self._pages.move_to_end(key)
+            self._stats["hits"] += 1
+            return snapshot
+
+    def put(self, key, etag, last_modified, next_cursor, body):
+        bodies = {None: body}
+        if len(body) >= self.compressor.min_size:
+            for encoding in self.compressor.encodings:
+                bodies[encoding] = self.compressor.compress(
+                    body, encoding, self.levels.get(encoding)
+                )
+        snapshot = Snapshot(etag, last_modified, next_cursor, bodies)
+        if self.maxsize <= 0:
+            return snapshot
+        with self._lock:
+            self._pages[key] = snapshot
+            self._pages.move_to_end(key)
+            while len(self._pages) > self.maxsize:
+                self._pages.popitem(last=False)
+            self._stats["builds"] += 1
+        return snapshot
+
+    def clear(self):
+        with self._lock:
+            if self._pages:
+                self._pages.clear()
+                self._stats["invalidations"] += 1
+
+    def encoding_for(self, snapshot, accept_encodings):
+        """The snapshot body to send: None (identity) or a content coding."""
+        if len(snapshot.bodies) == 1:
+            return None
+        return self.compressor.negotiate(accept_encodings)
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, pages=len(self._pages), maxsize=self.maxsize)
+
+
+# ---------------------------
+# Invalidation (registered once; clears the current app's snapshots)
+# ---------------------------
+
+CATALOG_CHANGED = "catalog_changed"
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+def _mark_changed(mapper, connection, target):
+    object_session(target).info[CATALOG_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate(session):
+    if session.info.pop(CATALOG_CHANGED, False) and has_app_context():
+        snapshots = current_app.extensions.get("catalog_snapshots")
+        if snapshots is not None:
+            snapshots.clear()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(CATALOG_CHANGED, None)
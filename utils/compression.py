@@ -0,0 +1,142 @@
+import gzip
+import threading
+import zlib
+from flask import request
+
+try:
+    import brotli
+except ImportError:  # optional dependency, gzip only without it
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = {"application/json"}
+
+
+class _GzipStream:
+    def __init__(self, level):
+        # wbits=31: zlib stream in a gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ResponseCompressor:
+    """
+    gzip / brotli response compression negotiated through Accept-Encoding.
+
+    JSON responses of at least `min_size` bytes are compressed, and streamed
+    JSON responses are compressed chunk by chunk. Responses that already
+    carry a Content-Encoding (e.g. precompressed catalog snapshots) are left
+    alone. `level` / `br_quality` are tuned for per-request compression;
+    bodies compressed once can pass their own to compress().
+    """
+
+    def __init__(self, min_size=1024, level=6, br_quality=4):
+        self.min_size = min_size
+        self.level = level
+        self.br_quality = br_quality
+        self.encodings = ["br", "gzip"] if brotli else ["gzip"]
+        self._lock = threading.Lock()
+        self._stats = {"compressed": 0, "streamed": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def init_app(self, app):
+        app.after_request(self._compress_response)
+
+    def negotiate(self, accept_encodings):
+        """Best encoding the client accepts (werkzeug Accept), or None."""
+        return accept_encodings.best_match(self.encodings)
+
+    def compress(self, data, encoding, level=None):
+        """`level` is the gzip level or brotli quality; defaults to the settings."""
+        if encoding == "br":
+            quality = self.br_quality if level is None else level
+            return brotli.compress(data, quality=quality)
+        level = self.level if level is None else level
+        return gzip.compress(data, compresslevel=level, mtime=0)
+
+    def stream(self, encoding):
+        """Incremental compressor with compress(chunk) / finish()."""
+        if encoding == "br":
+            return _BrotliStream(self.br_quality)
+        return _GzipStream(self.level)
+
+    def compressible(self, response):
+        return (
+            response.status_code == 200
+            and response.mimetype in COMPRESSIBLE_MIMETYPES
+            and "Content-Encoding" not in response.headers
+        )
+
+    def record(self, size_in, size_out, streamed=False):
+        with self._lock:
+            self._stats["streamed" if streamed else "compressed"] += 1
+            self._stats["bytes_in"] += size_in
+            self._stats["bytes_out"] += size_out
+
+    def _compress_response(self, response):
+        if not self.compressible(response):
+            return response
+
+        if response.is_streamed:
+            response.vary.add("Accept-Encoding")
+            encoding = self.negotiate(request.accept_encodings)
+            if encoding:
+                response.response = self._compress_chunks(response.response, encoding)
+                response.headers["Content-Encoding"] = encoding
+                response.headers.pop("Content-Length", None)
+            return response
+
+        data = response.get_data()
+        if len(data) < self.min_size:
+            return response
+        response.vary.add("Accept-Encoding")
+        encoding = self.negotiate(request.accept_encodings)
+        if encoding:
+            body = self.compress(data, encoding)
+            response.set_data(body)
+            response.headers["Content-Encoding"] = encoding
+            self.record(len(data), len(body))
+        return response
+
+    def _compress_chunks(self, chunks, encoding):
+        compressor = self.stream(encoding)
+        size_in = size_out = 0
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                size_in += len(chunk)
+                out = compressor.compress(chunk)
+                if out:
+                    size_out += len(out)
+                    yield out
+            out = compressor.finish()
+            size_out += len(out)
+            yield out
+            self.record(size_in, size_out, streamed=True)
+        finally:
+            # Let the wrapped generator release its context / cursor
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, encodings=self.encodings)
+        if stats["bytes_in"]:
+            stats["ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3)
+        return stats
@@ -0,0 +1,312 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime, timedelta
+from functools import wraps
+from zoneinfo import ZoneInfo
+from flask import Response, current_app, jsonify, make_response, request
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from database import db
+from models import IdempotencyKey
+
+IST = ZoneInfo("Asia/Kolkata")
+
+StoredResponse = namedtuple(
+    "StoredResponse", "request_hash status_code body expires_at"
+)
+
+
+class IdempotencyStore:
+    """
+    Replays the stored response of requests retried with the same
+    `Idempotency-Key` header instead of running them again.
+
+    The idempotency_keys table is the source of truth, shared by all workers;
+    rows live for `ttl` seconds. Completed responses are also kept in a bounded
+    in-process LRU so replays usually cost no query.
+
+    A key is claimed by inserting its row before the view runs. The unique
+    (user_id, key) index lets exactly one concurrent duplicate win; the others
+    poll until it finishes (up to `wait_timeout`, then 409) and replay its
+    response. While the view runs, a heartbeat thread pushes the claim's
+    `locked_until` forward every `lock_timeout / 3` seconds, so only a claim
+    whose request died is taken over after `lock_timeout` seconds, never one
+    that is merely slow. Failed requests (exceptions, 5xx) release the key so
+    the client can retry.
+    """
+
+    def __init__(self, ttl=86400, maxsize=10000, lock_timeout=30, wait_timeout=10):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.lock_timeout = lock_timeout
+        self.wait_timeout = wait_timeout
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"executed": 0, "replayed": 0, "cache_hits": 0, "waited": 0}
+        self._held = set()
+        self._heartbeat = None
+
+    # ---- in-process LRU ----
+
+    def _cache_get(self, cache_key, now):
+        with self._lock:
+            stored = self._cache.get(cache_key)
+            if stored is None:
+                return None
+            if stored.expires_at <= now:
+                del self._cache[cache_key]
+                return None
+            self._cache.move_to_end(cache_key)
+            self._stats["cache_hits"] += 1
+            return stored
+
+    def _cache_put(self, cache_key, stored):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._cache[cache_key] = stored
+            self._cache.move_to_end(cache_key)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+
+    # ---- database ----
+
+    @staticmethod
+    def _row_filter(user_id, key):
+        return and_(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+
+    def _load(self, user_id, key, now):
+        """Return the live stored row, dropping it first if expired or abandoned."""
+        row = db.session.execute(
+            select(
+                IdempotencyKey.request_hash,
+                IdempotencyKey.status_code,
+                IdempotencyKey.response_body,
+                IdempotencyKey.expires_at,
+                IdempotencyKey.locked_until,
+            ).where(self._row_filter(user_id, key))
+        ).first()
+        if row is None:
+            return None
+
+        expires_at = _as_ist(row.expires_at)
+        abandoned = row.status_code is None and _as_ist(row.locked_until) <= now
+        if expires_at > now and not abandoned:
+            return StoredResponse(
+                row.request_hash, row.status_code, row.response_body, expires_at
+            )
+
+        # Conditional, so only one of several racing requests removes it
+        db.session.execute(
+            delete(IdempotencyKey).where(
+                self._row_filter(user_id, key),
+                or_(
+                    IdempotencyKey.expires_at <= now,
+                    and_(
+                        IdempotencyKey.status_code.is_(None),
+                        IdempotencyKey.locked_until <= now,
+                    ),
+                ),
+            )
+        )
+        db.session.commit()
+        return None
+
+    def _claim(self, user_id, key, request_hash, now):
+        try:
+            db.session.execute(
+                insert(IdempotencyKey).values(
+                    user_id=user_id,
+                    key=key,
+                    request_hash=request_hash,
+                    created_at=now,
+                    locked_until=now + timedelta(seconds=self.lock_timeout),
+                    expires_at=now + timedelta(seconds=self.ttl),
+                )
+            )
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+
+    # ---- claim heartbeat ----
+
+    def _hold(self, user_id, key):
+        """Keep extending the claim until _unhold (see _heartbeat_loop)."""
+        with self._lock:
+            self._held.add((user_id, key))
+            if self._heartbeat is None:
+                self._heartbeat = threading.Thread(
+                    target=self._heartbeat_loop,
+                    args=(current_app._get_current_object(),),
+                    name="idempotency-heartbeat",
+                    daemon=True,
+                )
+                self._heartbeat.start()
+
+    def _unhold(self, user_id, key):
+        with self._lock:
+            self._held.discard((user_id, key))
+
+    def _heartbeat_loop(self, app):
+        """Extend every held claim's lock; exits once none are held."""
+        while True:
+            time.sleep(self.lock_timeout / 3)
+            with self._lock:
+                held = list(self._held)
+                if not held:
+                    self._heartbeat = None
+                    return
+
+            locked_until = datetime.now(IST) + timedelta(seconds=self.lock_timeout)
+            try:
+                with app.app_context(), db.engine.begin() as conn:
+                    for user_id, key in held:
+                        conn.execute(
+                            update(IdempotencyKey)
+                            .where(
+                                self._row_filter(user_id, key),
+                                IdempotencyKey.status_code.is_(None),
+                            )
+                            .values(locked_until=locked_until)
+                        )
+            except Exception:
+                app.logger.exception("Could not extend idempotency claims")
+
+    def _complete(self, user_id, key, request_hash, response):
+        body = response.get_data(as_text=True)
+        expires_at = datetime.now(IST) + timedelta(seconds=self.ttl)
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(self._row_filter(user_id, key))
+            .values(
+                status_code=response.status_code,
+                response_body=body,
+                locked_until=None,
+                expires_at=expires_at,
+            )
+        )
+        db.session.commit()
+        self._cache_put(
+            (user_id, key),
+            StoredResponse(request_hash, response.status_code, body, expires_at),
+        )
+
+    def _release(self, user_id, key):
+        db.session.rollback()
+        db.session.execute(delete(IdempotencyKey).where(self._row_filter(user_id, key)))
+        db.session.commit()
+
+    def purge_expired(self):
+        """Delete expired rows; returns how many were removed."""
+        result = db.session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.now(IST))
+        )
+        db.session.commit()
+        return result.rowcount
+
+    # ---- decorator ----
+
+    def _replay(self, stored):
+        with self._lock:
+            self._stats["replayed"] += 1
+        response = Response(
+            stored.body, status=stored.status_code, mimetype="application/json"
+        )
+        response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+    def run_idempotent(self, view, *args, **kwargs):
+        """Run a view, or replay its stored response (see idempotent)."""
+        key = request.headers.get("Idempotency-Key")
+        if key is None:
+            return view(*args, **kwargs)
+        if not 1 <= len(key) <= 255:
+            return (
+                jsonify({"error": "Idempotency-Key must be 1-255 characters"}),
+                400,
+            )
+
+        user_id = request.user_id
+        request_hash = hashlib.sha256(
+            b"%s %s\n%s"
+            % (request.method.encode(), request.path.encode(), request.get_data())
+        ).hexdigest()
+
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        while True:
+            now = datetime.now(IST)
+            stored = self._cache_get((user_id, key), now) or self._load(
+                user_id, key, now
+            )
+            if stored is None:
+                if self._claim(user_id, key, request_hash, now):
+                    break
+                # A concurrent duplicate claimed it first: wait for it below
+            else:
+                if stored.request_hash != request_hash:
+                    error = "Idempotency-Key was used for a different request"
+                    return jsonify({"error": error}), 422
+                if stored.status_code is not None:
+                    return self._replay(stored)
+
+            # The first request with this key is still running
+            if not waited:
+                waited = True
+                with self._lock:
+                    self._stats["waited"] += 1
+            db.session.rollback()
+            if time.monotonic() >= deadline:
+                response = jsonify(
+                    {"error": "A request with this Idempotency-Key is in progress"}
+                )
+                response.headers["Retry-After"] = "1"
+                return response, 409
+            time.sleep(0.05)
+
+        self._hold(user_id, key)
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            self._release(user_id, key)
+            raise
+        finally:
+            self._unhold(user_id, key)
+
+        if response.status_code >= 500 or response.is_streamed:
+            self._release(user_id, key)
+        else:
+            self._complete(user_id, key, request_hash, response)
+        with self._lock:
+            self._stats["executed"] += 1
+        return response
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats, size=len(self._cache), maxsize=self.maxsize)
+
+
+def idempotent(view):
+    """
+    Make a route replay its response for a repeated Idempotency-Key, using
+    the app's IdempotencyStore. Apply below @require_auth (keys are scoped
+    per user).
+    """
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        store = current_app.extensions["idempotency"]
+        return store.run_idempotent(view, *args, **kwargs)
+
+    return wrapper
+
+
+def _as_ist(value):
+    # Convert to IST-aware if naive
+    if value is not None and value.tzinfo is None:
+        value = value.replace(tzinfo=IST)
+    return value
@@ -0,0 +1,116 @@
+import json
+from dataclasses import is_dataclass
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional dependency, stdlib json is used without it
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:  # optional dependency
+    msgspec = None
+
+
+class StdlibJSONProvider(DefaultJSONProvider):
+    """
+    Flask's provider with the settings the fast providers share: keys keep
+    insertion (or schema field) order instead of being sorted, non-ASCII
+    text is written as UTF-8, and dataclasses (utils/schemas.py) are encoded
+    from their __dict__ rather than copied through dataclasses.asdict.
+    """
+
+    name = "json"
+    sort_keys = False
+    ensure_ascii = False
+
+    @staticmethod
+    def default(o):
+        if is_dataclass(o) and hasattr(o, "__dict__"):
+            return o.__dict__
+        return DefaultJSONProvider.default(o)
+
+
+class FastJSONProvider(StdlibJSONProvider):
+    """
+    Base for providers that encode straight to bytes; subclasses define
+    encode(obj, indent) -> bytes. dumps() calls with json.dumps options the
+    library cannot honour go to the stdlib encoder.
+    """
+
+    def dumps(self, obj, **kwargs):
+        indent = kwargs.pop("indent", None)
+        separators = kwargs.pop("separators", None)
+        if kwargs or indent not in (None, 2) or separators not in (None, (",", ":")):
+            return super().dumps(obj, indent=indent, separators=separators, **kwargs)
+        return self.encode(obj, indent=indent == 2).decode()
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(
+            self.encode(obj, indent) + b"\n", mimetype=self.mimetype
+        )
+
+
+class OrjsonProvider(FastJSONProvider):
+    name = "orjson"
+
+    def encode(self, obj, indent=False):
+        # Datetimes go through default() so they match Flask (HTTP dates)
+        option = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+class MsgspecProvider(FastJSONProvider):
+    """msgspec encodes datetimes natively, as RFC 3339 strings."""
+
+    name = "msgspec"
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._encoder = msgspec.json.Encoder(enc_hook=self.default)
+        self._decoder = msgspec.json.Decoder()
+
+    def encode(self, obj, indent=False):
+        data = self._encoder.encode(obj)
+        return msgspec.json.format(data, indent=2) if indent else data
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return self._decoder.decode(s)
+        except msgspec.DecodeError as e:
+            # Flask turns ValueError into a 400 for request bodies
+            raise ValueError(str(e)) from e
+
+
+JSON_PROVIDERS = {
+    "orjson": (OrjsonProvider, orjson),
+    "msgspec": (MsgspecProvider, msgspec),
+    "json": (StdlibJSONProvider, json),
+}
+
+
+def make_json_provider(app, backend="auto"):
+    """
+    JSON provider for `app`: orjson, msgspec or json, or with "auto" the
+    first of those that is installed.
+    """
+    if backend == "auto":
+        backend = next(name for name, (_, module) in JSON_PROVIDERS.items() if module)
+    if backend not in JSON_PROVIDERS:
+        raise ValueError(f"Unknown JSON backend '{backend}'")
+    provider_class, module = JSON_PROVIDERS[backend]
+    if module is None:
+        raise RuntimeError(f"JSON backend '{backend}' is not installed")
+    return provider_class(app)
@@ -1,6 +1,7 @@
 import jwt
 from datetime import datetime, timedelta
 from flask import current_app
+from utils.token_cache import TokenCache
 
 
 def create_access_token(user_id):
@@ -30,12 +31,27 @@ def create_refresh_token(user_id):
     )
 
 
+def get_access_token_cache():
+    """Return the app's cache of verified access tokens, creating it on first use."""
+    cache = current_app.extensions.get("access_token_cache")
+    if cache is None:
+        cache = TokenCache(current_app.config.get("JWT_CACHE_SIZE", 10000))
+        current_app.extensions["access_token_cache"] = cache
+    return cache
+
+
 def decode_access_token(token):
     """
-    Decode and validate access token.
+    Decode and validate access token. Verified payloads are cached until
+    their `exp`, so repeat requests with the same token skip the HMAC check.
     Returns: dict with payload on success
     Raises: jwt.ExpiredSignatureError or jwt.InvalidTokenError on failure
     """
+    cache = get_access_token_cache()
+    payload = cache.get(token)
+    if payload is not None:
+        return payload
+
     try:
         payload = jwt.decode(
             token, current_app.config["SECRET_KEY"], algorithms=["HS256"]
@@ -43,6 +59,7 @@ def decode_access_token(token):
         # Verify token type
         if payload.get("type") != "access":
             raise jwt.InvalidTokenError("Invalid token type")
+        cache.put(token, payload)
         return payload
     except jwt.ExpiredSignatureError:
         raise
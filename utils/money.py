@@ -0,0 +1,42 @@
+import re
+
+# Amounts are stored as integer minor units (paise) and only converted to
+# currency units at the JSON boundary, so sums never accumulate float error.
+_AMOUNT = re.compile(r"(\d+)(?:\.(\d{1,2}))?")
+
+
+def to_cents(value):
+    """
+    Parse a non-negative amount with at most two decimals (int, float or
+    string) into integer cents; returns None if it is not one.
+    """
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value * 100 if value >= 0 else None
+    if isinstance(value, float):
+        # repr is the shortest string that round-trips, e.g. 19.99 -> "19.99"
+        value = repr(value)
+    if not isinstance(value, str):
+        return None
+    match = _AMOUNT.fullmatch(value.strip())
+    if not match:
+        return None
+    whole, fraction = match.groups()
+    return int(whole) * 100 + int((fraction or "0").ljust(2, "0"))
+
+
+def parse_cents(raw):
+    """to_cents for query params; raises ValueError like int() and float()."""
+    cents = to_cents(raw)
+    if cents is None:
+        raise ValueError(raw)
+    return cents
+
+
+def from_cents(cents):
+    """
+    Integer cents -> JSON number in currency units. The division is correctly
+    rounded, so the float's shortest repr is the exact decimal (1999 -> 19.99).
+    """
+    return cents / 100
@@ -0,0 +1,72 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from bcrypt import checkpw, gensalt, hashpw
+from utils.profiling import span
+
+
+class PoolSaturated(Exception):
+    """
+    Raised when too many password operations are already queued, or when an
+    admitted one has not finished within the hasher's timeout.
+    """
+
+
+def _hash(password, rounds):
+    return hashpw(password, gensalt(rounds)).decode("utf-8")
+
+
+def _check(password, hashed):
+    return checkpw(password, hashed)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small, bounded worker pool so a burst of logins cannot
+    occupy every request thread. At most `workers + max_queue` operations are
+    admitted at once; anything beyond that raises PoolSaturated immediately
+    so the route can answer 503 instead of piling up.
+
+    kind="thread" is enough for the bcrypt wheel (it releases the GIL while
+    hashing); kind="process" isolates the CPU work completely.
+    """
+
+    def __init__(self, workers=2, max_queue=16, rounds=12, kind="thread", timeout=30):
+        executor_cls = ProcessPoolExecutor if kind == "process" else ThreadPoolExecutor
+        self.rounds = rounds
+        self.timeout = timeout
+        self._executor = executor_cls(max_workers=workers)
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PoolSaturated()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        with span("bcrypt"):
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                # Stuck behind the queue: answer like a full pool, not a 500
+                future.cancel()
+                raise PoolSaturated() from None
+
+    def hash(self, password):
+        return self._run(_hash, password.encode("utf-8"), self.rounds)
+
+    def check(self, password, hashed):
+        return self._run(_check, password.encode("utf-8"), hashed.encode("utf-8"))
+
+    def needs_rehash(self, hashed):
+        """True if `hashed` was made with a different cost factor ($2b$<cost>$...)."""
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
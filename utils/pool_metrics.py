@@ -0,0 +1,181 @@
+import threading
+import time
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+PRIMARY = "primary"
+# session.info key: (engine, started) of the statement or flush that may
+# have to check a connection out
+WAIT_STARTED = "pool_wait_started"
+
+
+class EngineMetrics:
+    """
+    Connection-pool counters for one engine, fed from its public pool events
+    (connect/checkout/checkin/invalidate/close). Pool events stay attached
+    to the new pool engine.dispose() creates (e.g. in each forked worker,
+    see wsgi.py), and size/overflow are always read from the current pool.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.waits = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_checked_out = 0
+        self.peak_overflow = 0
+        self._born = {}
+
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "engine_disposed", self._on_engine_disposed)
+
+    def _on_engine_disposed(self, engine):
+        with self._lock:
+            self._born.clear()
+
+    def _on_connect(self, dbapi_conn, record):
+        with self._lock:
+            self.connects += 1
+            self._born[id(record)] = time.monotonic()
+
+    def _on_close(self, dbapi_conn, record):
+        with self._lock:
+            self._born.pop(id(record), None)
+
+    def _on_checkout(self, dbapi_conn, record, proxy):
+        checked_out = self._pool_stat("checkedout")
+        overflow = self._pool_stat("overflow")
+        with self._lock:
+            self.checkouts += 1
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+            self.peak_overflow = max(self.peak_overflow, overflow)
+
+    def _on_checkin(self, dbapi_conn, record):
+        with self._lock:
+            self.checkins += 1
+
+    def _on_invalidate(self, dbapi_conn, record, exception):
+        with self._lock:
+            self.invalidations += 1
+            self._born.pop(id(record), None)
+
+    def record_wait(self, waited):
+        with self._lock:
+            self.waits += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+    def record_timeout(self, waited):
+        with self._lock:
+            self.timeouts += 1
+        self.record_wait(waited)
+
+    def _pool_stat(self, name):
+        stat = getattr(self.engine.pool, name, None)
+        return stat() if callable(stat) else 0
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            ages = [now - born for born in self._born.values()]
+            return {
+                "pool_class": type(self.engine.pool).__name__,
+                "size": self._pool_stat("size"),
+                "checked_out": self._pool_stat("checkedout"),
+                "overflow": self._pool_stat("overflow"),
+                "peak_checked_out": self.peak_checked_out,
+                "peak_overflow": self.peak_overflow,
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": (
+                    round(self.wait_total / self.waits * 1000, 3) if self.waits else 0
+                ),
+                "wait_max_ms": round(self.wait_max * 1000, 3),
+                "connection_age_max_s": round(max(ages), 1) if ages else 0,
+                "connection_age_avg_s": round(sum(ages) / len(ages), 1) if ages else 0,
+            }
+
+
+class PoolMetrics:
+    """
+    Pool counters per engine (the primary and each replica bind).
+
+    Checkout waits are timed from the session's side: a statement or flush
+    notes its engine and start time, and when it has to open the session's
+    connection to that engine (after_begin) the time since then is the wait
+    for a pooled connection. A checkout that gives up raises
+    sqlalchemy.exc.TimeoutError; the app's handler reports it through
+    record_timeout. The session hooks are registered once for all apps and
+    report to the current app's PoolMetrics.
+    """
+
+    def __init__(self):
+        self._engines = {}
+
+    def attach(self, engine, name=PRIMARY):
+        self._engines[engine] = (name, EngineMetrics(engine))
+        return self
+
+    def _metrics(self, engine):
+        entry = self._engines.get(engine)
+        return entry[1] if entry else None
+
+    def record_timeout(self, session):
+        """Count the pool timeout that the session's pending checkout hit."""
+        started = session.info.pop(WAIT_STARTED, None)
+        if started is None:
+            return
+        engine, at = started
+        metrics = self._metrics(engine)
+        if metrics is not None:
+            metrics.record_timeout(time.perf_counter() - at)
+
+    def stats(self):
+        return {name: metrics.stats() for name, metrics in self._engines.values()}
+
+
+def _current_metrics():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("pool_metrics")
+
+
+def _start_wait(session, engine):
+    if _current_metrics() is not None:
+        session.info[WAIT_STARTED] = (engine, time.perf_counter())
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _on_execute(state):
+    _start_wait(state.session, state.session.get_bind(**state.bind_arguments))
+
+
+@event.listens_for(Session, "before_flush")
+def _on_flush(session, flush_context, instances):
+    _start_wait(session, session.get_bind())
+
+
+@event.listens_for(Session, "after_begin")
+def _on_begin(session, transaction, connection):
+    started = session.info.pop(WAIT_STARTED, None)
+    pool_metrics = _current_metrics()
+    if started is None or pool_metrics is None:
+        return
+    engine, at = started
+    metrics = pool_metrics._metrics(connection.engine)
+    if metrics is not None and engine is connection.engine:
+        metrics.record_wait(time.perf_counter() - at)
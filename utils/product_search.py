@@ -0,0 +1,313 @@
+import bisect
+import heapq
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, inspect, or_, select
+from sqlalchemy.orm import Session, object_session
+from database import db
+from models import Product
+
+TOKEN_RE = re.compile(r"\w+")
+# How many distinct tokens a trailing prefix may expand to
+MAX_PREFIX_EXPANSION = 64
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+# ---------------------------
+# PostgreSQL (tsvector + pg_trgm indexes, see migration b3f1c8e2a9d4)
+# ---------------------------
+
+
+def search_sql(q, limit):
+    """Ranked full-text match with trigram similarity for typos; returns ids."""
+    document = func.to_tsvector("simple", Product.name)
+    query = func.plainto_tsquery("simple", q)
+    rank = func.ts_rank(document, query) + func.similarity(Product.name, q)
+    return (
+        db.session.execute(
+            select(Product.id)
+            .where(or_(document.op("@@")(query), Product.name.op("%")(q)))
+            .order_by(rank.desc(), Product.id)
+            .limit(limit)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def autocomplete_sql(prefix, limit):
+    return (
+        db.session.execute(
+            select(Product.id)
+            .where(func.lower(Product.name).startswith(prefix.lower(), autoescape=True))
+            .order_by(func.lower(Product.name), Product.id)
+            .limit(limit)
+        )
+        .scalars()
+        .all()
+    )
+
+
+# ---------------------------
+# In-process fallback (SQLite)
+# ---------------------------
+
+
+class ProductSearchIndex:
+    """
+    In-memory inverted index over product names for databases without
+    full-text indexes.
+
+    Search ranks by the number of query words matched (the last word also
+    matches as a prefix), then by whether the name starts with the query,
+    then by shorter names. Autocomplete bisects a sorted name list.
+
+    Product names written through the ORM in this process are applied after
+    commit, and bulk INSERT/DELETE statements on products mark the index
+    dirty. A dirty index, or one older than `max_age` seconds (to pick up
+    other workers' writes), is rebuilt by one background thread while
+    searches keep using the current one; only the very first build blocks.
+    """
+
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._build_lock = threading.Lock()
+        self._built_at = None
+        self._dirty = False
+        self._rebuilding = False
+        self._changes_during_build = None
+        self._names = {}
+        self._postings = defaultdict(set)
+        self._tokens = []
+        self._sorted_names = []
+
+    # ---- maintenance ----
+
+    def build(self):
+        """Rebuild from the products table (one build at a time)."""
+        with self._build_lock:
+            self._build()
+
+    def _build(self):
+        with self._lock:
+            # Commits landing while the rows are read are replayed after
+            self._changes_during_build = {}
+            self._dirty = False
+
+        names, postings = {}, defaultdict(set)
+        rows = db.session.execute(
+            select(Product.id, Product.name).execution_options(yield_per=10000)
+        )
+        for product_id, name in rows:
+            names[product_id] = name
+            for token in set(tokenize(name)):
+                postings[token].add(product_id)
+        sorted_names = sorted((name.lower(), pid) for pid, name in names.items())
+
+        with self._lock:
+            self._names = names
+            self._postings = postings
+            self._tokens = sorted(postings)
+            self._sorted_names = sorted_names
+            self._built_at = time.monotonic()
+            changes, self._changes_during_build = self._changes_during_build, None
+            self._apply(changes)
+
+    def mark_dirty(self):
+        """Rebuild in the background on the next query."""
+        self._dirty = True
+
+    def _ensure_fresh(self):
+        if self._built_at is None:
+            # First use: build once, concurrent callers wait for that build
+            with self._build_lock:
+                if self._built_at is None:
+                    self._build()
+            return
+        if self._dirty or time.monotonic() - self._built_at > self.max_age:
+            self._rebuild_in_background()
+
+    def _rebuild_in_background(self):
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+        threading.Thread(
+            target=self._background_build,
+            args=(current_app._get_current_object(),),
+            name="search-index-build",
+            daemon=True,
+        ).start()
+
+    def _background_build(self, app):
+        try:
+            with app.app_context():
+                self.build()
+        except Exception:
+            app.logger.exception("Search index rebuild failed")
+        finally:
+            with self._lock:
+                self._rebuilding = False
+
+    def _remove(self, product_id):
+        name = self._names.pop(product_id, None)
+        if name is None:
+            return
+        for token in set(tokenize(name)):
+            ids = self._postings.get(token)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[token]
+                    index = bisect.bisect_left(self._tokens, token)
+                    if index < len(self._tokens) and self._tokens[index] == token:
+                        del self._tokens[index]
+        entry = (name.lower(), product_id)
+        index = bisect.bisect_left(self._sorted_names, entry)
+        if index < len(self._sorted_names) and self._sorted_names[index] == entry:
+            del self._sorted_names[index]
+
+    def apply(self, changes):
+        """Apply {product_id: name, or None if deleted} from committed writes."""
+        with self._lock:
+            if self._changes_during_build is not None:
+                self._changes_during_build.update(changes)
+            if self._built_at is not None:
+                self._apply(changes)
+
+    def _apply(self, changes):
+        for product_id, name in changes.items():
+            self._remove(product_id)
+            if name is None:
+                continue
+            self._names[product_id] = name
+            for token in set(tokenize(name)):
+                if token not in self._postings:
+                    bisect.insort(self._tokens, token)
+                self._postings[token].add(product_id)
+            bisect.insort(self._sorted_names, (name.lower(), product_id))
+
+    # ---- queries ----
+
+    def _prefix_tokens(self, prefix):
+        start = bisect.bisect_left(self._tokens, prefix)
+        matches = []
+        for token in self._tokens[start : start + MAX_PREFIX_EXPANSION]:
+            if not token.startswith(prefix):
+                break
+            matches.append(token)
+        return matches
+
+    def search(self, q, limit):
+        self._ensure_fresh()
+        words = tokenize(q)
+        if not words:
+            return []
+
+        with self._lock:
+            scores = Counter()
+            for word in words[:-1]:
+                scores.update(self._postings.get(word, ()))
+            # The last word may still be being typed: match it as a prefix too
+            last_matches = set(self._postings.get(words[-1], ()))
+            for token in self._prefix_tokens(words[-1]):
+                last_matches |= self._postings[token]
+            scores.update(last_matches)
+
+            # Only the best-scoring tiers that can fill `limit` need the
+            # (costlier) name tie-breaks; common words match most of the table
+            tiers = defaultdict(list)
+            for product_id, score in scores.items():
+                tiers[score].append(product_id)
+            candidates = []
+            for score in sorted(tiers, reverse=True):
+                candidates.extend(tiers[score])
+                if len(candidates) >= limit:
+                    break
+
+            phrase = q.strip().lower()
+            names = self._names
+            return heapq.nsmallest(
+                limit,
+                candidates,
+                key=lambda product_id: (
+                    -scores[product_id],
+                    not names[product_id].lower().startswith(phrase),
+                    len(names[product_id]),
+                    product_id,
+                ),
+            )
+
+    def autocomplete(self, prefix, limit):
+        self._ensure_fresh()
+        prefix = prefix.lower()
+        with self._lock:
+            start = bisect.bisect_left(self._sorted_names, (prefix,))
+            ids = []
+            for name, product_id in self._sorted_names[start : start + limit]:
+                if not name.startswith(prefix):
+                    break
+                ids.append(product_id)
+        return ids
+
+
+# ---------------------------
+# Write tracking (registered once; reports to the current app's index)
+# ---------------------------
+
+RENAMED = "renamed_products"
+BULK_CHANGED = "products_bulk_changed"
+
+
+def _current_index():
+    if not has_app_context():
+        return None
+    return current_app.extensions.get("search_index")
+
+
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_update")
+def _mark_renamed(mapper, connection, target):
+    if inspect(target).attrs.name.history.has_changes():
+        pending = object_session(target).info.setdefault(RENAMED, {})
+        pending[target.id] = target.name
+
+
+@event.listens_for(Product, "after_delete")
+def _mark_deleted(mapper, connection, target):
+    object_session(target).info.setdefault(RENAMED, {})[target.id] = None
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_change(state):
+    # Bulk UPDATEs in the app only touch stock/price, never names
+    if (state.is_insert or state.is_delete) and (
+        state.statement.table.name == Product.__tablename__
+    ):
+        state.session.info[BULK_CHANGED] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    renamed = session.info.pop(RENAMED, None)
+    bulk_changed = session.info.pop(BULK_CHANGED, False)
+    index = _current_index()
+    if index is None:
+        return
+    if renamed:
+        index.apply(renamed)
+    if bulk_changed:
+        index.mark_dirty()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop(RENAMED, None)
+    session.info.pop(BULK_CHANGED, None)
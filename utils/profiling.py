@@ -0,0 +1,155 @@
+import cProfile
+import os
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import contextmanager
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+
+@contextmanager
+def span(name):
+    """
+    Time a block (e.g. "jwt", "bcrypt") into the current request's profile.
+    A no-op unless the profiler is installed and a request is active.
+    """
+    profile = g.get("profile") if has_request_context() else None
+    if profile is None:
+        yield
+        return
+
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile["spans"][name] += time.perf_counter() - started
+
+
+class RequestProfiler:
+    """
+    Opt-in per-request instrumentation.
+
+    For every request it records wall time, DB time, the statement count,
+    statements repeated at least `duplicate_threshold` times (a likely N+1)
+    and any span() timings. These go out in a Server-Timing header and into
+    a rolling per-route window used for p50/p95/p99.
+
+    Sending `X-Profile: 1` to a route listed in `profile_routes` (endpoint
+    names, or "*") also writes a cProfile dump to `profile_dir`.
+    """
+
+    def __init__(
+        self, window=1000, duplicate_threshold=3, profile_routes=(), profile_dir="."
+    ):
+        self.window = window
+        self.duplicate_threshold = duplicate_threshold
+        self.profile_routes = set(profile_routes)
+        self.profile_dir = profile_dir
+        self.enabled = False
+        self._durations = defaultdict(lambda: deque(maxlen=self.window))
+        self._n_plus_one = Counter()
+        self._last_duplicate = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        self.enabled = True
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # ---- request hooks ----
+
+    def _before_request(self):
+        g.profile = {
+            "started": time.perf_counter(),
+            "db_time": 0.0,
+            "statements": Counter(),
+            "spans": defaultdict(float),
+            "cprofile": None,
+        }
+        endpoint = request.endpoint or "unknown"
+        if request.headers.get("X-Profile") == "1" and (
+            "*" in self.profile_routes or endpoint in self.profile_routes
+        ):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                g.profile["cprofile"] = profiler
+            except ValueError:
+                pass  # another profiler is already active in this thread
+
+    def _after_request(self, response):
+        profile = g.pop("profile", None)
+        if profile is None:
+            return response
+
+        wall = time.perf_counter() - profile["started"]
+        endpoint = request.endpoint or "unknown"
+        statements = profile["statements"]
+        duplicates = {
+            sql: count
+            for sql, count in statements.items()
+            if count >= self.duplicate_threshold
+        }
+
+        if profile["cprofile"] is not None:
+            profile["cprofile"].disable()
+            os.makedirs(self.profile_dir, exist_ok=True)
+            profile["cprofile"].dump_stats(
+                os.path.join(self.profile_dir, f"{endpoint}-{time.time():.0f}.prof")
+            )
+
+        timings = [
+            f"app;dur={wall * 1000:.2f}",
+            f'db;dur={profile["db_time"] * 1000:.2f};desc="{sum(statements.values())} queries"',
+        ]
+        timings += [
+            f"{name};dur={seconds * 1000:.2f}"
+            for name, seconds in profile["spans"].items()
+        ]
+        if duplicates:
+            timings.append(f'n1;desc="{len(duplicates)} repeated statements"')
+        response.headers.add("Server-Timing", ", ".join(timings))
+
+        with self._lock:
+            self._durations[endpoint].append(wall)
+            if duplicates:
+                self._n_plus_one[endpoint] += 1
+                self._last_duplicate[endpoint] = max(duplicates, key=duplicates.get)
+        return response
+
+    # ---- SQL hooks ----
+
+    def _before_cursor_execute(self, conn, cursor, statement, *args):
+        conn.info["query_started"] = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, *args):
+        started = conn.info.pop("query_started", None)
+        profile = g.get("profile") if has_request_context() else None
+        if profile is not None and started is not None:
+            profile["db_time"] += time.perf_counter() - started
+            profile["statements"][statement] += 1
+
+    # ---- reporting ----
+
+    @staticmethod
+    def _percentile(ordered, pct):
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return round(ordered[index] * 1000, 2)
+
+    def stats(self):
+        with self._lock:
+            routes = {}
+            for endpoint, durations in self._durations.items():
+                ordered = sorted(durations)
+                routes[endpoint] = {
+                    "count": len(ordered),
+                    "p50_ms": self._percentile(ordered, 50),
+                    "p95_ms": self._percentile(ordered, 95),
+                    "p99_ms": self._percentile(ordered, 99),
+                    "n_plus_one_requests": self._n_plus_one[endpoint],
+                    "last_repeated_statement": self._last_duplicate.get(endpoint),
+                }
+        return {"enabled": self.enabled, "window": self.window, "routes": routes}
@@ -0,0 +1,164 @@
+import random
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, request
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from sqlalchemy.exc import OperationalError
+from database import db
+
+REPLICA_BIND_PREFIX = "replica_"
+STICKY_COOKIE = "replica_sticky"
+
+
+class ReplicaRouter:
+    """
+    Chooses a replica engine for read-only routes.
+
+    - Replicas are the SQLALCHEMY_BINDS entries named replica_<n>.
+    - A user who just wrote (checkout, cart changes) reads from the primary
+      for `sticky_seconds`, so they always see their own writes. The write is
+      carried in a signed, timestamped cookie, so the next request sticks to
+      the primary whichever worker or host serves it; clients that drop
+      cookies still stick within the worker that took the write.
+    - A replica that fails with an OperationalError is skipped for
+      `retry_seconds` and the request is replayed on the primary.
+    """
+
+    def __init__(self, sticky_seconds=5, retry_seconds=30):
+        self.sticky_seconds = sticky_seconds
+        self.retry_seconds = retry_seconds
+        self._recent_writes = {}
+        self._down_until = {}
+        self._lock = threading.Lock()
+
+    def replica_keys(self):
+        binds = current_app.config.get("SQLALCHEMY_BINDS") or {}
+        return [key for key in binds if key.startswith(REPLICA_BIND_PREFIX)]
+
+    def record_write(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._recent_writes) > 10000:
+                self._recent_writes = {
+                    uid: until
+                    for uid, until in self._recent_writes.items()
+                    if until > now
+                }
+            self._recent_writes[user_id] = now + self.sticky_seconds
+
+    def sticky_cookie(self, secret_key, user_id):
+        """Signed cookie value marking a write by `user_id` now."""
+        return self._serializer(secret_key).dumps(user_id)
+
+    def cookie_user(self, secret_key, value):
+        """The user_id of a sticky cookie still inside its window, or None."""
+        try:
+            return self._serializer(secret_key).loads(
+                value, max_age=self.sticky_seconds
+            )
+        except BadSignature:  # also SignatureExpired
+            return None
+
+    def _serializer(self, secret_key):
+        return URLSafeTimedSerializer(secret_key, salt=STICKY_COOKIE)
+
+    def set_sticky_cookie(self, response, secret_key, user_id):
+        response.set_cookie(
+            STICKY_COOKIE,
+            self.sticky_cookie(secret_key, user_id),
+            max_age=max(1, int(self.sticky_seconds)),
+            httponly=True,
+            samesite="Lax",
+        )
+        return response
+
+    def mark_down(self, key):
+        with self._lock:
+            self._down_until[key] = time.monotonic() + self.retry_seconds
+
+    def choose(self, user_id=None, cookie=None):
+        """
+        Return a healthy replica bind key, or None to use the primary.
+        `cookie` is the request's sticky cookie value, if any.
+        """
+        keys = self.replica_keys()
+        if not keys:
+            return None
+        if (
+            user_id is not None
+            and cookie
+            and self.cookie_user(current_app.secret_key, cookie) == user_id
+        ):
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            if user_id is not None:
+                sticky_until = self._recent_writes.get(user_id)
+                if sticky_until is not None:
+                    if sticky_until > now:
+                        return None
+                    del self._recent_writes[user_id]
+            healthy = [key for key in keys if self._down_until.get(key, 0) <= now]
+        return random.choice(healthy) if healthy else None
+
+    def run_read_only(self, view, *args, **kwargs):
+        """Run a view with its queries sent to a replica (see read_only)."""
+        key = self.choose(
+            getattr(request, "user_id", None), request.cookies.get(STICKY_COOKIE)
+        )
+        if key is None:
+            return view(*args, **kwargs)
+
+        g.db_replica = key
+        try:
+            return view(*args, **kwargs)
+        except OperationalError:
+            # Replica unreachable: forget it for a while and use the primary
+            db.session.rollback()
+            self.mark_down(key)
+            g.db_replica = None
+            return view(*args, **kwargs)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                "replicas": self.replica_keys(),
+                "down": [key for key, until in self._down_until.items() if until > now],
+                "sticky_users": sum(
+                    1 for until in self._recent_writes.values() if until > now
+                ),
+            }
+
+
+def read_only(view):
+    """Route decorator: send the view's queries to the app's ReplicaRouter."""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        router = current_app.extensions["replica_router"]
+        return router.run_read_only(view, *args, **kwargs)
+
+    return wrapper
+
+
+def record_write(user_id):
+    """
+    Keep `user_id` on the primary for the app router's sticky window; the
+    response gets the sticky cookie (see set_sticky_cookie).
+    """
+    current_app.extensions["replica_router"].record_write(user_id)
+    g.replica_sticky_user = user_id
+
+
+def set_sticky_cookie(response):
+    """after_request hook: attach the cookie for a write made by this request."""
+    user_id = g.pop("replica_sticky_user", None)
+    if user_id is None:
+        return response
+    router = current_app.extensions["replica_router"]
+    if not router.replica_keys():
+        return response
+    return router.set_sticky_cookie(response, current_app.secret_key, user_id)
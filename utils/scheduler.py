@@ -0,0 +1,117 @@
+import random
+import threading
+import time
+from sqlalchemy import text
+from database import db
+
+# Arbitrary cluster-wide key for pg_try_advisory_lock ("cart" in ASCII)
+CART_SWEEP_LOCK_KEY = 0x63617274
+
+
+class CartExpiryScheduler:
+    """
+    Background thread that runs `sweep` every `interval` seconds (+/- `jitter`
+    as a fraction of the interval, so workers started together drift apart).
+
+    On PostgreSQL each run first takes a session-level advisory lock, so only
+    one worker in the cluster sweeps at a time; the others skip that tick.
+    `sweep` must return a summary dict (see clear_expired_carts).
+    """
+
+    def __init__(
+        self, app, sweep, interval=60, jitter=0.1, lock_key=CART_SWEEP_LOCK_KEY
+    ):
+        self.app = app
+        self.sweep = sweep
+        self.interval = interval
+        self.jitter = jitter
+        self.lock_key = lock_key
+        self._stop = threading.Event()
+        self._thread = None
+        self._stats = {
+            "runs": 0,
+            "skipped": 0,
+            "errors": 0,
+            "last_run_at": None,
+            "last_duration_ms": None,
+            "last_lag_ms": None,
+            "last_carts_reclaimed": 0,
+            "last_items_reclaimed": 0,
+            "total_carts_reclaimed": 0,
+            "last_error": None,
+        }
+        self._lock = threading.Lock()
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="cart-expiry-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _next_delay(self):
+        spread = self.interval * self.jitter
+        return max(0.0, self.interval + random.uniform(-spread, spread))
+
+    def _loop(self):
+        due = time.monotonic() + self._next_delay()
+        while not self._stop.wait(max(0.0, due - time.monotonic())):
+            lag_ms = (time.monotonic() - due) * 1000
+            try:
+                self.run_once(lag_ms=lag_ms)
+            except Exception as e:
+                with self._lock:
+                    self._stats["errors"] += 1
+                    self._stats["last_error"] = repr(e)
+            due = time.monotonic() + self._next_delay()
+
+    def _try_lock(self, conn):
+        if conn.dialect.name != "postgresql":
+            return True
+        return conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": self.lock_key}
+        ).scalar()
+
+    def _unlock(self, conn):
+        if conn.dialect.name == "postgresql":
+            conn.execute(
+                text("SELECT pg_advisory_unlock(:key)"), {"key": self.lock_key}
+            )
+
+    def run_once(self, lag_ms=0.0):
+        """Sweep now if this worker wins the lock; returns the summary or None."""
+        with self.app.app_context():
+            with db.engine.connect() as conn:
+                if not self._try_lock(conn):
+                    with self._lock:
+                        self._stats["skipped"] += 1
+                    return None
+                try:
+                    started = time.perf_counter()
+                    summary = self.sweep()
+                    duration_ms = (time.perf_counter() - started) * 1000
+                finally:
+                    self._unlock(conn)
+
+        with self._lock:
+            self._stats["runs"] += 1
+            self._stats["last_run_at"] = time.time()
+            self._stats["last_duration_ms"] = round(duration_ms, 2)
+            self._stats["last_lag_ms"] = round(lag_ms, 2)
+            self._stats["last_carts_reclaimed"] = summary["carts"]
+            self._stats["last_items_reclaimed"] = summary["items"]
+            self._stats["total_carts_reclaimed"] += summary["carts"]
+        return summary
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["running"] = bool(self._thread and self._thread.is_alive())
+        return stats
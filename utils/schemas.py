@@ -0,0 +1,86 @@
+from dataclasses import dataclass
+from utils.money import from_cents
+
+# Response shapes, one per model. orjson and msgspec encode dataclasses
+# natively and the stdlib provider reuses their __dict__, so no per-row dict
+# is built; fields are emitted in the order declared here. (slots=True is
+# avoided: orjson 3.8 takes a much slower path for slotted dataclasses.)
+
+
+@dataclass
+class ProductSchema:
+    id: int
+    name: str
+    price: float
+    available_quantity: int
+
+    @classmethod
+    def from_row(cls, row):
+        """From a catalog row whose price column is in cents."""
+        return cls(row.id, row.name, from_cents(row.price), row.available_quantity)
+
+
+@dataclass
+class CartItemSchema:
+    product_id: int
+    product: str
+    price: float
+    quantity: int
+    subtotal: float
+
+    @classmethod
+    def from_row(cls, row):
+        """From a cart_view_query row (price and subtotal in cents)."""
+        return cls(
+            row.product_id,
+            row.name,
+            from_cents(row.price),
+            row.quantity,
+            from_cents(row.subtotal),
+        )
+
+
+@dataclass
+class OrderItemSchema:
+    product_name: str
+    price_at_order: float
+    quantity: int
+    subtotal: float
+
+    @classmethod
+    def from_model(cls, item):
+        return cls(
+            item.product.name,
+            from_cents(item.price_at_order_cents),
+            item.quantity,
+            from_cents(item.quantity * item.price_at_order_cents),
+        )
+
+
+@dataclass
+class OrderSchema:
+    order_id: int
+    total_amount: float
+    created_at: str
+    items: list[OrderItemSchema]
+
+    @classmethod
+    def from_model(cls, order):
+        """From an Order with items and their products loaded."""
+        return cls(
+            order.id,
+            from_cents(order.total_cents),
+            order.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            [OrderItemSchema.from_model(item) for item in order.items],
+        )
+
+
+@dataclass
+class UserSchema:
+    id: int
+    username: str
+    email: str
+
+    @classmethod
+    def from_row(cls, row):
+        return cls(row.id, row.username, row.email)
@@ -0,0 +1,79 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenCache:
+    """
+    Bounded LRU of verified access-token payloads, keyed by the token's
+    SHA-256 digest. Entries are only served until the token's `exp`, so a
+    cache hit never extends a token's lifetime.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token):
+        """Return the cached payload for a still-valid token, or None."""
+        if self.maxsize <= 0:
+            return None
+
+        key = self._key(token)
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None or payload["exp"] <= time.time():
+                if payload is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return payload
+
+    def put(self, token, payload):
+        if self.maxsize <= 0 or "exp" not in payload:
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id):
+        """Drop every cached token that belongs to `user_id`."""
+        with self._lock:
+            stale = [
+                key
+                for key, payload in self._entries.items()
+                if payload.get("user_id") == user_id
+            ]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,34 @@
+"""
+Production WSGI entry point for a preforking server:
+
+    gunicorn wsgi:app --preload --workers 4 --threads 8
+
+With --preload the app, its imports and module-level state are built once in
+the master and shared copy-on-write by every worker. Two things keep those
+pages shared and the workers safe after fork:
+
+- gc.freeze() moves everything allocated so far out of the collector's
+  generations, so collections in a worker never write to (and copy) them;
+- pooled database connections are dropped in each child, so workers never
+  share a socket opened by the master.
+
+Run the cart sweeper as its own process (`flask --app app sweep-carts --loop`)
+rather than in the web workers.
+"""
+
+import gc
+import os
+from app import create_app
+from database import db
+
+app = create_app()
+
+
+def _reset_pools_after_fork():
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
+gc.freeze()